@@ -155,6 +155,12 @@ async function isContractDeployed(address) {
 // --- 3. SERVER STATE (Remote Enrollment System) ---
 // This acts as temporary memory to coordinate between Admin Dashboard and Kiosk
 let pendingEnrollment = null;
+// Kiosk long polls (poll-commands?wait=) waiting for the next command
+const commandWaiters = new Set();
+
+function notifyCommandWaiters() {
+    for (const wake of [...commandWaiters]) wake();
+}
 
 // --- Auto-authorize official signer (server wallet) ---
 async function ensureAuthorizedSignerFor(address) {
@@ -310,8 +316,204 @@ app.get('/api/results', async (req, res) => {
     }
 });
 
-// STAGE 1: CHECK-IN (Front Desk)
+// Ballot for the kiosks: ids and names only (no vote counts), so the list
+// only changes with the election. Kiosks keep it on disk and revalidate with
+// If-None-Match; the ETag covers the contract address, so a new election
+// (new contract) always answers 200.
+const CANDIDATES_TTL_MS = 30 * 1000;
+let candidatesCache = null; // { address, expires, etag, body }
+
+app.get('/api/candidates', async (req, res) => {
+    try {
+        const addr = contract.target || contract.address || process.env.VOTING_CONTRACT_ADDRESS;
+        if (!candidatesCache || candidatesCache.address !== addr || candidatesCache.expires < Date.now()) {
+            const list = (await contract.getAllCandidates()).map(c => ({ id: Number(c.id), name: c.name }));
+            const version = crypto.createHash('sha256').update(JSON.stringify([addr, list])).digest('hex').slice(0, 32);
+            candidatesCache = {
+                address: addr,
+                expires: Date.now() + CANDIDATES_TTL_MS,
+                etag: `"${version}"`,
+                body: { status: 'ok', data: { contract: addr, version, candidates: list } },
+            };
+        }
+        const { etag, body } = candidatesCache;
+        res.set('ETag', etag);
+        res.set('Cache-Control', 'no-cache');
+        const tags = String(req.headers['if-none-match'] || '').split(/\s*,\s*/);
+        if (tags.includes(etag)) {
+            return res.status(304).end();
+        }
+        res.json(body);
+    } catch (e) {
+        console.error('Candidates fetch error:', e);
+        res.status(500).json({ status: 'error', message: 'Failed to fetch candidates from blockchain' });
+    }
+});
+
+// --- "Already voted" filter for the kiosks ---
+// A Bloom filter of salted SHA-256 hashes of the Aadhaar numbers that have
+// voted. Kiosks download it once, then poll GET /api/voted-filter?id=&since=
+// for the hashes added since, so a repeat attempt is turned away at the
+// booth without a check-in. A hit may be a false positive (about
+// VOTED_FILTER_FP_RATE at capacity): the kiosk confirms it with
+// POST /api/voted-filter/confirm, which has its own limiter, capped at the
+// check-in limit. Both routes need the kiosk credential (requireKiosk): the
+// filter and its salt, or an unlimited confirm, would let anyone test
+// Aadhaar numbers for has_voted.
+// Bit i of the filter is bit (i % 8) of byte (i >> 3); a voter's bits are
+// (h1 + n * h2) % bits for n < hashes, where h1 and h2 | 1 are the first two
+// big-endian uint32 of sha256(salt + aadhaar_id). The salt is random per
+// filter, and the filter is rebuilt (new id) for a new election or when it
+// outgrows its capacity.
+// Kiosk credential: a shared secret in KIOSK_API_KEY, sent by the kiosks as
+// X-Kiosk-Key. Unset, the routes that need it answer 503.
+const KIOSK_API_KEY = process.env.KIOSK_API_KEY || '';
+if (!KIOSK_API_KEY) console.warn('[KIOSK] KIOSK_API_KEY not set: the voted filter is disabled');
+
+function requireKiosk(req, res, next) {
+    if (!KIOSK_API_KEY) {
+        return res.status(503).json({ status: 'error', message: 'Kiosk access is not configured.' });
+    }
+    const given = crypto.createHash('sha256').update(String(req.get('X-Kiosk-Key') || '')).digest();
+    const expected = crypto.createHash('sha256').update(KIOSK_API_KEY).digest();
+    if (!crypto.timingSafeEqual(given, expected)) {
+        return res.status(401).json({ status: 'error', message: 'Kiosk credential required.' });
+    }
+    next();
+}
+
+const VOTED_FILTER_CAPACITY = parseInt(process.env.VOTED_FILTER_CAPACITY || '200000', 10);
+const VOTED_FILTER_FP_RATE = parseFloat(process.env.VOTED_FILTER_FP_RATE || '0.0001');
+const VOTED_FILTER_DELTA_MAX = 20000;
+const VOTED_FILTER_PAGE = 1000;
+let votedFilter = null;         // { id, salt, bits, hashes, capacity, array, count, seq, deltas }
+let votedFilterBacklog = null;  // voters marked while a rebuild is loading
+
+function newVotedFilter(capacity) {
+    const bits = Math.ceil(-capacity * Math.log(VOTED_FILTER_FP_RATE) / (Math.LN2 ** 2));
+    return {
+        id: crypto.randomBytes(6).toString('hex'),
+        salt: crypto.randomBytes(16),
+        bits,
+        hashes: Math.max(1, Math.round((bits / capacity) * Math.LN2)),
+        capacity,
+        array: Buffer.alloc(Math.ceil(bits / 8)),
+        count: 0,
+        seq: 0,
+        deltas: [],
+    };
+}
+
+// Adds a voter; returns false if the filter already had them
+function votedFilterAdd(filter, aadhaar_id) {
+    const digest = crypto.createHash('sha256').update(filter.salt).update(aadhaar_id).digest();
+    const h1 = digest.readUInt32BE(0);
+    const h2 = (digest.readUInt32BE(4) | 1) >>> 0;
+    let added = false;
+    for (let n = 0; n < filter.hashes; n++) {
+        const bit = (h1 + n * h2) % filter.bits;
+        const mask = 1 << (bit & 7);
+        if (!(filter.array[bit >> 3] & mask)) {
+            filter.array[bit >> 3] |= mask;
+            added = true;
+        }
+    }
+    if (added) {
+        filter.count++;
+        filter.seq++;
+        filter.deltas.push(digest.subarray(0, 8).toString('hex'));
+        if (filter.deltas.length > VOTED_FILTER_DELTA_MAX) filter.deltas.shift();
+    }
+    return added;
+}
+
+function markVoted(aadhaar_id) {
+    if (votedFilterBacklog) votedFilterBacklog.push(aadhaar_id);
+    if (!votedFilter) return;
+    votedFilterAdd(votedFilter, aadhaar_id);
+    if (votedFilter.count > votedFilter.capacity && !votedFilterBacklog) {
+        loadVotedFilter(votedFilter.capacity * 2);
+    }
+}
+
+// (Re)build the filter from Supabase; kiosks see a new id and reload it
+async function loadVotedFilter(capacity = VOTED_FILTER_CAPACITY) {
+    votedFilterBacklog = [];
+    try {
+        const filter = newVotedFilter(capacity);
+        for (let from = 0; ; from += VOTED_FILTER_PAGE) {
+            const { data, error } = await supabase
+                .from('voters')
+                .select('aadhaar_id')
+                .eq('has_voted', true)
+                .order('aadhaar_id')
+                .range(from, from + VOTED_FILTER_PAGE - 1);
+            if (error) throw error;
+            for (const row of data) votedFilterAdd(filter, row.aadhaar_id);
+            if (data.length < VOTED_FILTER_PAGE) break;
+        }
+        for (const aadhaar_id of votedFilterBacklog) votedFilterAdd(filter, aadhaar_id);
+        // Kiosks take the loaded voters in the full download, not as deltas
+        filter.deltas = [];
+        votedFilter = filter;
+        console.log(`[VOTED FILTER] ${filter.count} voters, ${filter.bits} bits x ${filter.hashes} hashes (id ${filter.id})`);
+    } catch (e) {
+        console.error('[VOTED FILTER] Load failed:', e.message || e);
+    } finally {
+        votedFilterBacklog = null;
+    }
+}
+
+app.get('/api/voted-filter', requireKiosk, (req, res) => {
+    const filter = votedFilter;
+    if (!filter) {
+        return res.status(503).json({ status: 'error', message: 'Voted filter not loaded yet.' });
+    }
+    const since = Number(req.query.since);
+    const oldest = filter.seq - filter.deltas.length;
+    if (req.query.id === filter.id && Number.isInteger(since) && since >= oldest && since <= filter.seq) {
+        return res.json({ status: 'ok', data: { id: filter.id, seq: filter.seq, delta: filter.deltas.slice(since - oldest) } });
+    }
+    res.json({
+        status: 'ok',
+        data: {
+            id: filter.id,
+            seq: filter.seq,
+            bits: filter.bits,
+            hashes: filter.hashes,
+            salt: filter.salt.toString('hex'),
+            filter: filter.array.toString('base64'),
+        },
+    });
+});
+
 const RL_CHECKIN_MAX = parseInt(process.env.RL_CHECKIN_MAX || '30', 10);
+// An exact has-voted check: never looser than check-in
+const RL_FILTER_CONFIRM_MAX = Math.min(RL_CHECKIN_MAX,
+    parseInt(process.env.RL_FILTER_CONFIRM_MAX || String(RL_CHECKIN_MAX), 10) || RL_CHECKIN_MAX);
+const filterConfirmLimiter = rateLimit({ windowMs: 60 * 1000, max: RL_FILTER_CONFIRM_MAX });
+app.post('/api/voted-filter/confirm', requireKiosk, filterConfirmLimiter, async (req, res) => {
+    const { aadhaar_id } = req.body || {};
+    if (typeof aadhaar_id !== 'string' || !/^\d{12}$/.test(aadhaar_id)) {
+        return res.status(400).json({ status: 'error', message: 'Invalid Aadhaar ID format.' });
+    }
+    try {
+        const { data: voter, error } = await supabase
+            .from('voters')
+            .select('has_voted')
+            .eq('aadhaar_id', aadhaar_id)
+            .maybeSingle();
+        if (error) throw error;
+        const voted = !!voter?.has_voted;
+        if (voted) markVoted(aadhaar_id);
+        res.json({ status: 'ok', data: { voted } });
+    } catch (e) {
+        console.error('Voted filter confirm error:', e);
+        res.status(500).json({ status: 'error', message: 'Internal server error.' });
+    }
+});
+
+// STAGE 1: CHECK-IN (Front Desk)
 const RL_VOTE_MAX = parseInt(process.env.RL_VOTE_MAX || '20', 10);
 const checkInLimiter = rateLimit({ windowMs: 60 * 1000, max: RL_CHECKIN_MAX });
 app.post('/api/voter/check-in', checkInLimiter, async (req, res) => {
@@ -332,6 +534,7 @@ app.post('/api/voter/check-in', checkInLimiter, async (req, res) => {
         }
 
         if (voter.has_voted) {
+            markVoted(aadhaar_id);
             return res.status(403).json({ status: 'error', message: 'Voter has already voted.', data: null });
         }
 
@@ -354,7 +557,68 @@ app.post('/api/voter/check-in', checkInLimiter, async (req, res) => {
 
 // STAGE 2: CAST VOTE (Kiosk)
 const voteLimiter = rateLimit({ windowMs: 60 * 1000, max: RL_VOTE_MAX });
-app.post('/api/vote', voteLimiter, async (req, res) => {
+
+// Idempotency-Key: a kiosk sends one key per ballot. A repeat of the same key
+// (duplicate delivery, proxy retry) waits for and replays the first answer
+// instead of submitting the vote again. 5xx answers are not kept, so a later
+// retry is processed normally (the contract still rejects a double vote).
+// The key is bound to a hash of the body it came with: the same key with
+// another ballot is refused with 422 instead of being answered for the first.
+const IDEMPOTENCY_TTL_MS = 15 * 60 * 1000;
+const idempotencyCache = new Map(); // key -> { expires, bodyHash, result: Promise<{status, body}|null> }
+
+function requestBodyHash(body) {
+    const fields = body && typeof body === 'object' ? body : {};
+    return crypto.createHash('sha256').update(JSON.stringify(fields, Object.keys(fields).sort())).digest('hex');
+}
+
+function idempotent(req, res, next) {
+    const key = req.get('Idempotency-Key');
+    if (!key) return next();
+
+    const now = Date.now();
+    if (idempotencyCache.size > 1000) {
+        for (const [k, cached] of idempotencyCache) {
+            if (cached.expires < now) idempotencyCache.delete(k);
+        }
+    }
+
+    const bodyHash = requestBodyHash(req.body);
+    const hit = idempotencyCache.get(key);
+    if (hit && hit.expires >= now) {
+        if (hit.bodyHash !== bodyHash) {
+            return res.status(422).json({ status: 'error', message: 'Idempotency-Key reused with a different request.' });
+        }
+        return hit.result.then((result) => {
+            if (!result) return next();
+            res.set('Idempotent-Replayed', 'true');
+            res.status(result.status).json(result.body);
+        });
+    }
+
+    let resolve;
+    const entry = { expires: now + IDEMPOTENCY_TTL_MS, bodyHash, result: new Promise((r) => { resolve = r; }) };
+    idempotencyCache.set(key, entry);
+    let settled = false;
+    const settle = (result) => {
+        if (settled) return;
+        settled = true;
+        if (!result) idempotencyCache.delete(key);
+        resolve(result);
+    };
+    // Settled when the handler answers, even if the kiosk has hung up by then
+    const json = res.json.bind(res);
+    res.json = (payload) => {
+        const keep = res.statusCode < 500 && res.statusCode !== 429;
+        settle(keep ? { status: res.statusCode, body: payload } : null);
+        return json(payload);
+    };
+    // Non-JSON answers (e.g. the rate limiter) are not replayed
+    res.on('finish', () => settle(null));
+    next();
+}
+
+app.post('/api/vote', idempotent, voteLimiter, async (req, res) => {
     const { aadhaar_id, candidate_id } = req.body || {};
     if (typeof aadhaar_id !== 'string' || !/^\d{12}$/.test(aadhaar_id)) {
         return res.status(400).json({ status: 'error', message: 'Invalid Aadhaar ID.' });
@@ -374,6 +638,7 @@ app.post('/api/vote', voteLimiter, async (req, res) => {
             .single();
 
         if (voter?.has_voted) {
+            markVoted(aadhaar_id);
             return res.status(403).json({ status: 'error', message: 'Double voting detected!', data: null });
         }
 
@@ -420,6 +685,7 @@ app.post('/api/vote', voteLimiter, async (req, res) => {
         if (dbError) {
             console.error("Database update failed AFTER blockchain success. Manual sync needed for:", aadhaar_id);
         }
+        markVoted(aadhaar_id);
         // Write audit log (hash Aadhaar ID for privacy)
         try {
             const aadhaarHash = crypto.createHash('sha256').update(aadhaar_id).digest('hex');
@@ -495,6 +761,8 @@ app.post('/api/admin/deploy-contract', async (req, res) => {
             console.error('[ADMIN] ⚠️ Database reset failed:', resetError);
         } else {
             console.log('[ADMIN] ✅ All voters reset to has_voted=false (fingerprints preserved)');
+            // New election: kiosks drop the old filter when they see the new id
+            loadVotedFilter();
         }
         
         // 3. Update .env file automatically
@@ -623,6 +891,7 @@ app.post('/api/admin/add-voter', async (req, res) => {
         };
 
         console.log(`[REMOTE ENROLL] Command queued for ${name} -> Target ID #${nextId}`);
+        notifyCommandWaiters();
         res.json({ 
             status: 'success', 
             message: 'Waiting for Kiosk scan...', 
@@ -646,13 +915,38 @@ app.get('/api/admin/enrollment-status', (req, res) => {
 });
 
 // 3. Poll for Commands (Called by Kiosk in a loop)
+// ?wait=N (seconds, max 25) holds the request until a command is queued or
+// N seconds pass, so an idle kiosk hears about an enrollment at once while
+// polling only a few times a minute.
+const POLL_WAIT_MAX_S = 25;
+
 app.get('/api/kiosk/poll-commands', (req, res) => {
-    if (pendingEnrollment && pendingEnrollment.status === 'WAITING_FOR_KIOSK') {
-        console.log('[REMOTE ENROLL] Kiosk polled, sending command...');
-        res.json({ command: 'ENROLL', ...pendingEnrollment });
-    } else {
-        res.json({ command: 'NONE' });
-    }
+    const hasCommand = () => pendingEnrollment && pendingEnrollment.status === 'WAITING_FOR_KIOSK';
+    const answer = () => {
+        if (hasCommand()) {
+            console.log('[REMOTE ENROLL] Kiosk polled, sending command...');
+            res.json({ command: 'ENROLL', ...pendingEnrollment });
+        } else {
+            res.json({ command: 'NONE' });
+        }
+    };
+
+    const wait = Math.min(POLL_WAIT_MAX_S, Math.max(0, Number(req.query.wait) || 0));
+    if (hasCommand() || wait === 0) return answer();
+
+    let timer = null;
+    const done = () => {
+        clearTimeout(timer);
+        commandWaiters.delete(done);
+        if (!res.writableEnded) answer();
+    };
+    timer = setTimeout(done, wait * 1000);
+    commandWaiters.add(done);
+    // Kiosk hung up (restart, timeout): forget it
+    res.on('close', () => {
+        clearTimeout(timer);
+        commandWaiters.delete(done);
+    });
 });
 
 // 4. Complete Enrollment (Called by Kiosk after successful scan)
@@ -748,4 +1042,5 @@ app.get('/api/metrics', async (_req, res) => {
 // Start the server
 app.listen(port, () => {
     console.log(`🤖 Election Official (Backend) is listening on port ${port}`);
+    loadVotedFilter();
 });
\ No newline at end of file
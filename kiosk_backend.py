@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Backend Client
+
+One pooled HTTP session to the Express backend, shared by every booth and
+submit worker in the process. Keep-alive connections save a TCP/TLS
+handshake per request, which matters over a Cloudflare tunnel. Each call
+is timed into the shared metrics registry per endpoint.
+
+Several backend instances (one per laptop/tunnel) can be used at once.
+Each request goes to the better of two randomly chosen instances, scored
+by an EWMA of round-trip time, the requests it already has in flight and
+its recent error rate ("power of two choices"). An instance that fails
+EJECT_AFTER times in a row is ejected for a while, with the ejection time
+doubling on repeat offences; the last healthy instance is never ejected.
+
+    check-in     may be hedged: after `hedge_after` seconds without an
+                 answer, or at once if the first instance refuses or drops
+                 the connection, the same request goes to a second instance
+                 and the first good reply wins (check-in is a read)
+    vote         strictly single-shot: never hedged or retried here, and
+                 sent with an Idempotency-Key so the backend answers a
+                 duplicate with the original result
+    enrollment   pinned to the primary instance, which holds the pending
+                 enrollment command in memory; poll-commands is long-polled
+                 (?wait=) and kept out of the instance scores
+
+The instance list can be swapped at runtime (kiosk_discovery.py follows
+the URLs published in Supabase); requests already in flight finish on
+their old connection, new ones go to the new instances.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from votechain_metrics import metrics as default_metrics
+
+# Cloudflare answers for a dead quick tunnel with 502/530 instead of failing
+# the connection
+TUNNEL_GONE_STATUS = (502, 530)
+
+# --- INSTANCE SELECTION ---
+EWMA_ALPHA = 0.3        # weight of the newest sample
+EJECT_AFTER = 3         # consecutive failures before an instance is ejected
+EJECT_BASE = 10.0       # first ejection (seconds), doubled per repeat
+EJECT_MAX = 120.0
+# Only served by the primary instance (in-memory enrollment state; each
+# instance builds its own voted filter, so deltas only make sense from one)
+PINNED = ("/api/kiosk/poll-commands", "/api/kiosk/enrollment-complete", "/api/voted-filter")
+# Never hedged; its latency is chain confirmation time, not host health
+SINGLE_SHOT = ("/api/vote",)
+# Held open by the server until there is news (?wait=); neither its time
+# nor the open request says anything about the instance's load
+LONG_POLL = ("/api/kiosk/poll-commands",)
+
+
+class Endpoint:
+    """Live health of one backend instance."""
+
+    def __init__(self, url):
+        self.url = url
+        self.rtt = None             # EWMA seconds
+        self.error_rate = 0.0       # EWMA of 0/1 outcomes
+        self.in_flight = 0
+        self.failures = 0           # consecutive
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def ejected(self, now):
+        return now < self.ejected_until
+
+    def score(self):
+        # Unmeasured instances look fast so they get tried
+        rtt = self.rtt if self.rtt is not None else 0.05
+        return rtt * (1 + self.in_flight) / max(0.05, 1.0 - self.error_rate)
+
+    def snapshot(self):
+        return {"url": self.url, "rtt": self.rtt and round(self.rtt, 4),
+                "error_rate": round(self.error_rate, 3), "in_flight": self.in_flight,
+                "ejected": self.ejected(time.monotonic())}
+
+
+class BackendClient:
+    """Thread-safe wrapper around a pooled requests.Session."""
+
+    def __init__(self, base_url, pool_size=8, metrics=None):
+        self.metrics = metrics or default_metrics
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._hedge_pool = ThreadPoolExecutor(max_workers=max(2, pool_size // 2),
+                                              thread_name_prefix="backend-hedge")
+        self.endpoints = []
+        self.set_endpoints(base_url if isinstance(base_url, (list, tuple)) else [base_url], quiet=True)
+        # Called (no arguments) when the backend looks unreachable
+        self.on_unreachable = None
+
+    @property
+    def base_url(self):
+        """The primary instance (first in the list)."""
+        return self.endpoints[0].url
+
+    def set_endpoints(self, urls, quiet=False):
+        """Use `urls` (primary first). Known instances keep their stats.
+        Returns True if the list changed."""
+        urls = list(dict.fromkeys(u.rstrip("/") for u in urls if u))
+        if not urls or urls == [e.url for e in self.endpoints]:
+            return False
+        with self._lock:
+            known = {e.url: e for e in self.endpoints}
+            old = [e.url for e in self.endpoints]
+            self.endpoints = [known.get(u) or Endpoint(u) for u in urls]
+        if not quiet:
+            self.metrics.inc("backend_url_switches")
+            print(f"🔀 Backend URLs changed: {', '.join(old)} -> {', '.join(urls)}")
+        return True
+
+    def set_base_url(self, base_url):
+        """Send new requests to `base_url` only. Returns True if it changed."""
+        return self.set_endpoints([base_url])
+
+    def _unreachable(self):
+        if self.on_unreachable:
+            try:
+                self.on_unreachable()
+            except Exception:
+                pass
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    # --- Selection ---
+
+    def pick(self, exclude=()):
+        """Power of two choices over the healthy instances."""
+        now = time.monotonic()
+        with self._lock:
+            pool = [e for e in self.endpoints if e not in exclude]
+            healthy = [e for e in pool if not e.ejected(now)] or pool
+            if len(healthy) <= 1:
+                return healthy[0] if healthy else None
+            a, b = random.sample(healthy, 2)
+            return a if a.score() <= b.score() else b
+
+    def _record(self, ep, seconds, ok, endpoint):
+        with self._lock:
+            if endpoint not in LONG_POLL:
+                ep.in_flight -= 1
+            if endpoint not in SINGLE_SHOT and endpoint not in LONG_POLL:
+                ep.rtt = seconds if ep.rtt is None else ep.rtt + EWMA_ALPHA * (seconds - ep.rtt)
+            ep.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - ep.error_rate)
+            if ok:
+                ep.failures = 0
+                return
+            ep.failures += 1
+            now = time.monotonic()
+            others = [e for e in self.endpoints if e is not ep and not e.ejected(now)]
+            if ep.failures < EJECT_AFTER or not others or ep.ejected(now):
+                return
+            ep.ejections += 1
+            ep.ejected_until = now + min(EJECT_BASE * 2 ** (ep.ejections - 1), EJECT_MAX)
+        self.metrics.inc("backend_ejections", instance=ep.url)
+        print(f"⚠️ Backend {ep.url} ejected after {ep.failures} failures")
+
+    # --- Requests ---
+
+    def _send(self, ep, method, path, **kwargs):
+        start = time.perf_counter()
+        endpoint = path.split("?", 1)[0]
+        if endpoint not in LONG_POLL:
+            with self._lock:
+                ep.in_flight += 1
+        try:
+            response = self.session.request(method, f"{ep.url}{path}", **kwargs)
+        except Exception as e:
+            self._record(ep, time.perf_counter() - start, False, endpoint)
+            self.metrics.inc("backend_errors", endpoint=endpoint, kind=type(e).__name__)
+            if isinstance(e, requests.ConnectionError):
+                self._unreachable()
+            raise
+        finally:
+            self.metrics.observe("backend_latency_s", time.perf_counter() - start, endpoint=endpoint)
+        # 5xx and rate limiting both mean "this instance is struggling"
+        healthy = response.status_code < 500 and response.status_code != 429
+        self._record(ep, time.perf_counter() - start, healthy, endpoint)
+        self.metrics.inc("backend_responses", endpoint=endpoint, status=response.status_code)
+        if response.status_code in TUNNEL_GONE_STATUS:
+            self._unreachable()
+        return response
+
+    def request(self, method, path, hedge_after=None, **kwargs):
+        endpoint = path.split("?", 1)[0]
+        if endpoint in PINNED:
+            return self._send(self.endpoints[0], method, path, **kwargs)
+        ep = self.pick()
+        if hedge_after is None or endpoint in SINGLE_SHOT or len(self.endpoints) < 2:
+            return self._send(ep, method, path, **kwargs)
+        return self._hedged(ep, method, path, hedge_after, **kwargs)
+
+    def _hedged(self, first, method, path, hedge_after, **kwargs):
+        """Send to `first`; if it has not answered after `hedge_after`
+        seconds, or its connection failed sooner, also send to a second
+        instance. First good reply wins."""
+        endpoint = path.split("?", 1)[0]
+        futures = {self._hedge_pool.submit(self._send, first, method, path, **kwargs): first}
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done or isinstance(next(iter(done)).exception(), requests.ConnectionError):
+            second = self.pick(exclude=(first,))
+            if second is not None:
+                self.metrics.inc("backend_hedges", endpoint=endpoint)
+                futures[self._hedge_pool.submit(self._send, second, method, path, **kwargs)] = second
+        pending = set(futures)
+        fallback = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None and f.result().status_code < 500:
+                    if futures[f] is not first:
+                        self.metrics.inc("backend_hedge_wins", endpoint=endpoint)
+                    return f.result()
+                fallback = fallback or f
+        # Every attempt failed: surface the first failure like a plain request
+        return fallback.result()
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            return [e.snapshot() for e in self.endpoints]
+
+    def close(self):
+        self._hedge_pool.shutdown(wait=False)
+        self.session.close()
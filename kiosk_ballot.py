@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Ballot
+
+The candidate list comes from the election contract (getAllCandidates, via
+GET /api/candidates) instead of being built into the kiosk:
+
+- Boot: the list is read from the disk cache (`ballot_cache`), so a booth
+  is ready without the network. With no cache the built-in two-candidate
+  ballot (DEFAULT_CANDIDATES) is used until the first fetch.
+- While idle, at most every `ballot_refresh` seconds, a background thread
+  revalidates with If-None-Match. The ETag covers the contract address and
+  the names, so the same election costs a bodiless 304 and a new election
+  (new contract) a 200, which is written back to the cache. A failed fetch
+  keeps the current ballot and is retried after RETRY_SECONDS.
+- Booths prerender every ballot screen when the version changes (see
+  Booth.prerender_ballot), so a voter's ballot costs no request and no
+  redraw.
+
+Two candidates keep the A/B layout: press a button to choose, the same one
+again to confirm. Longer ballots are paged with the same two buttons: A
+shows the next candidate, B selects the one on screen, then B confirms and
+A goes back.
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from votechain_config import config
+from votechain_metrics import metrics
+
+PATH = "/api/candidates"
+FETCH_TIMEOUT = 5.0
+RETRY_SECONDS = 30.0
+# Screens beyond this are drawn when shown instead of being kept in memory
+PRERENDER_MAX = 200
+
+
+@dataclass(frozen=True)
+class Candidate:
+    id: int
+    name: str
+
+
+DEFAULT_CANDIDATES = (Candidate(1, "CANDIDATE A"), Candidate(2, "CANDIDATE B"))
+DEFAULT_VERSION = "builtin"
+
+
+def parse_candidates(raw):
+    """Candidates from the backend's [{"id": 1, "name": ...}] list, in
+    ballot order. Raises ValueError if the list is malformed."""
+    if not isinstance(raw, list):
+        raise ValueError("candidates is not a list")
+    candidates = []
+    for item in raw:
+        try:
+            cand = Candidate(int(item["id"]), str(item["name"]))
+        except (TypeError, KeyError, ValueError):
+            raise ValueError(f"bad candidate: {item!r}")
+        if cand.id <= 0:
+            raise ValueError(f"bad candidate id: {cand.id}")
+        candidates.append(cand)
+    return tuple(candidates)
+
+
+# --- Screens ---
+
+def paged(candidates):
+    return len(candidates) > 2
+
+
+def screen(candidates, kind, index):
+    """The three lines of one ballot screen. kind is "page" (a paged ballot
+    showing candidate `index`) or "confirm"."""
+    cand = candidates[index]
+    if not paged(candidates):
+        return "CONFIRM VOTE:", cand.name, "Press Again ->"
+    if kind == "page":
+        return f"Candidate {index + 1}/{len(candidates)}", cand.name, "A: Next  B: Select"
+    return "CONFIRM VOTE:", cand.name, "B: Yes  A: Back"
+
+
+def screens(candidates):
+    """(kind, index) of every screen the ballot can show."""
+    kinds = ("page", "confirm") if paged(candidates) else ("confirm",)
+    return [(kind, i) for i in range(len(candidates)) for kind in kinds]
+
+
+class Ballot:
+    """The current candidate list, shared by all booths of a kiosk.
+    current() is safe to call while a refresh swaps the list."""
+
+    def __init__(self, candidates=DEFAULT_CANDIDATES, version=DEFAULT_VERSION, etag=None,
+                 contract=None, path=None, remote=False):
+        self.path = path                # disk cache, or None
+        self.remote = remote            # revalidate against the backend
+        self.contract = contract
+        self.etag = etag
+        self._current = (version, tuple(candidates))
+        self._checked = None            # monotonic time of the last fetch attempt
+        self._ok = False                # whether that attempt succeeded
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def for_kiosk(cls):
+        """The ballot from `ballot_cache` (or the built-in one), refreshed
+        from the backend while booths are idle."""
+        ballot = cls(path=config.ballot_cache or None, remote=True)
+        ballot.load_cache()
+        return ballot
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    @property
+    def candidates(self):
+        return self._current[1]
+
+    def current(self):
+        """(version, candidates) as one consistent snapshot."""
+        return self._current
+
+    def name(self, candidate_id):
+        for cand in self.candidates:
+            if cand.id == candidate_id:
+                return cand.name
+        return f"CANDIDATE {candidate_id}"
+
+    # --- Serialisation ---
+
+    def to_dict(self):
+        version, candidates = self._current
+        return {"version": version, "etag": self.etag, "contract": self.contract,
+                "candidates": [{"id": c.id, "name": c.name} for c in candidates]}
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        return cls(parse_candidates(data.get("candidates")), version=str(data.get("version") or DEFAULT_VERSION),
+                   etag=data.get("etag"), contract=data.get("contract"), **kwargs)
+
+    def apply(self, data, etag=None):
+        """Take the `data` of a /api/candidates answer. Returns True if the
+        ballot changed. Raises ValueError if it is malformed."""
+        candidates = parse_candidates(data.get("candidates"))
+        version = str(data.get("version") or etag or DEFAULT_VERSION)
+        with self._lock:
+            self.etag = etag
+            self.contract = data.get("contract")
+            if (version, candidates) == self._current:
+                return False
+            self._current = (version, candidates)
+        return True
+
+    # --- Disk cache ---
+
+    def load_cache(self):
+        if not self.path:
+            return False
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            cached = Ballot.from_dict(data)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"⚠️ Ignoring ballot cache {self.path}: {e}")
+            return False
+        with self._lock:
+            self.etag, self.contract = cached.etag, cached.contract
+            self._current = cached._current
+        return True
+
+    def save_cache(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(dict(self.to_dict(), saved_at=time.time()), f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not cache ballot: {e}")
+
+    # --- Backend ---
+
+    def refresh(self, backend, timeout=FETCH_TIMEOUT):
+        """Revalidate against /api/candidates. Returns True if the ballot
+        changed; any failure keeps the current one."""
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        self._checked, self._ok = time.monotonic(), False
+        start = time.perf_counter()
+        try:
+            response = backend.get(PATH, headers=headers, timeout=timeout)
+            if response.status_code == 304:
+                metrics.inc("ballot_fetches", result="not_modified")
+                self._ok = True
+                return False
+            if response.status_code != 200:
+                raise ValueError(f"HTTP {response.status_code}")
+            changed = self.apply(response.json().get("data") or {}, response.headers.get("ETag"))
+        except Exception as e:
+            metrics.inc("ballot_fetches", result="error")
+            print(f"⚠️ Ballot not refreshed: {e}")
+            return False
+        finally:
+            metrics.observe("ballot_fetch_s", time.perf_counter() - start)
+        self._ok = True
+        metrics.inc("ballot_fetches", result="changed" if changed else "same")
+        if changed:
+            self.save_cache()
+            print(f"🗳️ Ballot {self.version[:8]}: {len(self.candidates)} candidates")
+        return changed
+
+    def due(self):
+        if not self.remote:
+            return False
+        if self._checked is None:
+            return True
+        interval = config.ballot_refresh if self._ok else min(RETRY_SECONDS, config.ballot_refresh or RETRY_SECONDS)
+        return interval > 0 and time.monotonic() - self._checked >= interval
+
+    def refresh_in_background(self, backend):
+        """Start refresh() on a thread if one is due and none is running."""
+        with self._lock:
+            if not self.due() or (self._thread is not None and self._thread.is_alive()):
+                return False
+            self._checked = time.monotonic()
+            self._thread = threading.Thread(target=self.refresh, args=(backend,),
+                                            name="kiosk-ballot", daemon=True)
+            self._thread.start()
+        return True
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Multi-Booth Controller
+
+Runs several booths (each with its own buttons, OLED, fingerprint sensor and
+keyboard) from one Raspberry Pi. Every booth runs its own idle/voter loop
+on a dedicated thread, so a slow sensor or a voter typing at one booth never
+stalls another. All booths share a single pooled backend client and one
+metrics registry.
+
+Usage:
+    sudo python3 kiosk_booths.py booths.json
+    EMULATE_HARDWARE=1 python3 kiosk_booths.py booths.example.json
+
+booths.json is a list of booth settings (see kiosk_hw.BoothConfig):
+    {"backend_url": "http://127.0.0.1:3000",
+     "metrics_path": "/tmp/votechain-kiosk.prom",
+     "booths": [{"name": "booth-1", "btn_start": 4, ...}, ...]}
+backend_url may also be a list of instances (primary first).
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+import kiosk_ballot
+import kiosk_hw
+import kiosk_voted_filter
+from kiosk_hw import BoothConfig, FP_OK
+from kiosk_backend import BackendClient
+from kiosk_discovery import discovery_from_env
+from votechain_config import config
+from votechain_metrics import metrics
+import kiosk_memory
+import kiosk_profiler
+from kiosk_main import Booth
+
+# Seconds before a crashed booth is restarted
+RESTART_DELAY = 5
+
+
+def load_booths(path):
+    """Read a booths file. Returns (settings, [BoothConfig, ...])."""
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"booths": data}
+    configs = [BoothConfig.from_dict(b) for b in data.get("booths", [])]
+    if not configs:
+        raise ValueError(f"No booths defined in {path}")
+
+    names = [c.name for c in configs]
+    if len(set(names)) != len(names):
+        raise ValueError("Booth names must be unique")
+    enrolling = [c for c in configs if c.enroll]
+    if len(enrolling) > 1:
+        # The backend holds a single pending enrollment; two booths polling
+        # for it would race for the same command.
+        print(f"⚠️ Several booths have enroll=true; only {enrolling[0].name} will take enrollments")
+        for c in enrolling[1:]:
+            c.enroll = False
+    settings = {k: v for k, v in data.items() if k != "booths"}
+    return settings, configs
+
+
+class BoothController:
+    """Owns the shared backend client and one worker thread per booth."""
+
+    def __init__(self, configs, backend_url=None, emulate=kiosk_hw.EMULATE, pipeline=None):
+        self.configs = configs
+        self.emulate = emulate
+        if pipeline is None:
+            pipeline = config.pipeline_max_in_flight
+        self.pipeline = pipeline
+        # Each booth can hold one foreground request plus its in-flight votes,
+        # and the enrolling booth one long-polled poll-commands
+        pool_size = max(4, len(configs) * (1 + max(0, pipeline)) + 1)
+        self.backend = BackendClient(backend_url or config.backend_urls, pool_size=pool_size, metrics=metrics)
+        self.discovery = discovery_from_env(self.backend)
+        # One candidate list for every booth (kiosk_ballot.py)
+        self.ballot = kiosk_ballot.Ballot.for_kiosk()
+        self.voted_filter = kiosk_voted_filter.VotedFilter.for_kiosk(self.backend)
+        self.booths = {}
+        self.threads = {}
+        self.recorders = []
+        self.stop_event = threading.Event()
+
+    def open_booth(self, cfg):
+        try:
+            booth = Booth.open(cfg, backend=self.backend, emulate=self.emulate,
+                               pipeline=self.pipeline, ballot=self.ballot,
+                               voted_filter=self.voted_filter)
+        except Exception as e:
+            print(f"❌ [{cfg.name}] Fingerprint sensor unavailable: {e}")
+            metrics.set("booth_up", 0, booth=cfg.name)
+            device = kiosk_hw.open_oled(cfg, self.emulate)
+            Booth(cfg, kiosk_hw.load_gpio(self.emulate), device, None,
+                  backend=self.backend, pipeline=0).show_sensor_error(str(e))
+            return None
+        if booth.device is None:
+            print(f"❌ [{cfg.name}] Screen initialization failed: check SPI wiring!")
+        if booth.finger.read_sysparam() != FP_OK:
+            print(f"❌ [{cfg.name}] Sensor check failed. Please check the wiring.")
+            metrics.set("booth_up", 0, booth=cfg.name)
+            return None
+        booth.boot()
+        if config.record_path:
+            import kiosk_replay
+            path = kiosk_replay.record_path(config.record_path, cfg.name)
+            self.recorders.append(kiosk_replay.Recorder.attach(booth, path))
+        return booth
+
+    def _run_booth(self, cfg):
+        """Booth thread: (re)open the hardware and run the idle loop until
+        the controller stops. A crash only restarts this booth."""
+        while not self.stop_event.is_set():
+            booth = self.open_booth(cfg)
+            if booth is None:
+                self.stop_event.wait(RESTART_DELAY * 6)
+                continue
+            self.booths[cfg.name] = booth
+            metrics.set("booth_up", 1, booth=cfg.name)
+            print(f"--- {cfg.name} LIVE ---")
+            booth.beep(count=2)
+            try:
+                booth.run(self.stop_event)
+            except Exception as e:
+                print(f"❌ [{cfg.name}] Booth crashed: {e}")
+                metrics.inc("booth_restarts", booth=cfg.name)
+                metrics.set("booth_up", 0, booth=cfg.name)
+                self.stop_event.wait(RESTART_DELAY)
+
+    def start(self):
+        if self.discovery:
+            self.discovery.boot()
+            self.discovery.start(self.stop_event)
+        for cfg in self.configs:
+            t = threading.Thread(target=self._run_booth, args=(cfg,),
+                                 name=f"booth-{cfg.name}", daemon=True)
+            self.threads[cfg.name] = t
+            t.start()
+
+    def stop(self, timeout=150):
+        """Stop every booth and let votes still in flight finish."""
+        self.stop_event.set()
+        for booth in self.booths.values():
+            booth.wake()
+        for t in self.threads.values():
+            t.join(timeout=5)
+        for booth in self.booths.values():
+            booth.drain(timeout=timeout)
+        for rec in self.recorders:
+            rec.close()
+        if self.discovery:
+            self.discovery.stop()
+        if self.voted_filter:
+            self.voted_filter.stop()
+        self.backend.close()
+
+    def wait(self):
+        while any(t.is_alive() for t in self.threads.values()):
+            time.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several voting booths from one host")
+    parser.add_argument("config", help="booths JSON file")
+    parser.add_argument("--emulate", action="store_true",
+                        help="use simulated hardware (same as EMULATE_HARDWARE=1)")
+    args = parser.parse_args()
+
+    try:
+        settings, configs = load_booths(args.config)
+        config.watch()
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    kiosk_profiler.install()
+    kiosk_memory.install()
+
+    emulate = args.emulate or kiosk_hw.EMULATE
+    controller = BoothController(configs,
+                                 backend_url=settings.get("backend_url"),
+                                 emulate=emulate)
+    if settings.get("metrics_path"):
+        metrics.start_reporter(settings["metrics_path"], settings.get("metrics_interval", 30))
+
+    print(f"--- VOTECHAIN MULTI-BOOTH KIOSK ({len(configs)} booths) ---")
+    controller.start()
+    try:
+        controller.wait()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping booths...")
+        controller.stop()
+        try:
+            kiosk_hw.load_gpio(emulate).cleanup()
+        except Exception:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Backend Discovery
+
+The tunnel manager publishes the live backend URL to Supabase
+(system_config.backend_url, plus backend_url.<instance> when several
+backends run with --instance). This client keeps the kiosk's BackendClient
+pointed at them:
+
+1. Boot: the last known URL is loaded from a disk cache (no network wait),
+   then system_config is read once to confirm or replace it.
+2. Watch: a background thread re-reads the rows every discovery_interval
+   seconds (votechain_config, can be changed live) with an
+   updated_at=gt.<last seen> filter, so unchanged rows cost an empty reply.
+   When the backend looks unreachable (connection error or a Cloudflare
+   502/530) it re-reads straight away instead of waiting.
+3. Switch: the URL list (backend_url first, then the instances) is handed
+   to BackendClient.set_endpoints(); requests in flight finish on the old
+   tunnel, the next request of the same voter session goes to the new one.
+
+Only the public read (anon) key is needed. Point SUPABASE_URL at
+mock_backend.py to test without Supabase.
+"""
+
+import json
+import os
+import threading
+import time
+
+import requests
+
+from votechain_config import config
+from votechain_metrics import metrics
+
+PRIMARY_KEY = "backend_url"
+INSTANCE_PREFIX = "backend_url."
+MIN_REFRESH_GAP = 1.0   # at most one unreachable-triggered read per second
+BOOT_TIMEOUT = 3.0
+PLACEHOLDER_URL = "https://waiting-for-tunnel.com"  # seeded by supabase-setup.sql
+
+
+class BackendDiscovery:
+    def __init__(self, supabase_url, key, backend, cache_path=None, interval=None):
+        self.endpoint = supabase_url.rstrip("/") + "/rest/v1/system_config"
+        self.backend = backend
+        self.cache_path = cache_path or config.discovery_cache
+        self._interval = interval
+        self.session = requests.Session()
+        self.session.headers.update({"apikey": key, "Authorization": f"Bearer {key}"})
+        self.updated_at = None
+        self.rows = {}              # system_config key -> row
+        self._wake = threading.Event()
+        self._last_refresh = 0.0
+        self._thread = None
+        backend.on_unreachable = self.refresh_soon
+
+    # --- Disk cache ---
+
+    def load_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        rows = data.get("rows") if isinstance(data, dict) else None
+        return list(rows.values()) if isinstance(rows, dict) and rows else None
+
+    def save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            tmp = f"{self.cache_path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"rows": self.rows, "saved_at": time.time()}, f)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            print(f"⚠️ Could not cache backend URL: {e}")
+
+    # --- Supabase ---
+
+    def fetch(self, since=None, timeout=5):
+        """Return the backend_url rows changed since `since` (an updated_at
+        value), or all of them."""
+        params = {"select": "key,value,updated_at", "key": f"like.{PRIMARY_KEY}*"}
+        if since:
+            params["updated_at"] = f"gt.{since}"
+        start = time.perf_counter()
+        try:
+            resp = self.session.get(self.endpoint, params=params, timeout=timeout)
+        finally:
+            metrics.observe("discovery_fetch_s", time.perf_counter() - start)
+        resp.raise_for_status()
+        return [r for r in resp.json() if r.get("key", "").startswith(PRIMARY_KEY)]
+
+    def urls(self):
+        """backend_url first, then the instances; placeholders left out."""
+        keys = [PRIMARY_KEY] + sorted(k for k in self.rows if k.startswith(INSTANCE_PREFIX))
+        values = [self.rows[k].get("value") for k in keys if k in self.rows]
+        return list(dict.fromkeys(v for v in values if v and v != PLACEHOLDER_URL))
+
+    def apply(self, rows, source):
+        if not rows:
+            return False
+        for row in rows:
+            self.rows[row["key"]] = row
+            if row.get("updated_at") and (self.updated_at is None or row["updated_at"] > self.updated_at):
+                self.updated_at = row["updated_at"]
+        if source != "cache":
+            self.save_cache()
+        urls = self.urls()
+        if not urls:
+            return False
+        changed = self.backend.set_endpoints(urls)
+        if changed:
+            print(f"🌐 Backend URL(s) from {source}: {', '.join(urls)}")
+            metrics.inc("discovery_switches", source=source)
+        return changed
+
+    def boot(self, timeout=BOOT_TIMEOUT):
+        """Use the cached URLs right away, then confirm them with one read."""
+        cached = self.load_cache()
+        if cached:
+            self.apply(cached, "cache")
+        try:
+            rows = self.fetch(timeout=timeout)
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️ Backend discovery unavailable ({e}); using {self.backend.base_url}")
+            metrics.inc("discovery_errors", kind=type(e).__name__)
+            return self.backend.base_url
+        # A full read replaces the cached rows (instances may be gone)
+        self.rows = {}
+        self.apply(rows, "supabase")
+        return self.backend.base_url
+
+    # --- Watching for changes ---
+
+    def refresh_soon(self):
+        """Re-read system_config now (the backend looks unreachable)."""
+        if time.monotonic() - self._last_refresh >= MIN_REFRESH_GAP:
+            self._wake.set()
+
+    @property
+    def interval(self):
+        """Seconds between change checks (config.discovery_interval, live)."""
+        return self._interval if self._interval is not None else config.discovery_interval
+
+    def check(self):
+        self._last_refresh = time.monotonic()
+        self.apply(self.fetch(since=self.updated_at), "supabase")
+
+    def run(self, stop_event):
+        backoff = self.interval
+        while not stop_event.is_set():
+            self._wake.wait(backoff)
+            self._wake.clear()
+            if stop_event.is_set():
+                break
+            try:
+                self.check()
+                backoff = self.interval
+            except (requests.RequestException, ValueError) as e:
+                metrics.inc("discovery_errors", kind=type(e).__name__)
+                # Supabase itself unreachable: back off up to a minute
+                backoff = min(backoff * 2, 60)
+
+    def start(self, stop_event):
+        self._thread = threading.Thread(target=self.run, args=(stop_event,),
+                                        name="backend-discovery", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._wake.set()
+        self.session.close()
+
+
+def discovery_from_env(backend):
+    """BackendDiscovery from SUPABASE_URL and SUPABASE_ANON_KEY in the
+    environment or backend/.env; None if discovery is turned off
+    (KIOSK_DISCOVERY=0) or not configured. The service-role SUPABASE_KEY
+    bypasses RLS and is never used on a kiosk."""
+    if not config.discovery:
+        return None
+    url = config.supabase_url
+    key = config.supabase_anon_key
+    if not url or not key:
+        if url and config.supabase_key:
+            print("⚠️ SUPABASE_ANON_KEY is not set; the kiosk will not use the service-role "
+                  "SUPABASE_KEY, discovery is off")
+        print(f"⚠️ No Supabase credentials, using fixed backend URL {backend.base_url}")
+        return None
+    return BackendDiscovery(url, key, backend)
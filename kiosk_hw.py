@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Hardware Layer
+
+Opens the GPIO, OLED, fingerprint sensor and keyboard for one booth, either
+on a Raspberry Pi or as simulated devices (EMULATE_HARDWARE=1). The
+simulated devices behave like the real ones closely enough to run the full
+voter flow on a laptop: buttons are pressed with SimGPIO.press(), fingers
+are presented with SimFingerprint.present() and Aadhaar digits are typed
+with SimKeyboard.type().
+"""
+
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+EMULATE = os.getenv("EMULATE_HARDWARE", "0") == "1"
+
+# R307 / adafruit_fingerprint status codes
+FP_OK = 0x00
+FP_NOFINGER = 0x02
+FP_IMAGEFAIL = 0x03
+FP_NOTFOUND = 0x09
+
+
+@dataclass
+class BoothConfig:
+    """Wiring for one booth. Defaults match the single-booth kiosk."""
+    name: str = "booth-1"
+    led_green: int = 17
+    led_red: int = 27
+    buzzer: int = 18
+    btn_start: int = 4      # The Admin/Start Button
+    btn_a: int = 22         # Candidate A
+    btn_b: int = 23         # Candidate B
+    oled_dc: int = 24
+    oled_rst: int = 25
+    spi_port: int = 0
+    spi_device: int = 0
+    uart: str = "/dev/ttyAMA0"
+    keyboard: str = ""      # evdev path or name fragment; "" = first keyboard
+    enroll: bool = True     # Only one booth should take remote enrollments
+
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"Unknown booth setting(s): {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+
+# ============================================================
+# SIMULATED DEVICES
+# ============================================================
+
+class SimGPIO:
+    """Drop-in for the parts of RPi.GPIO the kiosk uses."""
+    BCM = "BCM"
+    OUT = "OUT"
+    IN = "IN"
+    HIGH = 1
+    LOW = 0
+    PUD_UP = "PUD_UP"
+    FALLING = "FALLING"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._levels = {}
+        self._modes = {}
+        self._falling = {}      # pin -> edge callback(pin)
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, mode, initial=None, pull_up_down=None):
+        with self._lock:
+            self._modes[pin] = mode
+            if mode == self.OUT:
+                self._levels[pin] = initial if initial is not None else self.LOW
+            else:
+                # Pull-up inputs idle HIGH; pressing a button pulls them LOW
+                self._levels.setdefault(pin, self.HIGH)
+
+    def output(self, pin, value):
+        with self._lock:
+            self._levels[pin] = value
+
+    def input(self, pin):
+        with self._lock:
+            return self._levels.get(pin, self.HIGH)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self._lock:
+            if pin in self._falling:
+                raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+            self._falling[pin] = callback
+
+    def remove_event_detect(self, pin):
+        with self._lock:
+            self._falling.pop(pin, None)
+
+    def cleanup(self):
+        pass
+
+    # --- Simulation helpers ---
+
+    def press(self, pin, duration=0.3):
+        """Hold a button down for `duration` seconds (non-blocking)."""
+        with self._lock:
+            edge = self._levels.get(pin, self.HIGH) != self.LOW
+            self._levels[pin] = self.LOW
+            callback = self._falling.get(pin) if edge else None
+        if callback:
+            callback(pin)
+
+        def release():
+            with self._lock:
+                self._levels[pin] = self.HIGH
+        threading.Timer(duration, release).start()
+
+    def level(self, pin):
+        return self.input(pin)
+
+
+class SimFingerprint:
+    """Scripted stand-in for adafruit_fingerprint.Adafruit_Fingerprint.
+
+    A presented finger stays on the glass until it is templated, like a
+    voter holding their finger down for the scan.
+    """
+
+    def __init__(self, scan_latency=0.05):
+        # Each get_image() is a UART round trip on the real sensor
+        self.scan_latency = scan_latency
+        self.finger_id = None
+        self.templates = set()
+        self._presented = queue.Queue()
+        self._touching = False
+        self._current = None
+        self._templated = False
+
+    def present(self, finger_id):
+        """Queue a finger; the next scan sees it. None = unknown finger."""
+        self._presented.put(finger_id)
+
+    def read_sysparam(self):
+        return FP_OK
+
+    def set_led(self, color=1, mode=3):
+        return FP_OK
+
+    def get_image(self):
+        if self.scan_latency:
+            time.sleep(self.scan_latency)
+        if not self._touching:
+            try:
+                self._current = self._presented.get_nowait()
+            except queue.Empty:
+                return FP_NOFINGER
+            self._touching = True
+        return FP_OK
+
+    def image_2_tz(self, slot=1):
+        if not self._touching:
+            return FP_IMAGEFAIL
+        # Voter lifts the finger once the image has been templated
+        self._touching = False
+        self._templated = True
+        return FP_OK
+
+    def finger_search(self):
+        templated, self._templated = self._templated, False
+        if not templated or self._current is None:
+            return FP_NOTFOUND
+        self.finger_id = self._current
+        return FP_OK
+
+    def create_model(self):
+        return FP_OK
+
+    def store_model(self, location_id):
+        self.templates.add(location_id)
+        return FP_OK
+
+
+class _SimEcodes:
+    """Linux input-event-codes used by the kiosk (subset of evdev.ecodes)."""
+    EV_KEY = 1
+    KEY_ESC = 1
+    KEY_1, KEY_2, KEY_3, KEY_4, KEY_5 = 2, 3, 4, 5, 6
+    KEY_6, KEY_7, KEY_8, KEY_9, KEY_0 = 7, 8, 9, 10, 11
+    KEY_BACKSPACE = 14
+    KEY_ENTER = 28
+    KEY_KP7, KEY_KP8, KEY_KP9 = 71, 72, 73
+    KEY_KP4, KEY_KP5, KEY_KP6 = 75, 76, 77
+    KEY_KP1, KEY_KP2, KEY_KP3, KEY_KP0 = 79, 80, 81, 82
+    KEY_KPENTER = 96
+
+
+class _SimEvent:
+    __slots__ = ("type", "code", "value", "timestamp")
+
+    def __init__(self, type_, code, value):
+        self.type = type_
+        self.code = code
+        self.value = value
+        self.timestamp = time.time()
+
+
+class SimKeyboard:
+    """Stand-in for an evdev InputDevice; type() queues key presses."""
+
+    def __init__(self, name="Simulated Keyboard"):
+        self.name = name
+        self._events = queue.Queue()
+
+    def grab(self):
+        pass
+
+    def ungrab(self):
+        pass
+
+    def type(self, text, enter=True):
+        codes = {str(d): getattr(ecodes, f"KEY_{d}") for d in range(10)}
+        for ch in text:
+            if ch in codes:
+                self.key(codes[ch])
+        if enter:
+            self.key(ecodes.KEY_ENTER)
+
+    def key(self, code):
+        self._events.put(_SimEvent(ecodes.EV_KEY, code, 1))
+        self._events.put(_SimEvent(ecodes.EV_KEY, code, 0))
+
+    def read_loop(self):
+        # Real read_loop blocks; wake up periodically so callers can
+        # check their timeouts and the START button.
+        while True:
+            try:
+                yield self._events.get(timeout=0.2)
+            except queue.Empty:
+                yield _SimEvent(0, 0, 0)
+
+
+# ============================================================
+# DEVICE FACTORIES
+# ============================================================
+
+if EMULATE:
+    # Simulated keyboards only: don't load evdev at all
+    InputDevice = None
+    ecodes = _SimEcodes
+    list_devices = lambda: []
+else:
+    try:
+        from evdev import InputDevice, ecodes, list_devices
+    except Exception:
+        InputDevice = None
+        ecodes = _SimEcodes
+        list_devices = lambda: []
+
+_gpio = None
+
+
+def load_gpio(emulate=EMULATE):
+    """Return the process-wide GPIO module (shared by every booth)."""
+    global _gpio
+    if _gpio is None:
+        if emulate:
+            _gpio = SimGPIO()
+        else:
+            import RPi.GPIO as GPIO
+            _gpio = GPIO
+    return _gpio
+
+
+def watch_press(gpio, pin, callback):
+    """Call `callback()` on the button's falling edge (pressed), from the
+    GPIO library's thread. Returns False if this GPIO cannot detect edges;
+    the caller then has to read the pin itself."""
+    add = getattr(gpio, "add_event_detect", None)
+    if add is None:
+        return False
+    try:
+        add(pin, gpio.FALLING, callback=lambda _pin: callback(), bouncetime=50)
+    except (RuntimeError, ValueError, AttributeError):
+        return False
+    return True
+
+
+def unwatch_press(gpio, pin):
+    try:
+        gpio.remove_event_detect(pin)
+    except Exception:
+        pass
+
+
+def open_fingerprint(cfg, emulate=EMULATE):
+    if emulate:
+        return SimFingerprint()
+    import serial
+    import adafruit_fingerprint
+    uart = serial.Serial(cfg.uart, baudrate=57600, timeout=1)
+    return adafruit_fingerprint.Adafruit_Fingerprint(uart)
+
+
+def open_oled(cfg, emulate=EMULATE):
+    """Return a luma device, or None if the screen cannot be opened."""
+    if emulate:
+        try:
+            from luma.core.device import dummy
+            return dummy(width=128, height=64, mode="1")
+        except Exception:
+            return None
+    from luma.core.interface.serial import spi
+    from luma.oled.device import sh1106, ssd1306
+    try:
+        serial_conn = spi(device=cfg.spi_device, port=cfg.spi_port,
+                          gpio_DC=cfg.oled_dc, gpio_RST=cfg.oled_rst)
+        try:
+            return sh1106(serial_conn)
+        except Exception:
+            return ssd1306(serial_conn)
+    except Exception:
+        return None
+
+
+def find_keyboard(cfg, emulate=EMULATE):
+    """Find the booth's keyboard (not consumer control or system control)."""
+    if emulate:
+        return SimKeyboard(name=f"{cfg.name} keyboard")
+    if InputDevice is None:
+        return None
+    try:
+        if cfg.keyboard.startswith("/dev/"):
+            return InputDevice(cfg.keyboard)
+        candidates = []
+        for dev_path in list_devices():
+            try:
+                dev = InputDevice(dev_path)
+                name = (dev.name or '').lower()
+                if cfg.keyboard and cfg.keyboard.lower() not in name:
+                    continue
+                # Look for keyboard, but exclude consumer/system control variants
+                if 'keyboard' in name:
+                    if 'consumer' not in name and 'system' not in name:
+                        print(f"✓ Found main keyboard: {dev.name} at {dev_path}")
+                        return dev
+                    candidates.append((dev, dev_path))
+            except Exception:
+                continue
+        # If no exact match, try any keyboard candidate
+        if candidates:
+            dev, dev_path = candidates[0]
+            print(f"✓ Using keyboard: {dev.name} at {dev_path}")
+            return dev
+    except Exception as e:
+        print(f"⚠️ Error finding keyboard: {e}")
+    return None
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Idle Scheduler
+
+Between voters the booth used to wake every 0.5s to read START and request
+/api/kiosk/poll-commands, with VOTE/CHAIN lit at full brightness all day.
+The idle scheduler lets an idle booth sleep until something happens:
+
+- START wakes the booth on its falling edge (GPIO edge detection) instead
+  of at the next poll. GPIO without edge detection (replays, benchmarks) is
+  read every `idle_pin_poll` seconds instead.
+- A poller thread long-polls /api/kiosk/poll-commands?wait=<idle_long_poll>.
+  The backend holds the request until an enrollment is queued, so a pushed
+  command wakes the booth at once. A backend that answers straight away
+  (no ?wait support) is polled with exponential backoff from
+  `idle_poll_min` to `idle_poll_max`; any activity resets it.
+- After `idle_dim_after` seconds the OLED contrast drops to
+  `idle_dim_contrast`; after `idle_blank_after` the panel is switched off.
+  Waking turns it back on at once, and the idle frame is still in the
+  panel's RAM.
+- While idle, idle_cpu_percent (process CPU) and idle_wakeups_per_min (loop
+  wakeups plus poll requests) are published per booth every minute.
+"""
+
+import threading
+import time
+
+import kiosk_hw
+from votechain_config import config
+from votechain_metrics import metrics
+
+STATS_INTERVAL = 60.0
+# Added to ?wait= for the request timeout (tunnel round trip)
+LONG_POLL_SLACK = 5.0
+# luma's SSD1306 default; set on start so SH1106 panels match after a wake
+FULL_CONTRAST = 0xCF
+
+SCREEN_ON = "on"
+SCREEN_DIM = "dim"
+SCREEN_OFF = "off"
+
+
+class IdleScheduler:
+    """Sleeps an idle booth until START, a pushed command or a finished
+    receipt needs it. Reads booth.gpio/backend/device on use, so recording
+    proxies attached after the booth was built are honoured."""
+
+    def __init__(self, booth, stop_event=None):
+        self.booth = booth
+        self.stop_event = stop_event
+        self.wakeups = 0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._pressed = threading.Event()       # START edge since begin()
+        self._poll_now = threading.Event()
+        self._command_done = threading.Event()
+        self._lock = threading.Lock()
+        self._command = None
+        self._edges = False
+        self._poller = None
+        self._screen = SCREEN_ON
+        self._last_activity = time.monotonic()
+        self._poll_delay = config.idle_poll_min
+        self._stats = None                      # (monotonic, cpu, wakeups)
+
+    def start(self):
+        b = self.booth
+        self._edges = kiosk_hw.watch_press(b.gpio, b.cfg.btn_start, self._on_press)
+        self._set_screen(SCREEN_ON, force=True)
+        if b.cfg.enroll:
+            self._poller = threading.Thread(target=self._poll_loop, name=f"{b.name}-commands", daemon=True)
+            self._poller.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._poll_now.set()
+        self._command_done.set()
+        if self._edges:
+            kiosk_hw.unwatch_press(self.booth.gpio, self.booth.cfg.btn_start)
+        self._set_screen(SCREEN_ON)
+
+    def stopped(self):
+        return self._stop.is_set() or (self.stop_event is not None and self.stop_event.is_set())
+
+    def wake(self):
+        """Make wait_for_start() look again (receipt ready, shutting down)."""
+        self._wake.set()
+
+    def _on_press(self):
+        self._pressed.set()
+        self._wake.set()
+
+    def _count_wakeup(self):
+        with self._lock:
+            self.wakeups += 1
+
+    # --- Booth-facing API ---
+
+    def begin(self):
+        """The idle screen is up: inactivity and idle stats start now."""
+        self._pressed.clear()
+        self._last_activity = time.monotonic()
+        self._stats = (time.monotonic(), time.process_time(), self.wakeups)
+
+    def activity(self):
+        """Someone needs the booth: screen on, poll quickly again."""
+        self._publish()
+        self._stats = None
+        self._last_activity = time.monotonic()
+        self._set_screen(SCREEN_ON)
+        if self._poll_delay > config.idle_poll_min:
+            self._poll_delay = config.idle_poll_min
+            self._poll_now.set()
+
+    def wait_for_start(self):
+        """Sleep until START is pressed (True), or until a command or a
+        finished receipt needs the booth or the booth stops (False)."""
+        b = self.booth
+        while not self.stopped():
+            self._wake.clear()
+            if self._pressed.is_set() or b.pressed(b.cfg.btn_start):
+                self.activity()
+                return True
+            if self.has_command() or (b.scheduler and b.scheduler.has_ready()):
+                self.activity()
+                return False
+            self._update_screen()
+            if self._stats and time.monotonic() - self._stats[0] >= STATS_INTERVAL:
+                self._publish()
+                self._stats = (time.monotonic(), time.process_time(), self.wakeups)
+            self._count_wakeup()
+            if self._edges:
+                self._wake.wait(self._next_deadline())
+            else:
+                b.clock.sleep(config.idle_pin_poll)
+        return False
+
+    def has_command(self):
+        with self._lock:
+            return self._command is not None
+
+    def take_command(self):
+        """The pending admin command (dict), or None. Call command_done()
+        once it has been handled so polling resumes."""
+        with self._lock:
+            cmd, self._command = self._command, None
+        return cmd
+
+    def command_done(self):
+        self._command_done.set()
+
+    # --- Screen ---
+
+    def _next_deadline(self):
+        now = time.monotonic()
+        idle_for = now - self._last_activity
+        deadlines = [STATS_INTERVAL - (now - self._stats[0]) if self._stats else STATS_INTERVAL]
+        if self._screen == SCREEN_ON and config.idle_dim_after > 0:
+            deadlines.append(config.idle_dim_after - idle_for)
+        if self._screen != SCREEN_OFF and config.idle_blank_after > 0:
+            deadlines.append(config.idle_blank_after - idle_for)
+        return max(0.05, min(deadlines))
+
+    def _update_screen(self):
+        idle_for = time.monotonic() - self._last_activity
+        if config.idle_blank_after > 0 and idle_for >= config.idle_blank_after:
+            self._set_screen(SCREEN_OFF)
+        elif config.idle_dim_after > 0 and idle_for >= config.idle_dim_after:
+            self._set_screen(SCREEN_DIM)
+
+    def _set_screen(self, state, force=False):
+        if state == self._screen and not force:
+            return
+        device = self.booth.device
+        if device is not None:
+            try:
+                if state == SCREEN_OFF:
+                    device.hide()
+                else:
+                    if self._screen == SCREEN_OFF or force:
+                        device.show()
+                    device.contrast(config.idle_dim_contrast if state == SCREEN_DIM else FULL_CONTRAST)
+            except Exception as e:
+                self.booth.log.warning("screen_power_error", error=e)
+        self._screen = state
+        self.booth.log.debug("screen", state=state)
+
+    # --- Stats ---
+
+    def _publish(self):
+        if not self._stats:
+            return
+        t0, cpu0, wakeups0 = self._stats
+        elapsed = time.monotonic() - t0
+        if elapsed < 1.0:
+            return
+        name = self.booth.name
+        metrics.set("idle_cpu_percent", round((time.process_time() - cpu0) / elapsed * 100, 2), booth=name)
+        metrics.set("idle_wakeups_per_min", round((self.wakeups - wakeups0) / elapsed * 60, 1), booth=name)
+
+    # --- Command poller ---
+
+    def _poll_loop(self):
+        while not self.stopped():
+            wait = config.idle_long_poll
+            path = "/api/kiosk/poll-commands"
+            if wait > 0:
+                path += f"?wait={wait:g}"
+                timeout = wait + LONG_POLL_SLACK
+            else:
+                timeout = config.enroll_poll_timeout
+            self._count_wakeup()
+            start = time.monotonic()
+            try:
+                cmd = self.booth.backend.get(path, timeout=timeout).json()
+            except Exception:
+                cmd = None  # Network blip: back off like an empty answer
+            if cmd and cmd.get('command') not in (None, 'NONE'):
+                self._command_done.clear()
+                with self._lock:
+                    self._command = cmd
+                self.wake()
+                # The backend repeats the command until it is completed
+                self._command_done.wait()
+                self._poll_delay = config.idle_poll_min
+                continue
+            if cmd is not None and wait > 0 and time.monotonic() - start >= wait / 2:
+                continue  # The backend held the request: that was the interval
+            delay = self._poll_delay
+            self._poll_delay = min(delay * 2, config.idle_poll_max)
+            self._poll_now.wait(delay)
+            self._poll_now.clear()
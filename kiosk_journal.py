@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Crash-Safe Session Journal
+
+One append-only JSON-lines file per booth (`journal_dir`/<booth>.jsonl).
+The booth writes a record at every session transition and fsyncs it before
+moving on, so a crash or a systemd restart loses nothing:
+
+    {"t": 1760000000.1, "e": "boot", "ok": true}          health check passed
+    {"t": ..., "e": "session", "stage": "checked_in"}     voter at the booth
+    {"t": ..., "e": "session", "stage": "verified"}
+    {"t": ..., "e": "vote", "key": "<idempotency key>", "ticket": 3,
+     "aadhaar_id": "...", "candidate_id": 1}              before /api/vote
+    {"t": ..., "e": "vote_done", "key": "...", "state": "DONE", ...}
+    {"t": ..., "e": "idle"}                               back at idle
+
+On restart, load() folds the file into a JournalState:
+
+- A session that never reached "vote" is rolled back. Check-in holds no
+  state on the backend, so the voter simply starts again.
+- A "vote" without "vote_done" is resubmitted with the same Idempotency-Key:
+  the backend replays its first answer, and the contract rejects a second
+  ballot from the same voter in any case. The replay only lasts as long as
+  the backend's in-memory cache (15 minutes, per instance), so a resend
+  refused as a double vote means the first one was counted: it is journaled
+  as "vote_done" with state DONE and "no_receipt": true, not as a failure.
+- If the journal shows a passed health check and activity within
+  `journal_trust_seconds`, the kiosk skips the boot health check.
+
+A torn last line (power cut mid-write) is ignored. The Aadhaar number is
+only kept while a vote is unconfirmed: once the booth is idle again,
+compact() rewrites the file without finished votes. The file is mode 0600.
+"""
+
+import json
+import os
+import threading
+import time
+
+from votechain_config import config
+from votechain_metrics import metrics
+
+COMPACT_BYTES = 64 * 1024
+
+
+class JournalState:
+    """What the journal says about the booth when the kiosk went down."""
+
+    def __init__(self):
+        self.boot_ok = None         # time of the last passed health check
+        self.last_seen = None       # time of the last record
+        self.session = None         # stage of a session cut short, if any
+        self.pending = {}           # idempotency key -> "vote" record
+        self.finished = 0           # votes done since the last compaction
+        self.torn = False           # last line incomplete
+
+    def apply(self, rec):
+        event = rec.get("e")
+        self.last_seen = rec.get("t", self.last_seen)
+        if event == "boot":
+            self.boot_ok = rec["t"] if rec.get("ok") else None
+        elif event == "session":
+            self.session = rec.get("stage")
+        elif event == "vote":
+            self.session = None
+            self.pending[rec["key"]] = rec
+        elif event == "vote_done":
+            self.pending.pop(rec.get("key"), None)
+            self.finished += 1
+        elif event == "idle":
+            self.session = None
+
+    def trusted(self, now=None, trust_seconds=None):
+        """True if the boot health check can be skipped."""
+        if trust_seconds is None:
+            trust_seconds = config.journal_trust_seconds
+        if self.boot_ok is None or self.last_seen is None or trust_seconds <= 0:
+            return False
+        now = time.time() if now is None else now
+        # A Pi without an RTC can boot with its clock behind; don't trust that
+        return -1 <= now - self.last_seen <= trust_seconds
+
+
+class Journal:
+    """Append-only, fsync'd record of one booth's session transitions.
+    Safe to call from the booth thread and vote-submit workers."""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = JournalState()
+        self._lock = threading.Lock()
+        self._f = None
+
+    @classmethod
+    def for_booth(cls, name):
+        """The booth's journal, or None if `journal_dir` is unset."""
+        if not config.journal_dir:
+            return None
+        return cls(os.path.join(config.journal_dir, f"{name}.jsonl"))
+
+    def load(self):
+        """Read what is on disk; returns (and keeps) the JournalState."""
+        state = JournalState()
+        try:
+            with open(self.path, "rb") as f:
+                for raw in f:
+                    try:
+                        state.apply(json.loads(raw))
+                        state.torn = False
+                    except (ValueError, KeyError):
+                        state.torn = True
+        except FileNotFoundError:
+            pass
+        self.state = state
+        return state
+
+    def _open(self):
+        if self._f is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+            self._f = os.fdopen(fd, "a+", encoding="utf-8")
+            # Don't glue the next record onto a line torn by a power cut
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                self._f.write("\n")
+        return self._f
+
+    def record(self, event, **fields):
+        """Append one record and fsync it. Journal trouble is logged, never
+        raised: a full SD card must not stop the voter's session."""
+        rec = dict(t=round(time.time(), 3), e=event, **fields)
+        line = json.dumps(rec, separators=(",", ":"))
+        start = time.perf_counter()
+        with self._lock:
+            self.state.apply(rec)
+            try:
+                f = self._open()
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            except OSError as e:
+                metrics.inc("journal_errors")
+                print(f"⚠️ Journal write failed ({self.path}): {e}")
+                return
+        metrics.observe("journal_fsync_s", time.perf_counter() - start)
+
+    def compact(self, force=False):
+        """Rewrite the file as the last boot record, the unconfirmed votes
+        and an idle mark (atomic rename), dropping finished votes and their
+        Aadhaar numbers. Runs when a vote has finished or the file passed
+        COMPACT_BYTES; call while the booth is idle."""
+        with self._lock:
+            state = self.state
+            try:
+                if not (force or state.finished or state.torn or (
+                        os.path.exists(self.path) and os.path.getsize(self.path) >= COMPACT_BYTES)):
+                    return
+                tmp = f"{self.path}.tmp"
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    if state.boot_ok is not None:
+                        f.write(json.dumps({"t": state.boot_ok, "e": "boot", "ok": True},
+                                           separators=(",", ":")) + "\n")
+                    for rec in state.pending.values():
+                        f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+                    f.write(json.dumps({"t": round(time.time(), 3), "e": "idle"},
+                                       separators=(",", ":")) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                if self._f is not None:
+                    self._f.close()
+                    self._f = None
+                os.replace(tmp, self.path)
+                state.session = None
+                state.finished = 0
+                state.torn = False
+            except OSError as e:
+                metrics.inc("journal_errors")
+                print(f"⚠️ Journal compaction failed ({self.path}): {e}")
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Structured Logging
+
+Booth code logs events, not formatted lines:
+
+    log = kiosk_log.get("booth-1")
+    log.debug("key", code=5)
+    log.info("aadhaar_entered", aadhaar=digits)      # -> aadhaar=********9012
+
+The calling thread only checks the level, applies the debug rate limit and
+puts the record on a bounded queue; formatting, redaction and the write to
+stdout (the journal under systemd) happen on one background writer thread.
+A keystroke therefore never waits on journald. When the queue is full the
+record is dropped and counted (log_dropped metric), never blocked on.
+
+Redaction: fields named in SECRET_FIELDS show only their last 4 characters,
+and any 12-digit run in a message or field (an Aadhaar number) is masked
+the same way. secret=True hides every digit of the line, for screens that
+show a partly typed Aadhaar.
+
+DEBUG records are rate-limited per event name (log_debug_per_second); the
+next one let through carries how many were suppressed. The level is
+log_level in votechain_config (KIOSK_LOG_LEVEL) and follows reloads.
+"""
+
+import atexit
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from votechain_config import config
+from votechain_metrics import metrics
+
+QUEUE_SIZE = 1000
+SECRET_FIELDS = {"aadhaar", "aadhaar_id", "digits"}
+_AADHAAR = re.compile(r"(?<!\d)\d{8}(\d{4})(?!\d)")
+_DIGIT = re.compile(r"\d")
+
+_lock = threading.Lock()
+_listener = None
+_root = logging.getLogger("kiosk")
+
+
+def mask(value):
+    """Keep the last 4 characters, like a masked Aadhaar card."""
+    value = str(value)
+    return "*" * max(0, len(value) - 4) + value[-4:]
+
+
+def redact(text):
+    return _AADHAAR.sub(lambda m: "********" + m.group(1), text)
+
+
+class EventFormatter(logging.Formatter):
+    """`L [name] event key=value ...`, secrets masked."""
+
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        parts = [record.getMessage()]
+        for key, value in fields.items():
+            if value is None:
+                continue
+            if key in SECRET_FIELDS:
+                value = mask(value)
+            elif isinstance(value, (tuple, list)):
+                value = " | ".join(str(v) for v in value)
+            parts.append(f"{key}={value}")
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            parts.append(f"(+{suppressed} suppressed)")
+        line = redact(" ".join(parts))
+        if getattr(record, "secret", False):
+            line = _DIGIT.sub("*", line)
+        line = f"{record.levelname[0]} [{record.name.removeprefix('kiosk.')}] {line}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class _DroppingQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Formatting happens on the writer thread, not here
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_dropped")
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is now (replays redirect it)."""
+
+    def emit(self, record):
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+class EventLogger:
+    """Thin front end to a logging.Logger: event name plus fields."""
+
+    def __init__(self, logger):
+        self.logger = logger
+        self._debug_window = {}     # event -> (window start, count, suppressed)
+
+    def _allow_debug(self, event):
+        now = time.monotonic()
+        start, count, suppressed = self._debug_window.get(event, (now, 0, 0))
+        if now - start >= 1.0:
+            start, count = now, 0
+        if count >= config.log_debug_per_second:
+            self._debug_window[event] = (start, count, suppressed + 1)
+            return None
+        self._debug_window[event] = (start, count + 1, 0)
+        return suppressed
+
+    def log(self, level, event, exc_info=None, secret=False, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        extra = {"fields": fields, "secret": secret}
+        if level <= logging.DEBUG:
+            suppressed = self._allow_debug(event)
+            if suppressed is None:
+                return
+            extra["suppressed"] = suppressed
+        self.logger.log(level, event, exc_info=exc_info, extra=extra)
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, exc_info=None, **fields):
+        self.log(logging.ERROR, event, exc_info=exc_info, **fields)
+
+
+def _apply_level(changed=None):
+    if changed is None or "log_level" in changed:
+        _root.setLevel(config.log_level)
+
+
+def setup():
+    """Start the writer thread (once). get() calls this."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        writer = _StdoutHandler(sys.stdout)
+        writer.setFormatter(EventFormatter())
+        _listener = QueueListener(queue.Queue(QUEUE_SIZE), writer)
+        _root.addHandler(_DroppingQueueHandler(_listener.queue))
+        _root.propagate = False
+        _apply_level()
+        config.on_change(_apply_level)
+        _listener.start()
+        # Write out whatever is still queued at exit
+        atexit.register(_listener.stop)
+
+
+def get(name):
+    """Logger for one booth (or component)."""
+    setup()
+    return EventLogger(logging.getLogger(f"kiosk.{name}"))
@@ -2,1092 +2,1522 @@
 """
 VoteChain V3 Kiosk - Main Entry Point
 Biometric voting terminal with fingerprint authentication
+
+All hardware access goes through a Booth (pins, OLED, fingerprint sensor and
+keyboard of one voting booth). Running this file drives a single booth wired
+as below; kiosk_booths.py runs several booths from one process.
 """
 
 import time
 import sys
-import tty
-import termios
-import select
 import atexit
+import functools
 import threading
-
-# Optional global keyboard capture (works without terminal focus)
-try:
-    from evdev import InputDevice, ecodes, list_devices
-except Exception:
-    InputDevice = None
-    ecodes = None
-    list_devices = lambda: []
-
-import serial
-import adafruit_fingerprint
-import requests
-import RPi.GPIO as GPIO
-from luma.core.interface.serial import spi
-from luma.core.render import canvas
-from luma.oled.device import sh1106, ssd1306 
-
-# Pre-declare globals to satisfy static analysis (will be initialized later)
-device = None
+import uuid
+from contextlib import contextmanager
+
+import kiosk_ballot
+import kiosk_hw
+import kiosk_idle
+import kiosk_journal
+import kiosk_log
+import kiosk_memory
+import kiosk_voted_filter
+from kiosk_hw import BoothConfig, FP_OK, FP_NOFINGER, FP_IMAGEFAIL, ecodes
+from kiosk_backend import BackendClient
+from kiosk_discovery import discovery_from_env
+from kiosk_sessions import SessionScheduler, DONE, FAILED, TICKET_DIGITS, is_double_vote
+import kiosk_profiler
+from votechain_config import ConfigError, config
+from votechain_metrics import metrics
 
 # --- CONFIGURATION ---
-# ⚠️ UPDATE THIS IP IF YOUR LAPTOP IP CHANGES ⚠️
-BACKEND_URL = "http://127.0.0.1:3000"
+# Backend URLs, timeouts and poll intervals live in votechain_config.py
+# (votechain.json / environment) and are read where they are used, so they
+# can be changed with a reload (SIGHUP) while a voter is at the booth.
+# config.backend_urls is a fallback only: with SUPABASE_URL/SUPABASE_ANON_KEY
+# available the kiosk follows the tunnel URL published in system_config,
+# see kiosk_discovery.py.
 
 # --- PIN LAYOUT (BCM) ---
 PIN_LED_GREEN = 17
 PIN_LED_RED = 27
 PIN_BUZZER = 18
 PIN_BTN_START = 4  # The Admin/Start Button
-PIN_BTN_A = 22     # Candidate A
-PIN_BTN_B = 23     # Candidate B
+PIN_BTN_A = 22     # Candidate A (next candidate on longer ballots)
+PIN_BTN_B = 23     # Candidate B (select on longer ballots)
 
 # OLED (SPI)
 OLED_DC = 24
 OLED_RST = 25
 
+# --- PIPELINED SESSIONS ---
+# config.pipeline_max_in_flight: votes allowed to confirm in the background
+# while the next voter starts (0 = blocking one-voter-at-a-time flow).
+# config.receipt_flash_seconds: how long a finished receipt is shown on the
+# idle screen; config.receipt_side_screen: optional side screen for receipts
+# (e.g. "/dev/tty1" on the HDMI console). Without one, a voter looks their
+# receipt up by typing the ticket number at the Aadhaar prompt.
+
+# --- BALLOT ---
+# The candidates come from the contract via /api/candidates and are cached
+# in config.ballot_cache (kiosk_ballot.py); every ballot screen is
+# prerendered, so showing the ballot costs no network round trip.
+
+# --- VOTED FILTER ---
+# With config.voted_filter the kiosk replicates the backend's Bloom filter of
+# voters who have voted (kiosk_voted_filter.py): a repeat attempt is turned
+# away as soon as the Aadhaar is entered, and only the hit is confirmed.
+
+# --- SESSION JOURNAL ---
+# config.journal_dir holds one crash-safe journal per booth (kiosk_journal.py):
+# after a restart the interrupted session is rolled back or its vote resent,
+# and the boot health check is skipped within config.journal_trust_seconds.
+
+# --- SESSION RECORDING ---
+# config.record_path captures inputs/backend responses for kiosk_replay.py,
+# e.g. KIOSK_RECORD=/var/log/votechain/{booth}-%Y%m%d-%H%M%S.jsonl.gz
+
+DEFAULT_BOOTH = BoothConfig(
+    name="booth-1",
+    led_green=PIN_LED_GREEN, led_red=PIN_LED_RED, buzzer=PIN_BUZZER,
+    btn_start=PIN_BTN_START, btn_a=PIN_BTN_A, btn_b=PIN_BTN_B,
+    oled_dc=OLED_DC, oled_rst=OLED_RST,
+)
+
+FONT_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size=None):
+    """One font object per size for the whole process (None = PIL's default
+    bitmap font). Loading FONT_BOLD reads the file and builds a new FreeType
+    face every time."""
+    from PIL import ImageFont
+    if size is None:
+        return ImageFont.load_default()
+    try:
+        return ImageFont.truetype(FONT_BOLD, size)
+    except Exception:
+        return ImageFont.load_default()
 
-# --- HARDWARE HEALTH CHECK ---
 
-def hardware_health_check(device):
-    status = {}
-    # Test LEDs
-    try:
+class Booth:
+    """One voting booth: its own pins, OLED, fingerprint sensor and keyboard.
+
+    Booths only share the GPIO module, the backend client and metrics, so a
+    slow sensor or a stuck keyboard at one booth never blocks another.
+    """
+
+    def __init__(self, cfg, gpio, device, finger, keyboard=None, backend=None,
+                 pipeline=None, clock=time, journal=None, ballot=None, voted_filter=None):
+        self.cfg = cfg
+        self.name = cfg.name
+        self.gpio = gpio
+        self.device = device
+        self.finger = finger
+        self.keyboard = keyboard
+        # Structured, queued logging for everything on the voter path
+        self.log = kiosk_log.get(cfg.name)
+        self._screen_warned = False
+        self._idle_frame = None
+        # Prerendered ballot screens, keyed (ballot version, kind, index)
+        self._ballot_frames = {}
+        self._ballot_version = None
+        # One image buffer per booth, redrawn for every frame (see frame())
+        self._frame = None
+        self._frame_draw = None
+        self._frame_lock = threading.Lock()
+        # kiosk_idle.IdleScheduler while run() is going
+        self.idle = None
+        self.backend = backend or BackendClient(config.backend_urls)
+        # Anything with time() and sleep(); replays swap in a scaled clock
+        self.clock = clock
+        # kiosk_journal.Journal, or None to keep no journal
+        self.journal = journal
+        # kiosk_ballot.Ballot; the built-in two candidates if none is given
+        self.ballot = ballot or kiosk_ballot.Ballot()
+        # kiosk_voted_filter.VotedFilter shared by the kiosk's booths, or None
+        self.voted_filter = voted_filter
+        self.scheduler = None
+        if pipeline is None:
+            pipeline = config.pipeline_max_in_flight
+        if pipeline > 0:
+            self.scheduler = SessionScheduler(self.backend, max_in_flight=pipeline,
+                                              vote_timeout=config.vote_timeout,
+                                              receipt_timeout=config.receipt_timeout,
+                                              poll_interval=config.receipt_poll_interval,
+                                              on_complete=self.announce_receipt,
+                                              clock=clock, log=self.log)
+            config.on_change(self.apply_config)
+
+    def apply_config(self, changed):
+        """Hand reloaded timeouts to the session scheduler (new votes only)."""
+        for name, attr in (("vote_timeout", "vote_timeout"), ("receipt_timeout", "receipt_timeout"),
+                           ("receipt_poll_interval", "poll_interval")):
+            if name in changed:
+                setattr(self.scheduler, attr, changed[name][1])
+
+    @classmethod
+    def open(cls, cfg, backend=None, emulate=kiosk_hw.EMULATE, **kwargs):
+        """Open the booth's hardware. The fingerprint sensor is opened last;
+        a failure is re-raised so the caller can show it on the OLED."""
+        kwargs.setdefault("journal", kiosk_journal.Journal.for_booth(cfg.name))
+        if kwargs.get("ballot") is None:
+            kwargs["ballot"] = kiosk_ballot.Ballot.for_kiosk()
+        gpio = kiosk_hw.load_gpio(emulate)
+        device = kiosk_hw.open_oled(cfg, emulate)
+        booth = cls(cfg, gpio, device, None, kiosk_hw.find_keyboard(cfg, emulate),
+                    backend=backend, **kwargs)
+        booth.setup_pins()
+        booth.finger = kiosk_hw.open_fingerprint(cfg, emulate)
+        return booth
+
+    def setup_pins(self):
+        GPIO, c = self.gpio, self.cfg
         GPIO.setmode(GPIO.BCM)
-        GPIO.setup(PIN_LED_GREEN, GPIO.OUT, initial=GPIO.LOW)
-        GPIO.setup(PIN_LED_RED, GPIO.OUT, initial=GPIO.LOW)
-        GPIO.output(PIN_LED_GREEN, GPIO.HIGH)
-        GPIO.output(PIN_LED_RED, GPIO.HIGH)
-        time.sleep(0.5)
-        GPIO.output(PIN_LED_GREEN, GPIO.LOW)
-        GPIO.output(PIN_LED_RED, GPIO.LOW)
-        status['LEDs'] = 'OK'
-    except Exception as e:
-        status['LEDs'] = f"FAIL: {e}"
-    # Test Buttons
-    try:
-        GPIO.setup(PIN_BTN_START, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        GPIO.setup(PIN_BTN_A, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        GPIO.setup(PIN_BTN_B, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        btns = [GPIO.input(PIN_BTN_START), GPIO.input(PIN_BTN_A), GPIO.input(PIN_BTN_B)]
-        status['Buttons'] = 'OK' if all(x in [0,1] for x in btns) else 'FAIL: Bad read'
-    except Exception as e:
-        status['Buttons'] = f"FAIL: {e}"
-    # Test OLED
-    try:
-        if 'device' in globals() and device:
-            with canvas(device) as draw:
-                draw.rectangle(device.bounding_box, fill="black")
-                draw.text((10, 10), "OLED OK", fill="white")
-            status['OLED'] = 'OK'
+        GPIO.setwarnings(False)
+        # Outputs (set initial LOW to avoid pre-read on lgpio backend)
+        GPIO.setup(c.led_green, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.setup(c.led_red, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.setup(c.buzzer, GPIO.OUT, initial=GPIO.LOW)
+        # Inputs (Internal Pull-up)
+        GPIO.setup(c.btn_start, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        GPIO.setup(c.btn_a, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        GPIO.setup(c.btn_b, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+
+    def pressed(self, pin):
+        return self.gpio.input(pin) == self.gpio.LOW
+
+    # --- HARDWARE HEALTH CHECK ---
+
+    def hardware_health_check(self):
+        GPIO, c, device = self.gpio, self.cfg, self.device
+        status = {}
+        # Test LEDs
+        try:
+            GPIO.setup(c.led_green, GPIO.OUT, initial=GPIO.LOW)
+            GPIO.setup(c.led_red, GPIO.OUT, initial=GPIO.LOW)
+            GPIO.output(c.led_green, GPIO.HIGH)
+            GPIO.output(c.led_red, GPIO.HIGH)
+            self.clock.sleep(0.5)
+            GPIO.output(c.led_green, GPIO.LOW)
+            GPIO.output(c.led_red, GPIO.LOW)
+            status['LEDs'] = 'OK'
+        except Exception as e:
+            status['LEDs'] = f"FAIL: {e}"
+        # Test Buttons
+        try:
+            GPIO.setup(c.btn_start, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            GPIO.setup(c.btn_a, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            GPIO.setup(c.btn_b, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            btns = [GPIO.input(c.btn_start), GPIO.input(c.btn_a), GPIO.input(c.btn_b)]
+            status['Buttons'] = 'OK' if all(x in [0,1] for x in btns) else 'FAIL: Bad read'
+        except Exception as e:
+            status['Buttons'] = f"FAIL: {e}"
+        # Test OLED
+        try:
+            if device:
+                with self.frame() as draw:
+                    draw.rectangle(device.bounding_box, fill="black")
+                    draw.text((10, 10), "OLED OK", fill="white")
+                status['OLED'] = 'OK'
+            else:
+                status['OLED'] = 'FAIL: Not initialized'
+        except Exception as e:
+            status['OLED'] = f"FAIL: {e}"
+        print(f"Hardware Health Check ({self.name}):")
+        for k,v in status.items():
+            print(f"  {k}: {v}")
+        # Show status on OLED
+        try:
+            lines = [f"{k}: {v}" for k,v in status.items()]
+            if device:
+                with self.frame() as draw:
+                    draw.rectangle(device.bounding_box, fill="black")
+                    for i, line in enumerate(lines):
+                        draw.text((5, 8 + i*14), line, fill="white")
+                self.clock.sleep(2)
+        except Exception:
+            pass
+        return status
+
+    def boot(self):
+        """Run the boot health check, unless the journal shows this booth
+        healthy and active within journal_trust_seconds (a crash or a
+        restart mid-session). Then recover whatever the journal left open."""
+        state = self.journal.load() if self.journal else None
+        if state is not None and state.trusted():
+            self.log.info("health_check_skipped", last_seen_s=round(time.time() - state.last_seen, 1))
         else:
-            status['OLED'] = 'FAIL: Not initialized'
-    except Exception as e:
-        status['OLED'] = f"FAIL: {e}"
-    print("Hardware Health Check:")
-    for k,v in status.items():
-        print(f"  {k}: {v}")
-    # Show status on OLED
-    try:
-        lines = [f"{k}: {v}" for k,v in status.items()]
-        if 'device' in globals() and device:
-            with canvas(device) as draw:
-                draw.rectangle(device.bounding_box, fill="black")
-                for i, line in enumerate(lines):
-                    draw.text((5, 8 + i*14), line, fill="white")
-            time.sleep(2)
-    except Exception:
-        pass
-    return status
-
-# Initialize OLED once
-
-
-# --- 1. SENSOR SETUP ---
-finger = None
-finger_error = None
-try:
-    uart = serial.Serial("/dev/ttyAMA0", baudrate=57600, timeout=1)
-    finger = adafruit_fingerprint.Adafruit_Fingerprint(uart)
-    print("✓ Fingerprint sensor initialized")
-except Exception as e:
-    finger_error = str(e)
-    print(f"❌ FATAL: Fingerprint sensor unavailable: {e}")
-    print("❌ Please check the wiring and connections.")
-    print("❌ Cannot start kiosk without fingerprint scanner.")
-    try:
-        if 'device' in globals() and device:
-            from luma.core.render import canvas
-            from PIL import ImageFont
+            status = self.hardware_health_check()
+            self._journal("boot", ok=all(v == 'OK' for v in status.values()))
+        if state is not None:
+            self.recover(state)
+
+    def recover(self, state):
+        """Roll back a session cut short before the ballot was cast and
+        resend votes that were submitted but never confirmed."""
+        if state.session:
+            self.log.warning("session_rolled_back", stage=state.session)
+            self.show_msg("Session Interrupted", "Please start again", "")
+            self.set_leds(green=False, red=True)
+            self.clock.sleep(2)
+        for rec in list(state.pending.values()):
+            self.log.info("vote_resumed", ticket=rec.get("ticket"))
+            metrics.inc("journal_votes_resumed", booth=self.name)
+            if self.scheduler and rec.get("ticket"):
+                self.scheduler.resume(rec["ticket"], rec["aadhaar_id"], rec["candidate_id"], rec["key"])
+            else:
+                self.submit_vote(rec["aadhaar_id"], rec["candidate_id"], idempotency_key=rec["key"])
+        self._journal("idle")
+        self.journal.compact(force=True)
+
+    def _journal(self, event, **fields):
+        if self.journal:
+            self.journal.record(event, **fields)
+
+    def show_sensor_error(self, finger_error):
+        """Persistent OLED error when the fingerprint sensor is unavailable."""
+        device = self.device
+        try:
+            if device:
+                font = load_font(16)
+                with self.frame() as draw:
+                    draw.rectangle(device.bounding_box, fill="black")
+                    msg1 = "FINGERPRINT ERROR"
+                    msg2 = "Check wiring & restart"
+                    msg3 = f"{finger_error}" if finger_error else ""
+                    if font:
+                        draw.text((10, 10), msg1, fill="white", font=font)
+                        draw.text((10, 32), msg2, fill="white", font=font)
+                        draw.text((10, 54), msg3[:device.width//8], fill="white", font=font)
+                    else:
+                        draw.text((10, 10), msg1, fill="white")
+                        draw.text((10, 32), msg2, fill="white")
+                        draw.text((10, 54), msg3[:device.width//8], fill="white")
+            # Set red LED directly
             try:
-                font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16)
+                self.gpio.output(self.cfg.led_red, self.gpio.HIGH)
             except:
-                font = None
-            with canvas(device) as draw:
-                draw.rectangle(device.bounding_box, fill="black")
-                msg1 = "FINGERPRINT ERROR"
-                msg2 = "Check wiring & restart"
-                msg3 = f"{finger_error}" if finger_error else ""
-                if font:
-                    draw.text((10, 10), msg1, fill="white", font=font)
-                    draw.text((10, 32), msg2, fill="white", font=font)
-                    draw.text((10, 54), msg3[:device.width//8], fill="white", font=font)
-                else:
-                    draw.text((10, 10), msg1, fill="white")
-                    draw.text((10, 32), msg2, fill="white")
-                    draw.text((10, 54), msg3[:device.width//8], fill="white")
-        # Set red LED directly (set_leds not defined yet)
-        try:
-            GPIO.output(PIN_LED_RED, GPIO.HIGH)
-        except:
-            pass
-    except Exception as ex:
-        print(f"Error displaying fingerprint error: {ex}")
-    # Do not exit, just wait for manual intervention
-    while True:
-        time.sleep(10)
-
-# --- 2. GPIO & OLED SETUP ---
-GPIO.setmode(GPIO.BCM)
-GPIO.setwarnings(False)
-
-# Always release GPIO on exit/crash
-def _cleanup_gpio():
-    try:
-        GPIO.output(PIN_LED_GREEN, GPIO.LOW)
-        GPIO.output(PIN_LED_RED, GPIO.LOW)
-    except Exception:
-        pass
-    try:
-        GPIO.cleanup()
-    except Exception:
-        pass
+                pass
+        except Exception as ex:
+            print(f"Error displaying fingerprint error: {ex}")
 
-atexit.register(_cleanup_gpio)
+    # --- HELPER FUNCTIONS ---
 
-# Outputs (set initial LOW to avoid pre-read on lgpio backend)
-GPIO.setup(PIN_LED_GREEN, GPIO.OUT, initial=GPIO.LOW)
-GPIO.setup(PIN_LED_RED, GPIO.OUT, initial=GPIO.LOW)
-GPIO.setup(PIN_BUZZER, GPIO.OUT, initial=GPIO.LOW)
+    def beep(self, count=1, duration=0.1):
+        for _ in range(count):
+            self.gpio.output(self.cfg.buzzer, self.gpio.HIGH)
+            self.clock.sleep(duration)
+            self.gpio.output(self.cfg.buzzer, self.gpio.LOW)
+            self.clock.sleep(0.05)
 
-# Inputs (Internal Pull-up)
-GPIO.setup(PIN_BTN_START, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-GPIO.setup(PIN_BTN_A, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-GPIO.setup(PIN_BTN_B, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+    def beep_success(self):
+        self.beep(2, 0.08)
 
-# Initialize OLED
-try:
-    serial_conn = spi(device=0, port=0, gpio_DC=OLED_DC, gpio_RST=OLED_RST)
-    try:
-        device = sh1106(serial_conn)
-    except:
-        device = ssd1306(serial_conn)
-except:
-    device = None
-
-if device is None:
-    print("❌ SCREEN INITIALIZATION FAILED: Check SPI wiring!")
-else:
-    print("✅ Screen initialized successfully.")
-
-# --- HELPER FUNCTIONS ---
-
-def beep(count=1, duration=0.1):
-    for _ in range(count):
-        GPIO.output(PIN_BUZZER, GPIO.HIGH)
-        time.sleep(duration)
-        GPIO.output(PIN_BUZZER, GPIO.LOW)
-        time.sleep(0.05)
-
-def beep_success():
-    beep(2, 0.08)
-
-def beep_error():
-    beep(1, 0.5)
-    time.sleep(0.1)
-    beep(1, 0.2)
-
-def beep_prompt():
-    beep(1, 0.05)
-
-def wait_for_reset():
-    """Wait for the START button to be pressed, then return 'RESET'."""
-    while True:
-        if GPIO.input(PIN_BTN_START) == GPIO.LOW:
-            time.sleep(0.2)
-            return "RESET"
-        time.sleep(0.1)
+    def beep_error(self):
+        self.beep(1, 0.5)
+        self.clock.sleep(0.1)
+        self.beep(1, 0.2)
 
-def set_leds(green=False, red=False):
-    GPIO.output(PIN_LED_GREEN, GPIO.HIGH if green else GPIO.LOW)
-    GPIO.output(PIN_LED_RED, GPIO.HIGH if red else GPIO.LOW)
+    def beep_prompt(self):
+        self.beep(1, 0.05)
 
-def show_msg(line1, line2="", line3="", big_text=False):
-    print(f"[DISPLAY] {line1} | {line2} | {line3}")
-    # Try to import ImageFont once; if not available, leave as None and fall back to default rendering
-    try:
-        from PIL import ImageFont
-    except Exception:
-        ImageFont = None
-    # LED Logic
-    l1 = str(line1).lower()
-    l2 = str(line2).lower()
-    if "idle" in l1 or "votechain" in l1 or "enter aadhaar" in l1:
-        set_leds(green=True, red=False)
-    elif "submitting" in l1 or "waiting" in l2:
-        set_leds(green=True, red=True)
-    elif "confirmed" in l1 or "success" in l2:
-        set_leds(green=True, red=False)
-    elif "rejected" in l1 or "fail" in l2 or "denied" in l2 or "mismatch" in l2:
-        set_leds(green=False, red=True)
-    # Screen Logic
-    if device:
-        try:
-            with canvas(device) as draw:
-                draw.rectangle(device.bounding_box, fill="black")
-                if big_text:
-                    try:
-                        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16)
-                    except:
-                        font = ImageFont.load_default()
-                    draw.text((5, 20), str(line1), fill="white", font=font)
+    def wait_for_reset(self):
+        """Wait for the START button to be pressed, then return 'RESET'."""
+        while True:
+            if self.pressed(self.cfg.btn_start):
+                self.clock.sleep(0.2)
+                return "RESET"
+            self.clock.sleep(0.1)
+
+    def set_leds(self, green=False, red=False):
+        GPIO = self.gpio
+        GPIO.output(self.cfg.led_green, GPIO.HIGH if green else GPIO.LOW)
+        GPIO.output(self.cfg.led_red, GPIO.HIGH if red else GPIO.LOW)
+
+    @contextmanager
+    def frame(self):
+        """Draw into the booth's reused image buffer, then send it to the
+        OLED. Same as luma's canvas(device), minus a new image per frame;
+        nothing is sent if drawing raises."""
+        device = self.device
+        with self._frame_lock:
+            if self._frame is None or self._frame.size != device.size:
+                from PIL import Image, ImageDraw
+                self._frame = Image.new(device.mode, device.size)
+                self._frame_draw = ImageDraw.Draw(self._frame)
+            draw = self._frame_draw
+            draw.rectangle(device.bounding_box, fill="black")
+            yield draw
+            device.display(self._frame)
+
+    def show_msg(self, line1, line2="", line3="", big_text=False, secret=False, frame_key=None):
+        """secret=True: the lines show (part of) an Aadhaar; digits are
+        hidden in the log. frame_key: send this prerendered frame instead
+        of drawing (see prerender_ballot)."""
+        device = self.device
+        self.log.debug("display", lines=(line1, line2, line3), secret=secret)
+        # LED Logic
+        l1 = str(line1).lower()
+        l2 = str(line2).lower()
+        if "idle" in l1 or "votechain" in l1 or "enter aadhaar" in l1:
+            self.set_leds(green=True, red=False)
+        elif "submitting" in l1 or "waiting" in l2:
+            self.set_leds(green=True, red=True)
+        elif "confirmed" in l1 or "success" in l2:
+            self.set_leds(green=True, red=False)
+        elif "rejected" in l1 or "fail" in l2 or "denied" in l2 or "mismatch" in l2:
+            self.set_leds(green=False, red=True)
+        # Screen Logic
+        if device:
+            try:
+                image = self._ballot_frames.get(frame_key) if frame_key is not None else None
+                if image is not None:
+                    device.display(image)
                 else:
-                    font = ImageFont.load_default()
-                    draw.text((5, 5), str(line1), fill="white", font=font)
-                    draw.text((5, 25), str(line2), fill="white", font=font)
-                    draw.text((5, 45), str(line3), fill="white", font=font)
+                    with self.frame() as draw:
+                        self._draw_msg(draw, device, line1, line2, line3, big_text)
+            except Exception as e:
+                self.log.warning("screen_draw_error", error=e)
+        elif not self._screen_warned:
+            self._screen_warned = True
+            self.log.warning("screen_not_initialized")
+
+    def _draw_msg(self, draw, device, line1, line2, line3, big_text):
+        draw.rectangle(device.bounding_box, fill="black")
+        if big_text:
+            draw.text((5, 20), str(line1), fill="white", font=load_font(16))
+        else:
+            font = load_font()
+            draw.text((5, 5), str(line1), fill="white", font=font)
+            draw.text((5, 25), str(line2), fill="white", font=font)
+            draw.text((5, 45), str(line3), fill="white", font=font)
+
+    def prerender_ballot(self):
+        """Render every screen of the current ballot once per ballot version
+        (call while idle). Cheap when nothing changed."""
+        device = self.device
+        version, candidates = self.ballot.current()
+        if not device or version == self._ballot_version:
+            return
+        from PIL import Image, ImageDraw
+        start = time.perf_counter()
+        frames = {}
+        try:
+            for kind, index in kiosk_ballot.screens(candidates)[:kiosk_ballot.PRERENDER_MAX]:
+                image = Image.new(device.mode, device.size)
+                self._draw_msg(ImageDraw.Draw(image), device,
+                               *kiosk_ballot.screen(candidates, kind, index), big_text=False)
+                frames[(version, kind, index)] = image
         except Exception as e:
-            print(f"⚠️ Screen Draw Error: {e}")
-    else:
-        print("⚠️ Screen not initialized (device is None)")
-
-
-def show_idle():
-    """Display the idle screen: two-line centered title "VOTE" / "CHAIN" with larger font and shadow.
+            self.log.warning("ballot_prerender_error", error=e)
+            return
+        # Swapped whole: frames of the previous ballot are dropped with it
+        self._ballot_frames = frames
+        self._ballot_version = version
+        metrics.observe("ballot_prerender_s", time.perf_counter() - start, booth=self.name)
+        self.log.info("ballot_prerendered", version=version[:8], candidates=len(candidates), frames=len(frames))
+
+    def show_idle(self):
+        """Display the idle screen: two-line centered title "VOTE" / "CHAIN" with larger font and shadow.
+
+        This rendering is only used for the idle screen; other screens still use `show_msg()`.
+        The frame is rendered once and cached, so returning to idle only sends it to the panel.
+        """
+        device = self.device
+        # If device not ready, fall back to basic message
+        if not device:
+            try:
+                self.show_msg("VOTE", "CHAIN", "")
+            except Exception:
+                pass
+            return
 
-    This rendering is only used for the idle screen; other screens still use `show_msg()`.
-    """
-    # If device not ready, fall back to basic message
-    if not ('device' in globals() and device):
         try:
-            show_msg("VOTE", "CHAIN", "")
-        except Exception:
-            pass
-        return
+            if self._idle_frame is None:
+                self._idle_frame = self._render_idle(device)
+            device.display(self._idle_frame)
+        except Exception as e:
+            self.log.warning("idle_draw_error", error=e)
 
-    try:
-        from PIL import ImageFont
-    except Exception:
-        ImageFont = None
+    def _render_idle(self, device):
+        from PIL import Image, ImageDraw
 
-    try:
-        with canvas(device) as draw:
-            draw.rectangle(device.bounding_box, fill="black")
+        image = Image.new(device.mode, device.size)
+        draw = ImageDraw.Draw(image)
+        draw.rectangle(device.bounding_box, fill="black")
 
-            line1 = "VOTE"
-            line2 = "CHAIN"
+        line1 = "VOTE"
+        line2 = "CHAIN"
 
-            # Preferred larger font for idle title; fallback to default if unavailable
-            preferred_size = 28
+        # Preferred larger font for idle title; fallback to default if unavailable
+        preferred_size = 28
+        try:
+            font = load_font(preferred_size)
+        except Exception:
+            font = None
+
+        if font:
+            bbox1 = draw.textbbox((0, 0), line1, font=font)
+            tw1 = bbox1[2] - bbox1[0]
+            th1 = bbox1[3] - bbox1[1]
+            bbox2 = draw.textbbox((0, 0), line2, font=font)
+            tw2 = bbox2[2] - bbox2[0]
+            th2 = bbox2[3] - bbox2[1]
+        else:
+            tw1 = len(line1) * 7
+            th1 = 8
+            tw2 = len(line2) * 7
+            th2 = 8
+
+        total_h = th1 + th2 + 4  # small spacing between lines
+        y_start = max(0, (device.height - total_h) // 2)
+
+        # Center each line horizontally
+        x1 = max(0, (device.width - tw1) // 2)
+        x2 = max(0, (device.width - tw2) // 2)
+
+        # Draw a more prominent layered shadow for visual depth
+        # Two layered offsets: a larger darker shadow, then a lighter one closer to the text
+        shadow_layers = [ (2, -2, "dimgray"), (1, -1, "gray") ]
+        for ox, oy, col in shadow_layers:
+            draw.text((x1 + ox, y_start + oy), line1, fill=col, font=font)
+            draw.text((x2 + ox, y_start + th1 + 4 + oy), line2, fill=col, font=font)
+
+        # Draw main (foreground) text on top
+        draw.text((x1, y_start), line1, fill="white", font=font)
+        draw.text((x2, y_start + th1 + 4), line2, fill="white", font=font)
+        return image
+
+    def read_aadhaar_simple(self, max_len: int = 12) -> str:
+        """This is the most reliable method for headless operation."""
+        import termios
+        import tty
+        digits = ""
+        self.show_msg("Manual Mode", "Enter Aadhaar:", "_")
+        print("\n" + "="*40)
+        print("ENTER AADHAAR NUMBER (press Enter when done):")
+        print("="*40)
+        while len(digits) < max_len:
             try:
-                font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", preferred_size)
-            except Exception:
+                # Read one character at a time
+                fd = sys.stdin.fileno()
+                old_settings = termios.tcgetattr(fd)
                 try:
-                    font = ImageFont.load_default() if ImageFont else None
-                except Exception:
-                    font = None
-
-            if font:
-                bbox1 = draw.textbbox((0, 0), line1, font=font)
-                tw1 = bbox1[2] - bbox1[0]
-                th1 = bbox1[3] - bbox1[1]
-                bbox2 = draw.textbbox((0, 0), line2, font=font)
-                tw2 = bbox2[2] - bbox2[0]
-                th2 = bbox2[3] - bbox2[1]
-            else:
-                tw1 = len(line1) * 7
-                th1 = 8
-                tw2 = len(line2) * 7
-                th2 = 8
-
-            total_h = th1 + th2 + 4  # small spacing between lines
-            y_start = max(0, (device.height - total_h) // 2)
-
-            # Center each line horizontally
-            x1 = max(0, (device.width - tw1) // 2)
-            x2 = max(0, (device.width - tw2) // 2)
-
-            # Draw a more prominent layered shadow for visual depth
-            # Two layered offsets: a larger darker shadow, then a lighter one closer to the text
-            shadow_layers = [ (2, -2, "dimgray"), (1, -1, "gray") ]
-            for ox, oy, col in shadow_layers:
-                draw.text((x1 + ox, y_start + oy), line1, fill=col, font=font)
-                draw.text((x2 + ox, y_start + th1 + 4 + oy), line2, fill=col, font=font)
-
-            # Draw main (foreground) text on top
-            draw.text((x1, y_start), line1, fill="white", font=font)
-            draw.text((x2, y_start + th1 + 4), line2, fill="white", font=font)
-    except Exception as e:
-        print(f"⚠️ Idle Draw Error: {e}")
-def read_aadhaar_simple(max_len: int = 12) -> str:
-    """This is the most reliable method for headless operation."""
-    digits = ""
-    show_msg("Manual Mode", "Enter Aadhaar:", "_")
-    print("\n" + "="*40)
-    print("ENTER AADHAAR NUMBER (press Enter when done):")
-    print("="*40)
-    while len(digits) < max_len:
+                    tty.setraw(fd)
+                    ch = sys.stdin.read(1)
+
+                    # Enter key
+                    if ch in ('\r', '\n'):
+                        if digits:
+                            print()  # Newline
+                            return digits
+
+                    # Backspace
+                    elif ch in ('\x7f', '\x08'):
+                        if digits:
+                            digits = digits[:-1]
+                            print('\b \b', end='', flush=True)
+
+                    # ESC to cancel
+                    elif ch == '\x1b':
+                        print("\nCancelled")
+                        return ""
+
+                    # Only accept digits
+                    elif ch.isdigit():
+                        digits += ch
+                        print(ch, end='', flush=True)
+
+                finally:
+                    termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+
+                # Update OLED after each character
+                cursor = "_" if len(digits) < max_len else ""
+                self.show_msg("Manual Mode", "Enter Aadhaar:", digits + cursor, secret=True)
+
+            except Exception as e:
+                print(f"Input error: {e}")
+                break
+
+        print()  # Newline after input
+        return digits
+
+    def read_aadhaar_on_oled(self, max_len: int = 12) -> str:
+        """
+        Read Aadhaar digits from keyboard, reflecting input on OLED line 3.
+        Character-by-character input with instant OLED updates.
+        """
+        import termios
+        import tty
+        digits = ""
+        self.show_msg("Manual Mode", "Enter Aadhaar:", "_")
+        fd = sys.stdin.fileno()
+        old_settings = termios.tcgetattr(fd)
         try:
-            # Read one character at a time
-            import sys
-            import tty
-            import termios
-            
-            fd = sys.stdin.fileno()
-            old_settings = termios.tcgetattr(fd)
-            try:
-                tty.setraw(fd)
+            # Raw mode: get characters instantly without echo
+            tty.setraw(fd)
+            while True:
                 ch = sys.stdin.read(1)
-                
-                # Enter key
-                if ch in ('\r', '\n'):
+
+                # Enter submits (both \n and \r)
+                if ch in ("\n", "\r", "\x0d", "\x0a"):
+                    if digits:  # Only submit if we have input
+                        print()  # New line in logs
+                        return digits
+
+                # Ctrl+C exits
+                elif ch == "\x03":
+                    print("\n⚠️ Cancelled by user")
+                    self.gpio.cleanup()
+                    sys.exit(0)
+
+                # ESC cancels input
+                elif ch == "\x1b":
+                    digits = ""
+                    self.show_msg("Manual Mode", "Cancelled", "")
+                    self.clock.sleep(1)
+                    return ""
+
+                # Backspace/delete
+                elif ch in ("\x08", "\x7f", "\x17"):  # \x17 is Ctrl+W
+                    digits = digits[:-1]
+
+                # Accept only digits up to max_len
+                elif ch.isdigit() and len(digits) < max_len:
+                    digits += ch
+
+                # Update OLED immediately after every key
+                cursor = "_" if len(digits) < max_len else ""
+                self.show_msg("Manual Mode", "Enter Aadhaar:", digits + cursor, secret=True)
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+        return digits
+
+    def read_aadhaar_from_keyboard_device(self, max_len: int = 12, timeout_sec: int = 60) -> str:
+        """Read Aadhaar directly from keyboard device with exclusive grab.
+        Works completely headless - no terminal focus needed.
+        """
+        if self.keyboard is None and kiosk_hw.InputDevice is None:
+            self.log.warning("keyboard_unavailable", reason="evdev not installed")
+            return ""
+
+        # Re-scan if the keyboard was plugged in after boot
+        dev = self.keyboard or kiosk_hw.find_keyboard(self.cfg, emulate=False)
+        if not dev:
+            self.log.warning("keyboard_unavailable", reason="no keyboard device found")
+            return ""
+        self.keyboard = dev
+
+        digits = ""
+        deadline = self.clock.time() + timeout_sec
+        self.show_msg("Enter Aadhaar", "Type on keyboard", "_")
+
+        grabbed = False
+        try:
+            # Grab exclusive access - prevents desktop/terminal from seeing keys
+            dev.grab()
+            grabbed = True
+            self.log.debug("keyboard_grabbed", device=dev.name)
+
+            # Use read_loop() instead of select + read()
+            for event in dev.read_loop():
+                # Check timeout
+                if self.clock.time() > deadline:
+                    self.log.info("aadhaar_timeout", typed=len(digits))
+                    return ""
+
+                # Check for reset button during input
+                if self.pressed(self.cfg.btn_start):
+                    self.log.info("aadhaar_reset")
+                    return "RESET"
+
+                if event.type != ecodes.EV_KEY:
+                    continue
+
+                # Only process key down events (value == 1)
+                if event.value != 1:
+                    continue
+
+                code = event.code
+                self.log.debug("key", code=code)
+
+                # Enter key submits
+                if code in (ecodes.KEY_ENTER, ecodes.KEY_KPENTER):
                     if digits:
-                        print()  # Newline
+                        self.log.info("aadhaar_entered", aadhaar=digits)
                         return digits
-                
+
+                # ESC cancels
+                elif code == ecodes.KEY_ESC:
+                    self.log.info("aadhaar_cancelled")
+                    self.show_msg("Cancelled", "", "")
+                    self.clock.sleep(1)
+                    return ""
+
                 # Backspace
-                elif ch in ('\x7f', '\x08'):
+                elif code == ecodes.KEY_BACKSPACE:
                     if digits:
                         digits = digits[:-1]
-                        print('\b \b', end='', flush=True)
-                
-                # ESC to cancel
-                elif ch == '\x1b':
-                    print("\nCancelled")
-                    return ""
-                
-                # Only accept digits
-                elif ch.isdigit():
-                    digits += ch
-                    print(ch, end='', flush=True)
-                
-            finally:
-                termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-            
-            # Update OLED after each character
-            cursor = "_" if len(digits) < max_len else ""
-            show_msg("Manual Mode", "Enter Aadhaar:", digits + cursor)
-            
-        except Exception as e:
-            print(f"Input error: {e}")
-            break
-    
-    print()  # Newline after input
-    return digits
 
-def read_aadhaar_on_oled(max_len: int = 12) -> str:
-    """
-    Read Aadhaar digits from keyboard, reflecting input on OLED line 3.
-    Character-by-character input with instant OLED updates.
-    """
-    digits = ""
-    show_msg("Manual Mode", "Enter Aadhaar:", "_")
-    fd = sys.stdin.fileno()
-    old_settings = termios.tcgetattr(fd)
-    try:
-        # Raw mode: get characters instantly without echo
-        tty.setraw(fd)
-        while True:
-            ch = sys.stdin.read(1)
-            
-            # Enter submits (both \n and \r)
-            if ch in ("\n", "\r", "\x0d", "\x0a"):
-                if digits:  # Only submit if we have input
-                    print()  # New line in logs
-                    return digits
-            
-            # Ctrl+C exits
-            elif ch == "\x03":
-                print("\n⚠️ Cancelled by user")
-                GPIO.cleanup()
-                sys.exit(0)
-            
-            # ESC cancels input
-            elif ch == "\x1b":
-                digits = ""
-                show_msg("Manual Mode", "Cancelled", "")
-                time.sleep(1)
-                return ""
-            
-            # Backspace/delete
-            elif ch in ("\x08", "\x7f", "\x17"):  # \x17 is Ctrl+W
-                digits = digits[:-1]
-            
-            # Accept only digits up to max_len
-            elif ch.isdigit() and len(digits) < max_len:
-                digits += ch
-            
-            # Update OLED immediately after every key
-            cursor = "_" if len(digits) < max_len else ""
-            show_msg("Manual Mode", "Enter Aadhaar:", digits + cursor)
-    finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-    return digits
-
-def _find_keyboard_device():
-    """Find the main keyboard input device (not consumer control or system control)."""
-    try:
-        from evdev import list_devices
-        candidates = []
-        for dev_path in list_devices():
-            try:
-                dev = InputDevice(dev_path)
-                name = (dev.name or '').lower()
-                
-                # Look for keyboard, but exclude consumer/system control variants
-                if 'keyboard' in name:
-                    # Prefer the base keyboard without "consumer" or "system" in name
-                    if 'consumer' not in name and 'system' not in name:
-                        print(f"✓ Found main keyboard: {dev.name} at {dev_path}")
-                        return dev
-                    else:
-                        candidates.append((dev, dev_path))
-            except Exception:
-                continue
-        
-        # If no exact match, try any keyboard candidate
-        if candidates:
-            dev, dev_path = candidates[0]
-            print(f"✓ Using keyboard: {dev.name} at {dev_path}")
-            return dev
-            
-    except Exception as e:
-        print(f"⚠️ Error finding keyboard: {e}")
-    return None
+                # Number keys (top row: KEY_1=2, KEY_2=3, ..., KEY_0=11)
+                elif code >= ecodes.KEY_1 and code <= ecodes.KEY_0:
+                    if len(digits) < max_len:
+                        # KEY_1 through KEY_9 are sequential, KEY_0 is after KEY_9
+                        if code == ecodes.KEY_0:
+                            digit = '0'
+                        elif code == ecodes.KEY_1:
+                            digit = '1'
+                        elif code == ecodes.KEY_2:
+                            digit = '2'
+                        elif code == ecodes.KEY_3:
+                            digit = '3'
+                        elif code == ecodes.KEY_4:
+                            digit = '4'
+                        elif code == ecodes.KEY_5:
+                            digit = '5'
+                        elif code == ecodes.KEY_6:
+                            digit = '6'
+                        elif code == ecodes.KEY_7:
+                            digit = '7'
+                        elif code == ecodes.KEY_8:
+                            digit = '8'
+                        elif code == ecodes.KEY_9:
+                            digit = '9'
+                        else:
+                            continue
+                        digits += digit
+                        if len(digits) >= max_len:
+                            self.log.info("aadhaar_entered", aadhaar=digits)
+                            return digits
+
+                # Numpad keys (KEY_KP0=82, KEY_KP1=79, etc)
+                elif code in (ecodes.KEY_KP0, ecodes.KEY_KP1, ecodes.KEY_KP2, ecodes.KEY_KP3,
+                             ecodes.KEY_KP4, ecodes.KEY_KP5, ecodes.KEY_KP6, ecodes.KEY_KP7,
+                             ecodes.KEY_KP8, ecodes.KEY_KP9):
+                    if len(digits) < max_len:
+                        if code == ecodes.KEY_KP0:
+                            digit = '0'
+                        elif code == ecodes.KEY_KP1:
+                            digit = '1'
+                        elif code == ecodes.KEY_KP2:
+                            digit = '2'
+                        elif code == ecodes.KEY_KP3:
+                            digit = '3'
+                        elif code == ecodes.KEY_KP4:
+                            digit = '4'
+                        elif code == ecodes.KEY_KP5:
+                            digit = '5'
+                        elif code == ecodes.KEY_KP6:
+                            digit = '6'
+                        elif code == ecodes.KEY_KP7:
+                            digit = '7'
+                        elif code == ecodes.KEY_KP8:
+                            digit = '8'
+                        elif code == ecodes.KEY_KP9:
+                            digit = '9'
+                        else:
+                            continue
+                        digits += digit
+                        if len(digits) >= max_len:
+                            self.log.info("aadhaar_entered", aadhaar=digits)
+                            return digits
+
+                # Update OLED after each key
+                cursor = "_" if len(digits) < max_len else ""
+                self.show_msg("Enter Aadhaar", digits if digits else "Type on keyboard", cursor, secret=True)
+
+        except PermissionError:
+            self.log.error("keyboard_permission_denied", hint="run with sudo")
+            self.show_msg("Permission Error", "Run with sudo", "")
+            self.clock.sleep(2)
+            return ""
+        except Exception as e:
+            self.log.error("keyboard_error", exc_info=True, error=e)
+            return ""
+        finally:
+            # Always release the grab
+            if grabbed:
+                try:
+                    dev.ungrab()
+                    self.log.debug("keyboard_released")
+                except:
+                    pass
 
-def read_aadhaar_from_keyboard_device(max_len: int = 12, timeout_sec: int = 60) -> str:
-    """Read Aadhaar directly from keyboard device with exclusive grab.
-    Works completely headless - no terminal focus needed.
-    """
-    if InputDevice is None or ecodes is None:
-        print("⚠️ evdev not available, falling back to simple input")
         return ""
-    
-    dev = _find_keyboard_device()
-    if not dev:
-        print("⚠️ No keyboard device found")
-        return ""
-    
-    digits = ""
-    deadline = time.time() + timeout_sec
-    show_msg("Enter Aadhaar", "Type on keyboard", "_")
-    
-    grabbed = False
-    try:
-        # Grab exclusive access - prevents desktop/terminal from seeing keys
-        dev.grab()
-        grabbed = True
-        print(f"✓ Keyboard grabbed: {dev.name}")
-        
-        # Use read_loop() instead of select + read()
-        for event in dev.read_loop():
-            # Check timeout
-            if time.time() > deadline:
-                print("\n⏱️ Input timeout")
-                return ""
-            
-            # Check for reset button during input
-            if GPIO.input(PIN_BTN_START) == GPIO.LOW:
-                print("\n⚠️ Reset pressed during input")
+
+    # --- FINGERPRINT LOGIC ---
+
+    def get_image_with_timeout(self, timeout_seconds=10.0):
+        MANDATORY_HOLD_TIME = 1.5
+        finger = self.finger
+        self.log.debug("finger_wait", timeout=timeout_seconds)
+
+        start_time = self.clock.time()
+
+        while (self.clock.time() - start_time) < timeout_seconds:
+            # Check for reset button during fingerprint wait
+            if self.pressed(self.cfg.btn_start):
+                self.log.info("finger_reset")
                 return "RESET"
-            
-            if event.type != ecodes.EV_KEY:
-                continue
-            
-            # Only process key down events (value == 1)
-            if event.value != 1:
-                continue
-            
-            code = event.code
-            print(f"[DEBUG] Key code: {code}", flush=True)
-            
-            # Enter key submits
-            if code in (ecodes.KEY_ENTER, ecodes.KEY_KPENTER):
-                if digits:
-                    print(f"\n✓ Aadhaar entered: {digits}")
-                    return digits
-            
-            # ESC cancels
-            elif code == ecodes.KEY_ESC:
-                print("⚠️ Input cancelled")
-                show_msg("Cancelled", "", "")
-                time.sleep(1)
-                return ""
-            
-            # Backspace
-            elif code == ecodes.KEY_BACKSPACE:
-                if digits:
-                    digits = digits[:-1]
-                    print(f"\b \b", end='', flush=True)
-            
-            # Number keys (top row: KEY_1=2, KEY_2=3, ..., KEY_0=11)
-            elif code >= ecodes.KEY_1 and code <= ecodes.KEY_0:
-                if len(digits) < max_len:
-                    # KEY_1 through KEY_9 are sequential, KEY_0 is after KEY_9
-                    if code == ecodes.KEY_0:
-                        digit = '0'
-                    elif code == ecodes.KEY_1:
-                        digit = '1'
-                    elif code == ecodes.KEY_2:
-                        digit = '2'
-                    elif code == ecodes.KEY_3:
-                        digit = '3'
-                    elif code == ecodes.KEY_4:
-                        digit = '4'
-                    elif code == ecodes.KEY_5:
-                        digit = '5'
-                    elif code == ecodes.KEY_6:
-                        digit = '6'
-                    elif code == ecodes.KEY_7:
-                        digit = '7'
-                    elif code == ecodes.KEY_8:
-                        digit = '8'
-                    elif code == ecodes.KEY_9:
-                        digit = '9'
-                    else:
-                        continue
-                    digits += digit
-                    print(digit, end='', flush=True)
-                    if len(digits) >= max_len:
-                        print()
-                        return digits
-            
-            # Numpad keys (KEY_KP0=82, KEY_KP1=79, etc)
-            elif code in (ecodes.KEY_KP0, ecodes.KEY_KP1, ecodes.KEY_KP2, ecodes.KEY_KP3,
-                         ecodes.KEY_KP4, ecodes.KEY_KP5, ecodes.KEY_KP6, ecodes.KEY_KP7,
-                         ecodes.KEY_KP8, ecodes.KEY_KP9):
-                if len(digits) < max_len:
-                    if code == ecodes.KEY_KP0:
-                        digit = '0'
-                    elif code == ecodes.KEY_KP1:
-                        digit = '1'
-                    elif code == ecodes.KEY_KP2:
-                        digit = '2'
-                    elif code == ecodes.KEY_KP3:
-                        digit = '3'
-                    elif code == ecodes.KEY_KP4:
-                        digit = '4'
-                    elif code == ecodes.KEY_KP5:
-                        digit = '5'
-                    elif code == ecodes.KEY_KP6:
-                        digit = '6'
-                    elif code == ecodes.KEY_KP7:
-                        digit = '7'
-                    elif code == ecodes.KEY_KP8:
-                        digit = '8'
-                    elif code == ecodes.KEY_KP9:
-                        digit = '9'
-                    else:
-                        continue
-                    digits += digit
-                    print(digit, end='', flush=True)
-                    if len(digits) >= max_len:
-                        print()
-                        return digits
-            
-            # Update OLED after each key
-            cursor = "_" if len(digits) < max_len else ""
-            show_msg("Enter Aadhaar", digits if digits else "Type on keyboard", cursor)
-        
-    except PermissionError:
-        print("❌ Permission denied - run with sudo")
-        show_msg("Permission Error", "Run with sudo", "")
-        time.sleep(2)
-        return ""
-    except Exception as e:
-        print(f"⚠️ Keyboard error: {e}")
-        import traceback
-        traceback.print_exc()
-        return ""
-    finally:
-        # Always release the grab
-        if grabbed:
-            try:
-                dev.ungrab()
-                print("✓ Keyboard released")
-            except:
+
+            i = finger.get_image()
+            if i == FP_OK:
+                self.log.debug("finger_detected")
+                self.beep(count=1, duration=0.05)
+                self.clock.sleep(MANDATORY_HOLD_TIME) # Hold for clarity
+                finger.get_image() # Grab fresh image
+                return True
+            if i == FP_NOFINGER:
                 pass
-    
-    return ""
-
-# --- FINGERPRINT LOGIC ---
-
-def get_image_with_timeout(timeout_seconds=10.0):
-    MANDATORY_HOLD_TIME = 1.5
-    print(f"Waiting for finger...", end="", flush=True)
-    
-    start_time = time.time()
-    
-    while (time.time() - start_time) < timeout_seconds:
-        # Check for reset button during fingerprint wait
-        if GPIO.input(PIN_BTN_START) == GPIO.LOW:
-            print("\n⚠️ Reset pressed")
+            elif i == FP_IMAGEFAIL:
+                return False
+        return False
+
+    def scan_finger_and_get_id(self):
+        finger = self.finger
+        finger.set_led(color=1, mode=1) # Breathing
+        result = self.get_image_with_timeout(10.0)
+        if result == "RESET":
+            finger.set_led(color=3, mode=3) # Off
             return "RESET"
-            
-        i = finger.get_image()
-        if i == adafruit_fingerprint.OK:
-            print("\nDetected. Holding...", end="", flush=True)
-            beep(count=1, duration=0.05)
-            time.sleep(MANDATORY_HOLD_TIME) # Hold for clarity
-            finger.get_image() # Grab fresh image
-            return True
-        if i == adafruit_fingerprint.NOFINGER:
-            pass
-        elif i == adafruit_fingerprint.IMAGEFAIL:
+        if not result:
+            finger.set_led(color=1, mode=3) # Red error
+            # Return None to allow retry logic to handle this
+            return None
+        self.log.debug("finger_templating")
+        if finger.image_2_tz(1) != FP_OK:
+            finger.set_led(color=1, mode=3)
+            # Return None to allow retry logic to handle this
+            return None
+        self.log.debug("finger_searching")
+        if finger.finger_search() == FP_OK:
+            finger.set_led(color=2, mode=3) # Green success
+            return finger.finger_id
+        else:
+            finger.set_led(color=1, mode=3) # Red fail
+            # Return None to allow retry logic to handle this
+            return None
+
+    # --- NEW: ENROLLMENT LOGIC ---
+
+    def enroll_finger(self, location_id):
+        """Captures a new finger and saves it to the specified ID"""
+        finger = self.finger
+        self.show_msg("ENROLL MODE", f"ID #{location_id}", "Place Finger...")
+        self.set_leds(green=True, red=True) # Both LEDs ON for Enroll Mode
+
+        # 1. First Scan
+        if not self.get_image_with_timeout(15.0): return False
+        if finger.image_2_tz(1) != FP_OK: return False
+
+        self.show_msg("Remove Finger", "...", "...")
+        self.beep(1)
+        self.clock.sleep(2)
+        while finger.get_image() != FP_NOFINGER: pass
+
+        # 2. Second Scan
+        self.show_msg("Place Again", "Verify...", "")
+        if not self.get_image_with_timeout(15.0): return False
+        if finger.image_2_tz(2) != FP_OK: return False
+
+        # 3. Model & Store
+        if finger.create_model() != FP_OK: return False
+        if finger.store_model(location_id) != FP_OK: return False
+
+        return True
+
+    def perform_remote_enrollment(self, target_id, voter_name):
+        self.log.info("remote_enroll", voter=voter_name, fingerprint_id=target_id)
+        self.beep(3, 0.1)
+
+        success = self.enroll_finger(target_id)
+
+        if success:
+            self.show_msg("Enrollment", "SUCCESS!", "Saved.")
+            self.set_leds(green=True, red=False)
+            self.beep(2, 0.1)
+        else:
+            self.show_msg("Enrollment", "FAILED", "Try Again")
+            self.set_leds(green=False, red=True)
+            self.beep(3, 0.5)
+
+        return success
+
+    # --- BACKEND API ---
+
+    def reject_repeat_voter(self, aadhaar_id):
+        """The voted filter knows this Aadhaar: say so at once, then have
+        the backend confirm it. Returns True if the backend confirmed the
+        vote, False otherwise (go on with the check-in)."""
+        self.log.info("voted_filter_hit", aadhaar=aadhaar_id)
+        self.show_msg("Already Voted", "Confirming...", "")
+        self.set_leds(green=False, red=True)
+        voted = self.voted_filter.confirm(self.backend, aadhaar_id)
+        if voted is not True:
+            # A false positive, or no answer (timeout, 429): the check-in
+            # decides, and the backend rejects a double vote there anyway
+            self.log.info("voted_filter_unconfirmed", reason="false_positive" if voted is False else "no_answer")
             return False
-    return False
-
-def scan_finger_and_get_id():
-    finger.set_led(color=1, mode=1) # Breathing
-    result = get_image_with_timeout(10.0)
-    if result == "RESET":
-        finger.set_led(color=3, mode=3) # Off
-        return "RESET"
-    if not result:
-        finger.set_led(color=1, mode=3) # Red error
-        # Return None to allow retry logic to handle this
-        return None
-    print("Templating...", end="")
-    if finger.image_2_tz(1) != adafruit_fingerprint.OK:
-        finger.set_led(color=1, mode=3)
-        # Return None to allow retry logic to handle this
-        return None
-    print("Searching...", end="")
-    if finger.finger_search() == adafruit_fingerprint.OK:
-        finger.set_led(color=2, mode=3) # Green success
-        return finger.finger_id
-    else:
-        finger.set_led(color=1, mode=3) # Red fail
-        # Return None to allow retry logic to handle this
-        return None
-
-# --- NEW: ENROLLMENT LOGIC ---
-
-def enroll_finger(location_id):
-    """Captures a new finger and saves it to the specified ID"""
-    show_msg("ENROLL MODE", f"ID #{location_id}", "Place Finger...")
-    set_leds(green=True, red=True) # Both LEDs ON for Enroll Mode
-    
-    # 1. First Scan
-    if not get_image_with_timeout(15.0): return False
-    if finger.image_2_tz(1) != adafruit_fingerprint.OK: return False
-    
-    show_msg("Remove Finger", "...", "...")
-    beep(1)
-    time.sleep(2)
-    while finger.get_image() != adafruit_fingerprint.NOFINGER: pass
-    
-    # 2. Second Scan
-    show_msg("Place Again", "Verify...", "")
-    if not get_image_with_timeout(15.0): return False
-    if finger.image_2_tz(2) != adafruit_fingerprint.OK: return False
-    
-    # 3. Model & Store
-    if finger.create_model() != adafruit_fingerprint.OK: return False
-    if finger.store_model(location_id) != adafruit_fingerprint.OK: return False
-    
-    return True
-
-def perform_remote_enrollment(target_id, voter_name):
-    print(f"\n🔵 ADMIN COMMAND: Enroll {voter_name} as ID #{target_id}")
-    beep(3, 0.1)
-    
-    success = enroll_finger(target_id)
-    
-    if success:
-        show_msg("Enrollment", "SUCCESS!", "Saved.")
-        set_leds(green=True, red=False)
-        beep(2, 0.1)
-    else:
-        show_msg("Enrollment", "FAILED", "Try Again")
-        set_leds(green=False, red=True)
-        beep(3, 0.5)
-        
-    return success
+        metrics.inc("voted_filter_rejections", booth=self.name)
+        self.show_msg("Check-in Failed", "Already Voted", "Press START")
+        self.beep(count=1, duration=0.5)
+        self.wait_for_reset()
+        return True
+
+    def check_in_voter(self, aadhaar_id):
+        self.show_msg("Checking DB...", aadhaar_id, secret=True)
+        try:
+            response = self.backend.post("/api/voter/check-in",
+                                         json={"aadhaar_id": aadhaar_id}, timeout=config.checkin_timeout,
+                                         hedge_after=config.checkin_hedge_after)
+            if response.status_code == 200:
+                return response.json()['data']
+            else:
+                if response.status_code == 403 and self.voted_filter:
+                    self.voted_filter.add(aadhaar_id)
+                self.show_msg("Check-in Failed", "Not Found/Voted", "Press START")
+                self.beep(count=1, duration=0.5)
+                return self.wait_for_reset()
+        except:
+            self.show_msg("Network Error", "Check Server", "Press START")
+            return self.wait_for_reset()
+
+    def submit_vote(self, aadhaar_id, candidate_id, idempotency_key=None):
+        """Blocking submission. idempotency_key resends a journaled vote."""
+        device = self.device
+        resend = idempotency_key is not None
+        if idempotency_key is None:
+            idempotency_key = uuid.uuid4().hex
+            self._journal("vote", key=idempotency_key, aadhaar_id=aadhaar_id, candidate_id=candidate_id)
+        vote_timeout = config.vote_timeout
+        self.show_msg("Submitting...", "Waiting for confirmation", f"May take up to {vote_timeout:.0f}s")
+        self.set_leds(green=True, red=True)
+
+        stop_event = threading.Event()
+
+        def spinner_animation(stop_evt, max_seconds=90):
+            if not device:
+                return
+            start = self.clock.time()
+            frames = ['|','/','-','\\']
+            idx = 0
+            bar_x = 6
+            bar_y = device.height - 12
+            bar_w = device.width - 12
+            while not stop_evt.is_set():
+                elapsed = self.clock.time() - start
+                progress = min(1.0, elapsed / float(max_seconds)) if max_seconds > 0 else 0
+                fill_w = int(bar_w * progress)
+                with self.frame() as draw:
+                    draw.rectangle(device.bounding_box, fill="black")
+                    # Title
+                    draw.text((5, 8), "Submitting...", fill="white")
+                    # Spinner
+                    draw.text((device.width - 12, 6), frames[idx % len(frames)], fill="white")
+                    # Progress bar outline
+                    draw.rectangle((bar_x, bar_y, bar_x + bar_w, bar_y + 6), outline="white", fill=None)
+                    # Progress fill
+                    if fill_w > 0:
+                        draw.rectangle((bar_x, bar_y, bar_x + fill_w, bar_y + 6), outline="white", fill="white")
+                idx += 1
+                self.clock.sleep(0.12)
+
+        spinner_thread = threading.Thread(target=spinner_animation, args=(stop_event, vote_timeout),
+                                          name=f"{self.name}-spinner", daemon=True)
+        spinner_thread.start()
 
-# --- BACKEND API ---
+        try:
+            response = self.backend.post("/api/vote",
+                                         json={"aadhaar_id": aadhaar_id, "candidate_id": candidate_id},
+                                         headers={"Idempotency-Key": idempotency_key}, timeout=vote_timeout)
+            # Stop spinner
+            stop_event.set()
+            spinner_thread.join(timeout=1)
+
+            if response.status_code == 200:
+                data = response.json().get('data', {})
+                tx_hash = data.get('transaction_hash')
+                # backend may return 'receipt_code' or 'short_code' depending on implementation
+                short_code = data.get('receipt_code') or data.get('short_code')
+                self._journal("vote_done", key=idempotency_key, state=DONE, tx_hash=tx_hash)
+                if self.voted_filter:
+                    self.voted_filter.add(aadhaar_id)
+
+                # Show confirmed screen and animation (we wait for code before final receipt)
+                self.show_msg("Vote Confirmed!", "Finalizing...", "", big_text=True)
+                self.tick_animation()
+                self.set_leds(green=True, red=False)
+                self.log.info("vote_confirmed", tx_hash=tx_hash)
+                self.beep_success()
+
+                # If backend already returned a short code, display immediately
+                if short_code:
+                    receipt_code = short_code
+                else:
+                    # Poll backend lookup endpoint for receipt code (gives backend time to insert)
+                    receipt_code = None
+                    poll_start = self.clock.time()
+                    poll_timeout = config.receipt_timeout
+                    poll_interval = config.receipt_poll_interval
+                    self.show_msg("Finalizing...", "Waiting for receipt code", "")
+                    while self.clock.time() - poll_start < poll_timeout:
+                        try:
+                            r = self.backend.post("/api/lookup-receipt", json={"tx_hash": tx_hash}, timeout=5)
+                            if r.status_code == 200:
+                                j = r.json()
+                                receipt_code = j.get('code')
+                                if receipt_code:
+                                    break
+                        except Exception:
+                            pass
+                        self.clock.sleep(poll_interval)
+
+                # If we still don't have a receipt code, fall back to placeholder and instruct manual verify
+                if not receipt_code:
+                    receipt_display = "------"
+                    # Show fallback screen with tx hash for manual verification
+                    cand_name = self.ballot.name(candidate_id)
+                    self.show_msg("Vote Receipt:", f"Code: {receipt_display}", f"{cand_name}")
+                    # Also show instruction to verify via tx hash
+                    self.show_msg("Verify Manually:", tx_hash[:12] + "...", "Use verify.html")
+                else:
+                    receipt_display = receipt_code
+                    cand_name = self.ballot.name(candidate_id)
+                    self.show_msg("Vote Receipt:", f"Code: {receipt_display}", f"{cand_name}")
+
+                # Wait for admin/start button to be pressed before continuing
+                while not self.pressed(self.cfg.btn_start):
+                    self.clock.sleep(0.1)
+                self.clock.sleep(0.2)  # Debounce
+                self.show_msg("Vote Submitted!", "Thank you", "")
+                self.clock.sleep(2)
+                return True
+            else:
+                # Stop spinner already requested
+                try:
+                    msg = response.json().get('message', '')
+                except Exception:
+                    msg = ''
+                if resend and is_double_vote(response.status_code, msg):
+                    # The first submission was counted; only its receipt is lost
+                    self._journal("vote_done", key=idempotency_key, state=DONE, no_receipt=True)
+                    self.log.info("vote_already_recorded", status=response.status_code)
+                    self.show_msg("Vote Recorded", "Receipt unavailable", "See official")
+                    self.set_leds(green=True, red=False)
+                    self.clock.sleep(3)
+                    return True
+                self._journal("vote_done", key=idempotency_key, state=FAILED)
+                try:
+                    err = response.json()
+                    msg = err.get('message', '')
+                    if 'not active' in msg.lower() or 'inactive' in msg.lower() or 'election' in msg.lower():
+                        self.show_msg("Vote Rejected", "Election Not Active", "Start election in admin")
+                    elif 'timeout' in msg.lower():
+                        self.show_msg("Network Timeout", "Retry", "Blockchain slow")
+                    else:
+                        self.show_msg("Vote Rejected", msg or "Error")
+                except Exception:
+                    self.show_msg("Vote Rejected", "Error")
+                self.set_leds(green=False, red=True)
+                self.beep_error()
+                return False
+        except Exception as e:
+            # Ensure spinner stops
+            stop_event.set()
+            try:
+                spinner_thread.join(timeout=0.5)
+            except Exception:
+                pass
+            self.show_msg("Connection Fail", "Retry")
+            self.log.error("vote_error", error=e)
+            self._journal("vote_done", key=idempotency_key, state=FAILED)
+            self.beep_error()
+            return False
 
-def check_in_voter(aadhaar_id):
-    show_msg("Checking DB...", aadhaar_id)
-    try:
-        response = requests.post(f"{BACKEND_URL}/api/voter/check-in", 
-                                 json={"aadhaar_id": aadhaar_id}, timeout=5)
-        if response.status_code == 200:
-            return response.json()['data']
+    def tick_animation(self):
+        device = self.device
+        self.set_leds(green=True, red=False)
+        if device:
+            # Progressive draw: first segment, then second
+            x0, y0 = 40, 40  # Start
+            x1, y1 = 55, 55  # Middle
+            x2, y2 = 85, 25  # End
+            steps1 = 8
+            steps2 = 10
+            # Draw first segment progressively
+            for i in range(1, steps1 + 1):
+                with self.frame() as draw:
+                    draw.rectangle(device.bounding_box, fill="black")
+                    # Interpolate point
+                    xi = x0 + (x1 - x0) * i / steps1
+                    yi = y0 + (y1 - y0) * i / steps1
+                    draw.line((x0, y0, xi, yi), fill="white", width=6)
+                self.clock.sleep(0.02)
+            # Draw second segment progressively
+            for i in range(1, steps2 + 1):
+                with self.frame() as draw:
+                    draw.rectangle(device.bounding_box, fill="black")
+                    # Draw full first segment
+                    draw.line((x0, y0, x1, y1), fill="white", width=6)
+                    # Interpolate second segment
+                    xi = x1 + (x2 - x1) * i / steps2
+                    yi = y1 + (y2 - y1) * i / steps2
+                    draw.line((x1, y1, xi, yi), fill="white", width=6)
+                self.clock.sleep(0.02)
+            # Hold final tick
+            with self.frame() as draw:
+                draw.rectangle(device.bounding_box, fill="black")
+                draw.line((x0, y0, x1, y1), fill="white", width=6)
+                draw.line((x1, y1, x2, y2), fill="white", width=6)
+            self.clock.sleep(0.18)
+
+    def run_voting_interface(self, voter_name):
+        """Returns the chosen candidate id, or "RESET". Two candidates: A or
+        B chooses, the same button again confirms. Longer ballots: A pages
+        to the next candidate, B selects, then B confirms and A goes back."""
+        c = self.cfg
+        # One snapshot for the whole ballot, even if a refresh lands meanwhile
+        version, candidates = self.ballot.current()
+        self.prerender_ballot()
+        if not candidates:
+            self.log.warning("ballot_empty", version=version)
+            self.show_msg("No Candidates", "Ballot not loaded", "Press START")
+            self.set_leds(green=False, red=True)
+            self.beep_error()
+            return self.wait_for_reset()
+        paged = kiosk_ballot.paged(candidates)
+        if paged:
+            self.show_msg(f"Hi {voter_name}", f"{len(candidates)} Candidates", "A: Browse")
         else:
-            show_msg("Check-in Failed", "Not Found/Voted", "Press START")
-            beep(count=1, duration=0.5)
-            return wait_for_reset()
-    except:
-        show_msg("Network Error", "Check Server", "Press START")
-        return wait_for_reset()
+            self.show_msg(f"Hi {voter_name}", "Select Candidate:", "A (Btn1) | B (Btn2)")
+        self.set_leds(green=True, red=False)
+        self.beep(count=1)
 
-def submit_vote(aadhaar_id, candidate_id):
-    show_msg("Submitting...", "Waiting for confirmation", "May take up to 90s")
-    set_leds(green=True, red=True)
+        def show(kind, index):
+            self.show_msg(*kiosk_ballot.screen(candidates, kind, index), frame_key=(version, kind, index))
 
-    stop_event = threading.Event()
+        page = None                 # paged: index of the candidate on screen
+        selected_index = None
+        start_time = self.clock.time()
+        while True:
+            if self.clock.time() - start_time > 60:
+                self.show_msg("Session timed out", "Returning to idle", "")
+                self.clock.sleep(2)
+                return "RESET"
+            # Check for reset button
+            if self.pressed(c.btn_start):
+                self.clock.sleep(0.2)
+                self.log.info("vote_cancelled")
+                return "RESET"
+            # 1. Wait for input
+            if self.pressed(c.btn_a):
+                button = "A"
+            elif self.pressed(c.btn_b):
+                button = "B"
+            else:
+                self.clock.sleep(0.05)
+                continue
+            self.beep(count=1, duration=0.05)
+            start_time = self.clock.time()  # Reset the timer on input
+            self.clock.sleep(0.3)
+            # 2. Handle Selection logic
+            if not paged:
+                new_selection = 0 if button == "A" else 1
+                if new_selection >= len(candidates):
+                    continue
+                if selected_index == new_selection:
+                    return candidates[selected_index].id
+                selected_index = new_selection
+                show("confirm", selected_index)
+            elif selected_index is not None:
+                if button == "B":
+                    return candidates[selected_index].id
+                selected_index = None
+                show("page", page)
+            elif button == "A":
+                page = 0 if page is None else (page + 1) % len(candidates)
+                show("page", page)
+            elif page is not None:
+                selected_index = page
+                show("confirm", selected_index)
+            self.clock.sleep(0.05)
+
+    # --- PIPELINED SUBMISSION ---
+
+    def announce_receipt(self, session):
+        """Called from the submit worker: push the receipt to the side screen.
+        Never touches GPIO/OLED (the booth may be serving the next voter)."""
+        extra = {"no_receipt": True} if session.no_receipt else {}
+        self._journal("vote_done", key=session.idempotency_key, state=session.state,
+                      tx_hash=session.tx_hash, **extra)
+        info = session.summary()
+        if session.state == FAILED:
+            line = f"[RECEIPT] {self.name} {info['ticket']}: FAILED ({info['error']}) - see official"
+        elif info['no_receipt']:
+            line = f"[RECEIPT] {self.name} {info['ticket']}: Vote recorded, receipt unavailable - see official"
+        else:
+            code = info['receipt_code'] or (info['tx_hash'] or '')[:12] + "..."
+            line = f"[RECEIPT] {self.name} {info['ticket']}: Code {code} ({info['seconds']}s)"
+        self.log.info("receipt", line=line)
+        side_screen = config.receipt_side_screen
+        if side_screen:
+            try:
+                with open(side_screen, 'a') as f:
+                    f.write(line + "\n")
+            except Exception as e:
+                self.log.warning("side_screen_write_failed", error=e)
+        # An idle booth flashes it on the OLED right away
+        self.wake()
+
+    def show_ready_receipts(self):
+        """Flash finished receipts on the OLED while the booth is idle.
+        Returns (shown, start): whether anything was drawn (caller should
+        redraw idle) and whether START was pressed during the flash (the
+        next voter's session should begin now)."""
+        if not self.scheduler:
+            return False, False
+        shown = False
+        for session in self.scheduler.pop_ready():
+            self.show_receipt(session)
+            shown = True
+            # Skip ahead as soon as the next voter presses START; that press
+            # starts their session (the other receipts are on the side screen)
+            deadline = self.clock.time() + config.receipt_flash_seconds
+            while self.clock.time() < deadline:
+                if self.pressed(self.cfg.btn_start):
+                    return shown, True
+                self.clock.sleep(0.1)
+        return shown, False
+
+    def show_receipt(self, session):
+        """One ticket's outcome on the OLED."""
+        info = session.summary()
+        if session.state == FAILED:
+            self.show_msg(f"Ticket {info['ticket']}", "Vote FAILED", "See official")
+        elif session.state != DONE:
+            self.show_msg(f"Ticket {info['ticket']}", "Still confirming", "Try again shortly")
+        elif info['no_receipt']:
+            self.show_msg(f"Ticket {info['ticket']}", "Vote recorded", "No receipt: see official")
+        elif info['receipt_code']:
+            self.show_msg(f"Ticket {info['ticket']}", f"Code: {info['receipt_code']}", "Verify on verify.html")
+        else:
+            self.show_msg(f"Ticket {info['ticket']}", (info['tx_hash'] or '')[:12] + "...", "Use verify.html")
+
+    def lookup_ticket(self, ticket):
+        """Receipt lookup: a voter typed their ticket number at the Aadhaar
+        prompt. Shows the ticket's outcome until START."""
+        session = self.scheduler.lookup(ticket)
+        self.log.info("ticket_lookup", ticket=f"T-{int(ticket):02d}",
+                      state=session.state if session else None)
+        if session is None:
+            self.show_msg(f"Ticket T-{int(ticket):02d}", "Not found", "See official")
+        else:
+            self.show_receipt(session)
+        self.wait_for_reset()
+
+    def queue_vote(self, session, candidate_id):
+        """Hand the vote to the scheduler and free the booth for the next voter."""
+        # Durable before it is sent: a crash from here on resends, never loses it
+        self._journal("vote", key=session.idempotency_key, ticket=session.ticket,
+                      aadhaar_id=session.aadhaar_id, candidate_id=candidate_id)
+        # The session drops the Aadhaar once sent; a vote that fails after
+        # all only costs that voter a confirm on the next attempt
+        if self.voted_filter:
+            self.voted_filter.add(session.aadhaar_id)
+        self.scheduler.submit(session, candidate_id)
+        self.set_leds(green=True, red=False)
+        self.beep_success()
+        if config.receipt_side_screen:
+            self.show_msg("Vote Queued", f"Ticket {session.ticket_label}", "Receipt on side screen")
+            self.clock.sleep(3)
+        else:
+            self.show_msg("Vote Queued", f"Ticket {session.ticket_label}", "")
+            self.clock.sleep(2)
+            self.show_msg("Your receipt:", f"START, type {session.ticket}", "then ENTER")
+            self.clock.sleep(3)
+
+    # --- MAIN APP LOOP ---
+
+    def handle_command(self, cmd):
+        """Run an admin command from poll-commands. Returns True if one ran."""
+        if cmd.get('command') == 'ENROLL':
+            # --- SWITCH TO ENROLLMENT MODE ---
+            self.log.info("remote_enroll_command", voter=cmd['name'])
+            success = self.perform_remote_enrollment(cmd['target_finger_id'], cmd['name'])
+
+            # Report result back to server
+            self.backend.post("/api/kiosk/enrollment-complete",
+                              json={"success": success, "fingerprint_id": cmd['target_finger_id']})
+            self.clock.sleep(2)
+            return True
+        return False
 
-    def spinner_animation(stop_evt, max_seconds=90):
-        if not device:
+    def run_session(self):
+        """One voter, from Aadhaar entry to submission. Returns when the
+        booth should go back to idle."""
+        scheduler = self.scheduler
+        # All submission slots busy: hold the next voter briefly
+        if scheduler and not scheduler.has_capacity():
+            self.show_msg("Please Wait", "Previous votes", "confirming...")
+            scheduler.wait_for_capacity()
+        # Use direct keyboard device reading (works headless, no terminal focus needed)
+        aadhaar = self.read_aadhaar_from_keyboard_device()
+        # Check for reset during input
+        if aadhaar == "RESET" or not aadhaar or aadhaar.strip() == "":
+            self.log.info("session_reset", stage="aadhaar")
             return
-        start = time.time()
-        frames = ['|','/','-','\\']
-        idx = 0
-        bar_x = 6
-        bar_y = device.height - 12
-        bar_w = device.width - 12
-        while not stop_evt.is_set():
-            elapsed = time.time() - start
-            progress = min(1.0, elapsed / float(max_seconds)) if max_seconds > 0 else 0
-            fill_w = int(bar_w * progress)
-            with canvas(device) as draw:
-                draw.rectangle(device.bounding_box, fill="black")
-                # Title
-                draw.text((5, 8), "Submitting...", fill="white")
-                # Spinner
-                draw.text((device.width - 12, 6), frames[idx % len(frames)], fill="white")
-                # Progress bar outline
-                draw.rectangle((bar_x, bar_y, bar_x + bar_w, bar_y + 6), outline="white", fill=None)
-                # Progress fill
-                if fill_w > 0:
-                    draw.rectangle((bar_x, bar_y, bar_x + fill_w, bar_y + 6), outline="white", fill="white")
-            idx += 1
-            time.sleep(0.12)
-
-    spinner_thread = threading.Thread(target=spinner_animation, args=(stop_event, 90), daemon=True)
-    spinner_thread.start()
+        # An Aadhaar has 12 digits; a ticket number looks up a receipt
+        if scheduler and len(aadhaar) <= TICKET_DIGITS:
+            self.lookup_ticket(aadhaar)
+            return
+        # Repeat attempts are turned away here, without a check-in
+        if self.voted_filter and self.voted_filter.might_have_voted(aadhaar):
+            if self.reject_repeat_voter(aadhaar):
+                return
+        # 3. VOTER CHECK-IN
+        voter = self.check_in_voter(aadhaar)
+        # Check for reset signal from check-in
+        if voter == "RESET":
+            self.log.info("session_reset", stage="check_in")
+            return
+        if not voter:
+            # No voter found but not a reset signal, just go back to idle
+            return
+        self._journal("session", stage="checked_in")
+
+        session = None
+        if scheduler:
+            session = scheduler.new_session(aadhaar, voter)
+            if session is None:
+                self.log.warning("vote_in_flight")
+                self.show_msg("Check-in Failed", "Vote in progress", "Press START")
+                self.set_leds(green=False, red=True)
+                self.beep_error()
+                self.wait_for_reset()
+                return
+        # 4. VERIFY FINGERPRINT (allow one retry)
+        self.show_msg("Verifying...", "Scan Finger", "Or Press START")
+        self.set_leds(green=True, red=False)
+        self.log.debug("finger_expected", fingerprint_id=voter['fingerprint_id'])
+
+        verified = False
+        max_attempts = 2
+        attempt = 0
+        while attempt < max_attempts:
+            scanned_id = self.scan_finger_and_get_id()
+            # Check for reset signal
+            if scanned_id == "RESET":
+                self.log.info("session_reset", stage="fingerprint")
+                return
+            # Successful match
+            if scanned_id == voter['fingerprint_id']:
+                verified = True
+                break
 
-    try:
-        response = requests.post(f"{BACKEND_URL}/api/vote", 
-                                 json={"aadhaar_id": aadhaar_id, "candidate_id": candidate_id}, timeout=90)
-        # Stop spinner
-        stop_event.set()
-        spinner_thread.join(timeout=1)
-
-        if response.status_code == 200:
-            data = response.json().get('data', {})
-            tx_hash = data.get('transaction_hash')
-            # backend may return 'receipt_code' or 'short_code' depending on implementation
-            short_code = data.get('receipt_code') or data.get('short_code')
-
-            # Show confirmed screen and animation (we wait for code before final receipt)
-            show_msg("Vote Confirmed!", "Finalizing...", "", big_text=True)
-            tick_animation()
-            set_leds(green=True, red=False)
-            print(f"TX: {tx_hash}")
-            beep_success()
-
-            # If backend already returned a short code, display immediately
-            if short_code:
-                receipt_code = short_code
+            # Failed scan (None) or wrong fingerprint ID
+            attempt += 1
+            if attempt < max_attempts:
+                if scanned_id is None:
+                    self.log.info("finger_retry", reason="scan_failed")
+                    self.show_msg("Scan Failed", "Try again", "Attempt 2 of 2")
+                else:
+                    self.log.info("finger_retry", reason="wrong_finger", fingerprint_id=scanned_id)
+                    self.show_msg("Wrong Finger", "Try again", "Attempt 2 of 2")
+                # Audible prompt
+                try:
+                    self.beep(count=1, duration=0.05)
+                except Exception:
+                    pass
+                self.clock.sleep(1)
+                # loop to allow next scan
+                continue
             else:
-                # Poll backend lookup endpoint for receipt code (gives backend time to insert)
-                receipt_code = None
-                poll_start = time.time()
-                poll_timeout = 60  # seconds
-                poll_interval = 1.0
-                show_msg("Finalizing...", "Waiting for receipt code", "")
-                while time.time() - poll_start < poll_timeout:
-                    try:
-                        r = requests.post(f"{BACKEND_URL}/api/lookup-receipt", json={"tx_hash": tx_hash}, timeout=5)
-                        if r.status_code == 200:
-                            j = r.json()
-                            receipt_code = j.get('code')
-                            if receipt_code:
-                                break
-                    except Exception:
-                        pass
-                    time.sleep(poll_interval)
-
-            # If we still don't have a receipt code, fall back to placeholder and instruct manual verify
-            if not receipt_code:
-                receipt_display = "------"
-                # Show fallback screen with tx hash for manual verification
-                cand_name = "CANDIDATE A" if candidate_id == 1 else "CANDIDATE B"
-                show_msg("Vote Receipt:", f"Code: {receipt_display}", f"{cand_name}")
-                # Also show instruction to verify via tx hash
-                show_msg("Verify Manually:", tx_hash[:12] + "...", "Use verify.html")
+                # Exhausted attempts
+                verified = False
+                break
+
+        if not verified:
+            # Deny access and return to idle (do not block waiting for START)
+            if scanned_id is None:
+                self.log.warning("access_denied", reason="scan_failed")
+                self.show_msg("Access Denied", "Scan Failed", "Press START")
             else:
-                receipt_display = receipt_code
-                cand_name = "CANDIDATE A" if candidate_id == 1 else "CANDIDATE B"
-                show_msg("Vote Receipt:", f"Code: {receipt_display}", f"{cand_name}")
-
-            # Wait for admin/start button to be pressed before continuing
-            while GPIO.input(PIN_BTN_START) != GPIO.LOW:
-                time.sleep(0.1)
-            time.sleep(0.2)  # Debounce
-            show_msg("Vote Submitted!", "Thank you", "")
-            time.sleep(2)
-            return True
-        else:
-            # Stop spinner already requested
+                self.log.warning("access_denied", reason="finger_mismatch")
+                self.show_msg("Access Denied", "Finger Mismatch", "Press START")
+            self.set_leds(green=False, red=True)
             try:
-                err = response.json()
-                msg = err.get('message', '')
-                if 'not active' in msg.lower() or 'inactive' in msg.lower() or 'election' in msg.lower():
-                    show_msg("Vote Rejected", "Election Not Active", "Start election in admin")
-                elif 'timeout' in msg.lower():
-                    show_msg("Network Timeout", "Retry", "Blockchain slow")
-                else:
-                    show_msg("Vote Rejected", msg or "Error")
+                self.beep(count=3, duration=0.2)
             except Exception:
-                show_msg("Vote Rejected", "Error")
-            set_leds(green=False, red=True)
-            beep_error()
-            return False
-    except Exception as e:
-        # Ensure spinner stops
-        stop_event.set()
+                pass
+            # Wait for START button to reset
+            self.wait_for_reset()
+            return
+
+        # 5. VOTE INTERFACE (identity verified)
+        self.log.info("identity_verified")
+        self._journal("session", stage="verified")
+        final_choice = self.run_voting_interface(voter['name'])
+        # Check for reset signal
+        if final_choice == "RESET":
+            self.log.info("session_reset", stage="ballot")
+            return
+        # 6. SUBMIT (pipelined: confirm in background, free the booth)
+        if session:
+            self.queue_vote(session, final_choice)
+        else:
+            self.submit_vote(aadhaar, final_choice)
+            self.clock.sleep(4)
+
+    def wake(self):
+        """Wake the idle loop (a receipt is ready, or the booth is stopping)."""
+        idle = self.idle
+        if idle:
+            idle.wake()
+
+    def run(self, stop_event=None):
+        """Idle loop: sleep until START, an admin command or a finished
+        receipt needs the booth (see kiosk_idle.py)."""
+        idle = self.idle = kiosk_idle.IdleScheduler(self, stop_event)
+        idle.start()
+        # Track idle state
+        idle_message_shown = False
         try:
-            spinner_thread.join(timeout=0.5)
+            while not idle.stopped():
+                # 1. ADMIN COMMANDS (Remote Enrollment), pushed by the poller
+                cmd = idle.take_command()
+                if cmd:
+                    try:
+                        self.handle_command(cmd)
+                    except Exception:
+                        pass  # Ignore network blips while reporting back
+                    idle.command_done()
+                    idle_message_shown = False  # Reset idle state
+                    continue
+
+                # 2. VOTING MODE (Idle) - Flash finished receipts, then show idle once
+                shown, start = self.show_ready_receipts()
+                if shown:
+                    idle_message_shown = False
+                if start:
+                    idle.activity()
+                elif not idle_message_shown:
+                    self.set_leds(green=False, red=False)
+                    self.show_idle()
+                    self.log.info("idle")
+                    if self.journal:
+                        self.journal.record("idle")
+                        self.journal.compact()
+                    # Revalidate the ballot off the voter path; draw a new one now
+                    self.ballot.refresh_in_background(self.backend)
+                    self.prerender_ballot()
+                    idle.begin()
+                    idle_message_shown = True
+
+                # 3. Sleep until START is pressed (or something else needs the booth)
+                if start or idle.wait_for_start():
+                    try:
+                        self.clock.sleep(0.2)  # Debounce
+                        self.run_session()
+                    except KeyboardInterrupt:
+                        raise
+                    except Exception as e:
+                        self.log.error("session_error", exc_info=True, error=e)
+                        self.clock.sleep(2)
+                    idle_message_shown = False
+        finally:
+            idle.stop()
+            self.idle = None
+
+    def drain(self, timeout=150):
+        """Let votes still in flight finish before the process exits."""
+        if self.scheduler and self.scheduler.in_flight():
+            self.log.info("drain", in_flight=self.scheduler.in_flight())
+            self.scheduler.wait_all(timeout=timeout)
+
+
+def main():
+    # Settings: reload on SIGHUP or when votechain.json changes
+    try:
+        config.watch()
+    except ConfigError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    # Sampling profiler: KIOSK_PROFILE=1 or `kill -USR1 <pid>`
+    kiosk_profiler.install()
+    # RSS gauges; `kill -USR2 <pid>` for tracemalloc reports
+    kiosk_memory.install()
+    gpio = kiosk_hw.load_gpio()
+
+    # Always release GPIO on exit/crash
+    def _cleanup_gpio():
+        try:
+            gpio.output(PIN_LED_GREEN, gpio.LOW)
+            gpio.output(PIN_LED_RED, gpio.LOW)
+        except Exception:
+            pass
+        try:
+            gpio.cleanup()
         except Exception:
             pass
-        show_msg("Connection Fail", "Retry")
-        print(f"Vote error: {e}")
-        beep_error()
-        return False
 
-def tick_animation():
-    set_leds(green=True, red=False)
-    if device:
-        from PIL import ImageDraw
-        # Progressive draw: first segment, then second
-        x0, y0 = 40, 40  # Start
-        x1, y1 = 55, 55  # Middle
-        x2, y2 = 85, 25  # End
-        steps1 = 8
-        steps2 = 10
-        # Draw first segment progressively
-        for i in range(1, steps1 + 1):
-            with canvas(device) as draw:
-                draw.rectangle(device.bounding_box, fill="black")
-                # Interpolate point
-                xi = x0 + (x1 - x0) * i / steps1
-                yi = y0 + (y1 - y0) * i / steps1
-                draw.line((x0, y0, xi, yi), fill="white", width=6)
-            time.sleep(0.02)
-        # Draw second segment progressively
-        for i in range(1, steps2 + 1):
-            with canvas(device) as draw:
-                draw.rectangle(device.bounding_box, fill="black")
-                # Draw full first segment
-                draw.line((x0, y0, x1, y1), fill="white", width=6)
-                # Interpolate second segment
-                xi = x1 + (x2 - x1) * i / steps2
-                yi = y1 + (y2 - y1) * i / steps2
-                draw.line((x1, y1, xi, yi), fill="white", width=6)
-            time.sleep(0.02)
-        # Hold final tick
-        with canvas(device) as draw:
-            draw.rectangle(device.bounding_box, fill="black")
-            draw.line((x0, y0, x1, y1), fill="white", width=6)
-            draw.line((x1, y1, x2, y2), fill="white", width=6)
-        time.sleep(0.18)
-
-def run_voting_interface(voter_name):
-    show_msg(f"Hi {voter_name}", "Select Candidate:", "A (Btn1) | B (Btn2)")
-    set_leds(green=True, red=False)
-    beep(count=1)
-    
-    selected_candidate = None
-    start_time = time.time()
-    while True:
-        if time.time() - start_time > 60:
-            show_msg("Session timed out", "Returning to idle", "")
-            time.sleep(2)
-            return "RESET"
-        # Check for reset button
-        if GPIO.input(PIN_BTN_START) == GPIO.LOW:
-            time.sleep(0.2)
-            print("\n⚠️ Vote cancelled by reset")
-            return "RESET"
-        # 1. Wait for input
-        if GPIO.input(PIN_BTN_A) == GPIO.LOW:
-            new_selection = 1
-            beep(count=1, duration=0.05)
-            start_time = time.time()  # Reset the timer on input
-            time.sleep(0.3)
-        elif GPIO.input(PIN_BTN_B) == GPIO.LOW:
-            new_selection = 2
-            beep(count=1, duration=0.05)
-            start_time = time.time()  # Reset the timer on input
-            time.sleep(0.3)
-        else:
-            new_selection = None
-        # 2. Handle Selection logic
-        if new_selection is not None:
-            if selected_candidate == new_selection:
-                return selected_candidate
-            else:
-                selected_candidate = new_selection
-                cand_name = "CANDIDATE A" if selected_candidate == 1 else "CANDIDATE B"
-                show_msg("CONFIRM VOTE:", cand_name, "Press Again ->")
-        time.sleep(0.05)
+    atexit.register(_cleanup_gpio)
+
+    # --- BACKEND DISCOVERY ---
+    backend = BackendClient(config.backend_urls)
+    discovery = discovery_from_env(backend)
+    if not discovery:
+        # Fixed URLs: follow edits to backend_urls on reload
+        @config.on_change
+        def _follow_backend_urls(changed):
+            if "backend_urls" in changed:
+                backend.set_endpoints(changed["backend_urls"][1])
+    if discovery:
+        discovery.boot()
+        discovery.start(threading.Event())
+    print(f"🌐 Backend: {backend.base_url}")
+    voted_filter = kiosk_voted_filter.VotedFilter.for_kiosk(backend)
+
+    # --- SENSOR / GPIO / OLED SETUP ---
+    try:
+        booth = Booth.open(DEFAULT_BOOTH, backend=backend, voted_filter=voted_filter)
+        print("✓ Fingerprint sensor initialized")
+    except Exception as e:
+        print(f"❌ FATAL: Fingerprint sensor unavailable: {e}")
+        print("❌ Please check the wiring and connections.")
+        print("❌ Cannot start kiosk without fingerprint scanner.")
+        device = kiosk_hw.open_oled(DEFAULT_BOOTH)
+        Booth(DEFAULT_BOOTH, gpio, device, None, backend=backend, pipeline=0).show_sensor_error(str(e))
+        # Do not exit, just wait for manual intervention
+        while True:
+            time.sleep(10)
 
-# --- MAIN APP LOOP ---
+    if booth.device is None:
+        print("❌ SCREEN INITIALIZATION FAILED: Check SPI wiring!")
+    else:
+        print("✅ Screen initialized successfully.")
 
-if __name__ == '__main__':
     # Verify sensor is working
-    if finger.read_sysparam() != adafruit_fingerprint.OK:
+    if booth.finger.read_sysparam() != FP_OK:
         print("❌ Sensor check failed. Please check the wiring.")
         sys.exit(1)
-    # Run hardware health check on boot
-    hardware_health_check(device)
+    # Hardware health check on boot (skipped right after a crash), then
+    # recover the session the journal left open
+    booth.boot()
+    if config.record_path:
+        import kiosk_replay
+        recorder = kiosk_replay.Recorder.attach(booth, kiosk_replay.record_path(config.record_path, booth.name))
+        atexit.register(recorder.close)
     print("--- VOTECHAIN KIOSK LIVE (V3) ---")
-    beep(count=2)
-    # Track idle state
-    idle_message_shown = False
-    while True:
-        # 1. POLL FOR ADMIN COMMANDS (Remote Enrollment)
-        try:
-            res = requests.get(f"{BACKEND_URL}/api/kiosk/poll-commands", timeout=0.5)
-            cmd = res.json()
-            
-            if cmd.get('command') == 'ENROLL':
-                # --- SWITCH TO ENROLLMENT MODE ---
-                print(f"\n🔔 [REMOTE ENROLL] Command received for {cmd['name']}")
-                success = perform_remote_enrollment(cmd['target_finger_id'], cmd['name'])
-                
-                # Report result back to server
-                requests.post(f"{BACKEND_URL}/api/kiosk/enrollment-complete", 
-                              json={"success": success, "fingerprint_id": cmd['target_finger_id']})
-                
-                time.sleep(2)
-                idle_message_shown = False  # Reset idle state
-                continue # Skip voting loop, check for commands again
-        except: 
-            pass # Ignore network blips during polling
-
-        # 2. VOTING MODE (Idle) - Show idle message once
-        if not idle_message_shown:
-            set_leds(green=False, red=False)
-            show_idle()
-            print("\n⏳ Polling for commands... (Press Ctrl+C to exit)")
-            idle_message_shown = True
-        # Small delay to prevent CPU spinning, then poll again
-        time.sleep(0.5)
-        
-        # Check if START button is pressed to begin voting
-        if GPIO.input(PIN_BTN_START) == GPIO.LOW:
-            try:
-                time.sleep(0.2)  # Debounce
-                # Use direct keyboard device reading (works headless, no terminal focus needed)
-                aadhaar = read_aadhaar_from_keyboard_device()
-                # Check for reset during input
-                if aadhaar == "RESET" or not aadhaar or aadhaar.strip() == "":
-                    print("🔄 Reset during Aadhaar input or empty, returning to idle...")
-                    idle_message_shown = False
-                    continue
-                # Fallback to simple TTY input if evdev fails
-                if not aadhaar:
-                    aadhaar = read_aadhaar_simple()
-                if not aadhaar or aadhaar.strip() == "":
-                    idle_message_shown = False
-                    continue # Loop back to check for commands
-                # 3. VOTER CHECK-IN
-                voter = check_in_voter(aadhaar)
-                # Check for reset signal from check-in
-                if voter == "RESET":
-                    print("🔄 Resetting to idle...")
-                    idle_message_shown = False
-                    continue
-                if voter:
-                    # 4. VERIFY FINGERPRINT (allow one retry)
-                    show_msg("Verifying...", "Scan Finger", "Or Press START")
-                    set_leds(green=True, red=False)
-                    print(f"Expecting Finger ID #{voter['fingerprint_id']}")
-
-                    verified = False
-                    max_attempts = 2
-                    attempt = 0
-                    while attempt < max_attempts:
-                        scanned_id = scan_finger_and_get_id()
-                        # Check for reset signal
-                        if scanned_id == "RESET":
-                            print("🔄 Resetting to idle...")
-                            idle_message_shown = False
-                            verified = False
-                            break
-                        # Successful match
-                        if scanned_id == voter['fingerprint_id']:
-                            verified = True
-                            break
-                        
-                        # Failed scan (None) or wrong fingerprint ID
-                        attempt += 1
-                        if attempt < max_attempts:
-                            if scanned_id is None:
-                                print("⚠️ Scan failed — prompting retry")
-                                show_msg("Scan Failed", "Try again", "Attempt 2 of 2")
-                            else:
-                                print(f"⚠️ Wrong finger (got ID #{scanned_id}) — prompting retry")
-                                show_msg("Wrong Finger", "Try again", "Attempt 2 of 2")
-                            # Audible prompt
-                            try:
-                                beep(count=1, duration=0.05)
-                            except Exception:
-                                pass
-                            time.sleep(1)
-                            # loop to allow next scan
-                            continue
-                        else:
-                            # Exhausted attempts
-                            verified = False
-                            break
-
-                    if not verified:
-                        # Deny access and return to idle (do not block waiting for START)
-                        if scanned_id is None:
-                            print("⛔ Scan failed after retries.")
-                            show_msg("Access Denied", "Scan Failed", "Press START")
-                        else:
-                            print("⛔ Mismatch after retries.")
-                            show_msg("Access Denied", "Finger Mismatch", "Press START")
-                        set_leds(green=False, red=True)
-                        try:
-                            beep(count=3, duration=0.2)
-                        except Exception:
-                            pass
-                        # Wait for START button to reset
-                        while True:
-                            if GPIO.input(PIN_BTN_START) == GPIO.LOW:
-                                time.sleep(0.2)
-                                idle_message_shown = False
-                                break
-                            time.sleep(0.1)
-                        continue
-
-                    # 5. VOTE INTERFACE (identity verified)
-                    print("✅ Identity Verified.")
-                    final_choice = run_voting_interface(voter['name'])
-                    # Check for reset signal
-                    if final_choice == "RESET":
-                        print("🔄 Resetting to idle...")
-                        idle_message_shown = False
-                        continue
-                    # 6. SUBMIT
-                    submit_vote(aadhaar, final_choice)
-                    time.sleep(4)
-                    idle_message_shown = False  # Reset for next iteration
-                else:
-                    # No voter found but not a reset signal, just go back to idle
-                    idle_message_shown = False
-            except KeyboardInterrupt:
-                GPIO.cleanup()
-                break
-            except Exception as e:
-                print(f"Error: {e}")
-                idle_message_shown = False
-                time.sleep(2)
\ No newline at end of file
+    booth.beep(count=2)
+    try:
+        booth.run()
+    except KeyboardInterrupt:
+        booth.drain()
+        gpio.cleanup()
+
+
+if __name__ == '__main__':
+    main()
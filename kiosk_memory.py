@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Memory Diagnostics
+
+Booths run on 512MB boards next to other services, so the kiosk watches its
+own footprint:
+
+- RSS (/proc/self/statm) is sampled every `memory_interval` seconds into the
+  rss_bytes and rss_peak_bytes gauges; the last RSS_HISTORY samples are kept
+  for reports. Crossing `memory_limit_mb` logs a warning and counts
+  memory_over_limit.
+- tracemalloc is off by default (it slows allocation and adds memory).
+
+    kill -USR2 <kiosk pid>      # first: start tracing; then: write a report
+    KIOSK_MEMORY_TRACE=1 python3 kiosk_main.py      # trace from startup
+
+Each report goes to `memory_dir` as kiosk-<pid>-<time>-mem.txt: RSS over
+time, the top allocation sites, and the growth since the previous report
+(the same line growing report after report is the leak).
+"""
+
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+from votechain_config import config
+from votechain_metrics import metrics
+
+RSS_HISTORY = 240
+TOP_SITES = 25
+MB = 1024 * 1024
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# Noise in every snapshot: tracemalloc itself and the import machinery
+_IGNORE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def rss_bytes():
+    """Resident set size of this process, or None off Linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryMonitor:
+    """RSS sampler plus on-demand tracemalloc reports."""
+
+    def __init__(self, name="kiosk"):
+        self.name = name
+        self.history = deque(maxlen=RSS_HISTORY)    # (time, rss bytes)
+        self.peak = 0
+        self._over = False
+        self._last = None           # previous snapshot, for the growth diff
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def sample(self):
+        rss = rss_bytes()
+        if rss is None:
+            return None
+        self.history.append((time.time(), rss))
+        self.peak = max(self.peak, rss)
+        metrics.set("rss_bytes", rss)
+        metrics.set("rss_peak_bytes", self.peak)
+        limit = config.memory_limit_mb * MB
+        over = limit > 0 and rss > limit
+        if over and not self._over:
+            metrics.inc("memory_over_limit")
+            print(f"⚠️ RSS {rss / MB:.0f}MB is over memory_limit_mb ({config.memory_limit_mb}MB)")
+        self._over = over
+        return rss
+
+    def start(self):
+        """Sample RSS in the background (no-op if already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="kiosk-memory", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(max(1.0, config.memory_interval))
+
+    # --- tracemalloc ---
+
+    def trace(self):
+        """Start tracemalloc; the first report diffs against this point."""
+        with self._lock:
+            if tracemalloc.is_tracing():
+                return False
+            tracemalloc.start(config.memory_trace_frames)
+            self._last = tracemalloc.take_snapshot().filter_traces(_IGNORE)
+        print(f"🔬 tracemalloc on ({config.memory_trace_frames} frames); SIGUSR2 writes a report")
+        return True
+
+    def untrace(self):
+        with self._lock:
+            tracemalloc.stop()
+            self._last = None
+
+    def on_signal(self):
+        if not self.trace():
+            try:
+                print(f"🔬 Memory report -> {self.report()}")
+            except OSError as e:
+                print(f"⚠️ Memory report not written: {e}")
+
+    def report(self, out_dir=None):
+        """Write RSS history, top allocation sites and growth since the
+        last report. Returns the path."""
+        with self._lock:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORE)
+            previous, self._last = self._last, snapshot
+        self.sample()
+        out_dir = out_dir or config.memory_dir
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"{self.name}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}-mem.txt")
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        with open(path, "w") as f:
+            f.write(f"RSS peak {self.peak / MB:.1f}MB; traced {traced / MB:.1f}MB "
+                    f"(peak {traced_peak / MB:.1f}MB)\n\n")
+            f.write(f"{'time':<10}{'rss MB':>8}\n")
+            for t, rss in self.history:
+                f.write(f"{time.strftime('%H:%M:%S', time.localtime(t)):<10}{rss / MB:>8.1f}\n")
+            f.write(f"\nTop {TOP_SITES} allocation sites\n{'KiB':>10}{'blocks':>9}  where\n")
+            for stat in snapshot.statistics("lineno")[:TOP_SITES]:
+                f.write(f"{stat.size / 1024:>10.1f}{stat.count:>9}  {stat.traceback}\n")
+            if previous is not None:
+                f.write(f"\nGrowth since the previous report\n{'KiB':>10}{'blocks':>9}  where\n")
+                for stat in snapshot.compare_to(previous, "lineno")[:TOP_SITES]:
+                    if stat.size_diff <= 0:
+                        break
+                    f.write(f"{stat.size_diff / 1024:>+10.1f}{stat.count_diff:>+9}  {stat.traceback}\n")
+        return path
+
+
+monitor = MemoryMonitor()
+
+
+def _on_config(changed):
+    if "memory_trace" not in changed:
+        return
+    if changed["memory_trace"][1]:
+        monitor.trace()
+    else:
+        monitor.untrace()
+
+
+def install():
+    """SIGUSR2 starts tracemalloc / writes a report; RSS sampling starts
+    unless memory_interval is 0. Call from the main thread after
+    config.watch()."""
+    if threading.current_thread() is threading.main_thread():
+        # Reports take a moment on a Pi: write them off the signal handler
+        signal.signal(signal.SIGUSR2, lambda *_: threading.Thread(
+            target=monitor.on_signal, name="kiosk-memory-report", daemon=True).start())
+    config.on_change(_on_config)
+    if config.memory_interval > 0:
+        monitor.start()
+    if config.memory_trace:
+        monitor.trace()
+    return monitor
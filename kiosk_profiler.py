@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Sampling Profiler
+
+Opt-in wall-clock profiler for a running kiosk. A daemon thread samples the
+stack of every thread (main loop, booth threads, the submit spinner, vote
+submit workers, backend hedges) every `profile_interval` seconds using
+sys._current_frames(), so the booth code is never instrumented or slowed
+by tracing. Blocked threads are sampled too: a booth stuck in a check-in
+shows up under kiosk_backend / requests, not as idle time.
+
+    KIOSK_PROFILE=1 python3 kiosk_main.py       # profile from startup
+    kill -USR1 <kiosk pid>                      # start; again to stop early
+
+A capture stops after `profile_seconds` (0 = until the next SIGUSR1 or
+exit) and writes two files to `profile_dir`:
+
+    kiosk-<pid>-<time>.collapsed    one "thread;frame;frame count" line per
+                                    stack, for flamegraph.pl / speedscope
+    kiosk-<pid>-<time>.txt          per-function self and total samples,
+                                    and samples per thread
+
+Settings live in votechain_config (profile, profile_interval,
+profile_seconds, profile_dir); setting `profile` in votechain.json and
+reloading starts or stops a capture as well.
+"""
+
+import atexit
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+from votechain_config import config
+from votechain_metrics import metrics
+
+MAX_DEPTH = 64
+TOP_FUNCTIONS = 40
+# ThreadPoolExecutor workers are named <prefix>_<n>; profile them together
+_WORKER_SUFFIX = re.compile(r"_\d+$")
+
+
+class Profiler:
+    """Samples every thread's stack into collapsed-stack counts."""
+
+    def __init__(self, interval=None, seconds=None, out_dir=None, name="kiosk"):
+        self.interval = interval
+        self.seconds = seconds
+        self.out_dir = out_dir
+        self.name = name
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self._labels = {}           # code object -> "module:function"
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Begin a capture (no-op if one is running). Returns True if started."""
+        with self._lock:
+            if self.running:
+                return False
+            self.stacks = Counter()
+            self.samples = 0
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="kiosk-profiler", daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self, wait=True):
+        """End the capture; the sampler thread writes the files."""
+        self._stop.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10)
+
+    def toggle(self):
+        if self.running:
+            self.stop(wait=False)
+        else:
+            self.start()
+
+    # --- Sampling ---
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            func = getattr(code, "co_qualname", code.co_name)
+            # ';' separates frames in the collapsed format
+            label = f"{module}:{func}".replace(";", ",").replace(" ", "_")
+            self._labels[code] = label
+        return label
+
+    def sample(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        me = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            thread = _WORKER_SUFFIX.sub("", names.get(ident, f"thread-{ident}")).replace(" ", "_")
+            stack.append(thread)
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        interval = self.interval or config.profile_interval
+        seconds = config.profile_seconds if self.seconds is None else self.seconds
+        self.started = time.time()
+        deadline = time.monotonic() + seconds if seconds > 0 else None
+        print(f"📈 Profiling every {interval * 1000:.0f}ms "
+              f"({f'{seconds:.0f}s' if deadline else 'until SIGUSR1'})...")
+        metrics.set("profiler_running", 1)
+        cost = 0.0
+        next_at = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                t = time.perf_counter()
+                self.sample()
+                cost += time.perf_counter() - t
+                next_at += interval
+                now = time.monotonic()
+                if deadline and now >= deadline:
+                    break
+                # Fixed rate; skip ahead instead of bursting after a stall
+                if next_at < now:
+                    next_at = now
+                self._stop.wait(next_at - now)
+        finally:
+            metrics.set("profiler_running", 0)
+        elapsed = time.time() - self.started
+        metrics.observe("profiler_sample_s", cost / self.samples if self.samples else 0)
+        try:
+            paths = self.write()
+            print(f"📈 Profile: {self.samples} samples over {elapsed:.1f}s "
+                  f"(sampler CPU {cost / max(elapsed, 1e-9):.1%}) -> {paths[0]}")
+        except OSError as e:
+            print(f"⚠️ Profile not written: {e}")
+
+    # --- Output ---
+
+    def summary(self):
+        """(self counts, total counts, per-thread counts) by function label."""
+        own, total, threads = Counter(), Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            threads[frames[0]] += count
+            if len(frames) > 1:
+                own[frames[-1]] += count
+            for func in set(frames[1:]):
+                total[func] += count
+        return own, total, threads
+
+    def write(self, out_dir=None):
+        """Write the collapsed stacks and the summary. Returns both paths."""
+        out_dir = out_dir or self.out_dir or config.profile_dir
+        os.makedirs(out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started or time.time()))
+        base = os.path.join(out_dir, f"{self.name}-{os.getpid()}-{stamp}")
+        with open(f"{base}.collapsed", "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        own, total, threads = self.summary()
+        n = max(1, self.samples)
+        with open(f"{base}.txt", "w") as f:
+            f.write(f"{self.samples} samples of every thread; % = share of samples a thread was in the function\n\n")
+            f.write(f"{'self %':>7} {'total %':>8}  function\n")
+            for func, count in total.most_common(TOP_FUNCTIONS):
+                f.write(f"{own[func] / n:>7.1%} {count / n:>8.1%}  {func}\n")
+            f.write(f"\n{'samples':>8}  thread\n")
+            for thread, count in threads.most_common():
+                f.write(f"{count:>8}  {thread}\n")
+        return f"{base}.collapsed", f"{base}.txt"
+
+
+profiler = Profiler()
+
+
+def _on_config(changed):
+    if "profile" not in changed:
+        return
+    if changed["profile"][1]:
+        profiler.start()
+    else:
+        profiler.stop(wait=False)
+
+
+def install():
+    """SIGUSR1 toggles a capture; KIOSK_PROFILE / `profile` starts one now.
+    Call from the main thread after config.watch()."""
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda *_: profiler.toggle())
+    config.on_change(_on_config)
+    # A capture still running at exit (profile_seconds=0) is written then
+    atexit.register(profiler.stop)
+    if config.profile:
+        profiler.start()
+    return profiler
@@ -0,0 +1,669 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Session Recorder / Replayer
+
+Recording: set KIOSK_RECORD to a path (strftime codes and {booth} are
+expanded) and every input the booth sees is appended to a gzip'd JSON-lines
+log with its time offset:
+
+    gpio  button level changes            {"k":"gpio","pin":4,"v":0}
+    key   keyboard events                 {"k":"key","c":2,"v":1}
+    fp    fingerprint sensor results      {"k":"fp","op":"finger_search","r":0,"id":7}
+    http  backend responses and latency   {"k":"http","m":"POST","p":"/api/vote","lat":3.2,"s":200,"b":"..."}
+    vf    voted filter verdicts           {"k":"vf","hit":false}
+
+Aadhaar digits are replaced with random digits while recording (same
+length, so the flow is unchanged) and request bodies are never stored.
+Response bodies are stored, except for the answers that would tie a voter
+to the buttons they pressed (see REDACTED):
+
+    /api/voter/check-in     status, message and fingerprint_id only; the
+                            name becomes "VOTER", photo_url is dropped
+    /api/vote               status and message; transaction_hash and
+                            receipt_code become placeholders (a missing
+                            code stays missing)
+    /api/lookup-receipt     status; the code becomes a placeholder
+
+Fingerprint slot ids, in those answers and in sensor results, are replaced
+with per-recording aliases (1, 2, ... in order of first use), so a match
+still matches on replay.
+
+Replaying feeds the log back through kiosk_main.Booth at real or
+accelerated speed. Buttons, keys and finger presence follow the recorded
+timeline; sensor results and backend responses are returned in recorded
+order after their recorded latency. The report gives time per voter and
+CPU per voter, so captured election-day sessions can be used as
+regression benchmarks:
+
+    python3 kiosk_replay.py replay session.jsonl.gz --speed 10 --quiet
+    python3 kiosk_replay.py info session.jsonl.gz
+"""
+
+import argparse
+import bisect
+import contextlib
+import gzip
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict
+
+import kiosk_hw
+from kiosk_hw import BoothConfig, SimGPIO, FP_OK, FP_NOFINGER, FP_NOTFOUND, ecodes
+from kiosk_voted_filter import VotedFilter
+from votechain_metrics import percentile
+
+LOG_VERSION = 1
+
+# Endpoints the booth polls while idle. Only changes are recorded and the
+# replay serves them by time instead of by call count.
+POLLED = {"/api/kiosk/poll-commands": '{"command": "NONE"}'}
+
+# Stand-ins for the receipt of a recorded vote, same shape as the real ones
+REDACTED_TX = "0x" + "0" * 64
+REDACTED_CODE = "XXXXXX"
+
+_DIGIT_KEYS = [getattr(ecodes, f"KEY_{d}") for d in range(10)]
+_KEYPAD_KEYS = [getattr(ecodes, f"KEY_KP{d}") for d in range(10)]
+
+
+def record_path(template, booth_name):
+    """Expand {booth} and strftime codes in a KIOSK_RECORD path."""
+    return time.strftime(template.replace("{booth}", booth_name))
+
+
+# ============================================================
+# RECORDING
+# ============================================================
+
+class Recorder:
+    """Appends timestamped events to a gzip'd JSON-lines log."""
+
+    def __init__(self, path, header, clock=time, flush_interval=5.0):
+        self.path = path
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._f = gzip.open(path, 'wt', encoding='utf-8')
+        self._t0 = clock.time()
+        self._last_flush = self._t0
+        self.events = 0
+        self._aliases = {}
+        self._write(dict(header, v=LOG_VERSION, started=time.strftime("%Y-%m-%dT%H:%M:%S")))
+
+    @classmethod
+    def attach(cls, booth, path, redact=True):
+        """Wrap the booth's devices and backend so everything they return
+        is also written to `path`."""
+        pipeline = booth.scheduler.max_in_flight if booth.scheduler else 0
+        rec = cls(path, {"booth": asdict(booth.cfg), "pipeline": pipeline,
+                         "ballot": booth.ballot.to_dict()}, clock=booth.clock)
+        booth.gpio = RecordingGPIO(booth.gpio, rec)
+        booth.finger = RecordingFingerprint(booth.finger, rec, redact=redact)
+        if booth.keyboard is not None:
+            booth.keyboard = RecordingKeyboard(booth.keyboard, rec, redact=redact)
+        booth.backend = RecordingBackend(booth.backend, rec, redact=redact)
+        if booth.voted_filter is not None:
+            booth.voted_filter = RecordingVotedFilter(booth.voted_filter, rec)
+        if booth.scheduler:
+            booth.scheduler.backend = booth.backend
+        print(f"⏺️ [{booth.name}] Recording session to {path}")
+        return rec
+
+    def _write(self, obj):
+        self._f.write(json.dumps(obj, separators=(',', ':')) + "\n")
+
+    def emit(self, kind, **fields):
+        now = self.clock.time()
+        with self._lock:
+            if self._f.closed:
+                return
+            self._write(dict(t=round(now - self._t0, 4), k=kind, **fields))
+            self.events += 1
+            # Bound what a power cut can lose without flushing per event
+            if now - self._last_flush >= self.flush_interval:
+                self._f.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
+
+    def alias(self, fingerprint_id):
+        """Stand-in for a sensor slot id: the same slot gets the same alias
+        for the whole recording."""
+        if fingerprint_id is None:
+            return None
+        with self._lock:
+            return self._aliases.setdefault(fingerprint_id, len(self._aliases) + 1)
+
+
+class _Proxy:
+    """Forwards everything that is not recorded to the wrapped object."""
+
+    def __init__(self, inner, rec):
+        self._inner = inner
+        self._rec = rec
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+class RecordingGPIO(_Proxy):
+    def __init__(self, inner, rec):
+        super().__init__(inner, rec)
+        self._levels = {}
+
+    def input(self, pin):
+        value = self._inner.input(pin)
+        # Buttons are polled every 50-100ms; only level changes are kept
+        if self._levels.get(pin) != value:
+            self._levels[pin] = value
+            self._rec.emit("gpio", pin=pin, v=value)
+        return value
+
+
+class RecordingFingerprint(_Proxy):
+    def __init__(self, inner, rec, redact=True):
+        super().__init__(inner, rec)
+        self.redact = redact
+        self._last_image = None
+
+    def _call(self, op, *args):
+        start = time.perf_counter()
+        result = getattr(self._inner, op)(*args)
+        return result, round(time.perf_counter() - start, 4)
+
+    def get_image(self):
+        r, d = self._call("get_image")
+        # Finger presence is a level, like a button
+        if r != self._last_image:
+            self._last_image = r
+            self._rec.emit("fp", op="get_image", r=r, d=d)
+        return r
+
+    def image_2_tz(self, slot=1):
+        r, d = self._call("image_2_tz", slot)
+        self._rec.emit("fp", op="image_2_tz", r=r, d=d)
+        return r
+
+    def finger_search(self):
+        r, d = self._call("finger_search")
+        finger_id = self._inner.finger_id if r == FP_OK else None
+        if self.redact:
+            finger_id = self._rec.alias(finger_id)
+        self._rec.emit("fp", op="finger_search", r=r, d=d, id=finger_id)
+        return r
+
+    def create_model(self):
+        r, d = self._call("create_model")
+        self._rec.emit("fp", op="create_model", r=r, d=d)
+        return r
+
+    def store_model(self, location_id):
+        r, d = self._call("store_model", location_id)
+        self._rec.emit("fp", op="store_model", r=r, d=d)
+        return r
+
+
+class RecordingVotedFilter(_Proxy):
+    """The filter itself is replicated in the background and not recorded;
+    its verdict per entered Aadhaar is."""
+
+    def might_have_voted(self, aadhaar_id):
+        hit = self._inner.might_have_voted(aadhaar_id)
+        self._rec.emit("vf", hit=hit)
+        return hit
+
+
+class RecordingKeyboard(_Proxy):
+    def __init__(self, inner, rec, redact=True):
+        super().__init__(inner, rec)
+        self.redact = redact
+        self._held = {}
+
+    def _code(self, code, value):
+        if not self.redact:
+            return code
+        for keys in (_DIGIT_KEYS, _KEYPAD_KEYS):
+            if code in keys:
+                # Same random digit for press, repeat and release
+                if value == 1 or code not in self._held:
+                    self._held[code] = random.choice(keys)
+                return self._held[code]
+        return code
+
+    def read_loop(self):
+        for event in self._inner.read_loop():
+            if event.type == ecodes.EV_KEY:
+                self._rec.emit("key", c=self._code(event.code, event.value), v=event.value)
+            yield event
+
+
+def _redact_checkin(rec, body):
+    data = body.get("data")
+    if isinstance(data, dict):
+        body["data"] = {"name": "VOTER", "fingerprint_id": rec.alias(data.get("fingerprint_id"))}
+    return body
+
+
+def _redact_vote(rec, body):
+    data = body.get("data")
+    if isinstance(data, dict):
+        body["data"] = {"transaction_hash": REDACTED_TX if data.get("transaction_hash") else None,
+                        "receipt_code": REDACTED_CODE if data.get("receipt_code") or data.get("short_code") else None}
+    return body
+
+
+def _redact_receipt(rec, body):
+    if body.get("code"):
+        body["code"] = REDACTED_CODE
+    return body
+
+
+# Answers that identify a voter or their receipt. Only the fields the booth
+# branches on are kept; with the GPIO timeline the rest would tie a voter
+# to their ballot.
+REDACTED = {
+    "/api/voter/check-in": _redact_checkin,
+    "/api/vote": _redact_vote,
+    "/api/lookup-receipt": _redact_receipt,
+}
+_KEPT_FIELDS = ("status", "message", "data", "code")
+
+
+class RecordingBackend(_Proxy):
+    def __init__(self, inner, rec, redact=True):
+        super().__init__(inner, rec)
+        self.redact = redact
+        self._polled = {}
+
+    def _body(self, endpoint, response):
+        if not self.redact or endpoint not in REDACTED:
+            return response.text
+        try:
+            body = response.json()
+        except Exception:
+            return ""
+        if not isinstance(body, dict):
+            return ""
+        body = {k: v for k, v in body.items() if k in _KEPT_FIELDS}
+        return json.dumps(REDACTED[endpoint](self._rec, body), separators=(',', ':'))
+
+    def request(self, method, path, **kwargs):
+        endpoint = path.split("?", 1)[0]
+        start = time.perf_counter()
+        try:
+            response = self._inner.request(method, path, **kwargs)
+        except Exception as e:
+            self._emit(endpoint, m=method, p=endpoint, lat=round(time.perf_counter() - start, 4),
+                       err=f"{type(e).__name__}: {e}")
+            raise
+        self._emit(endpoint, m=method, p=endpoint, lat=round(time.perf_counter() - start, 4),
+                   s=response.status_code, b=self._body(endpoint, response))
+        return response
+
+    def _emit(self, endpoint, **fields):
+        if endpoint in POLLED:
+            outcome = (fields.get('s'), fields.get('b'), fields.get('err'))
+            if self._polled.get(endpoint) == outcome:
+                return
+            self._polled[endpoint] = outcome
+        self._rec.emit("http", **fields)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+
+# ============================================================
+# REPLAY
+# ============================================================
+
+class ScaledClock:
+    """Clock running `speed` times faster than the wall clock."""
+
+    def __init__(self, speed=1.0):
+        if speed <= 0:
+            raise ValueError("speed must be > 0")
+        self.speed = speed
+        self._origin = time.time()
+        self._m0 = time.monotonic()
+
+    def time(self):
+        return self._origin + (time.monotonic() - self._m0) * self.speed
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+
+def load(path):
+    """Read a recorded log. Returns (header, events)."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('v') != LOG_VERSION:
+            raise ValueError(f"Unsupported log version {header.get('v')} in {path}")
+        events = [json.loads(line) for line in f if line.strip()]
+    return header, events
+
+
+class _Timeline:
+    def __init__(self, clock, t0):
+        self.clock = clock
+        self.t0 = t0
+
+    def elapsed(self):
+        return self.clock.time() - self.t0
+
+
+class ReplayGPIO(SimGPIO):
+    """Button levels follow the recorded timeline; outputs are simulated."""
+
+    def __init__(self, events, timeline):
+        super().__init__()
+        self.timeline = timeline
+        self._streams = defaultdict(lambda: ([], []))
+        for ev in events:
+            times, levels = self._streams[ev['pin']]
+            times.append(ev['t'])
+            levels.append(ev['v'])
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        # Levels come from the timeline, so no edge would ever fire; the
+        # booth reads the pin instead
+        raise RuntimeError("replayed GPIO has no edge detection")
+
+    def input(self, pin):
+        if pin not in self._streams:
+            return super().input(pin)
+        times, levels = self._streams[pin]
+        i = bisect.bisect_right(times, self.timeline.elapsed()) - 1
+        return levels[i] if i >= 0 else self.HIGH
+
+
+class ReplayFingerprint:
+    """Finger presence follows the timeline; other results play in order."""
+
+    DEFAULTS = {"image_2_tz": kiosk_hw.FP_IMAGEFAIL, "finger_search": FP_NOTFOUND,
+                "create_model": FP_OK, "store_model": FP_OK}
+
+    def __init__(self, events, timeline):
+        self.timeline = timeline
+        self.finger_id = None
+        self._image = [(ev['t'], ev['r'], ev.get('d', 0)) for ev in events if ev['op'] == "get_image"]
+        self._image_times = [t for t, _, _ in self._image]
+        self._ops = defaultdict(deque)
+        for ev in events:
+            if ev['op'] != "get_image":
+                self._ops[ev['op']].append(ev)
+
+    def read_sysparam(self):
+        return FP_OK
+
+    def set_led(self, color=1, mode=3):
+        return FP_OK
+
+    def get_image(self):
+        i = bisect.bisect_right(self._image_times, self.timeline.elapsed()) - 1
+        if i < 0:
+            self.timeline.clock.sleep(self._image[0][2] if self._image else 0.05)
+            return FP_NOFINGER
+        _, r, d = self._image[i]
+        self.timeline.clock.sleep(d)
+        return r
+
+    def _next(self, op):
+        q = self._ops[op]
+        if not q:
+            return self.DEFAULTS[op]
+        ev = q.popleft()
+        self.timeline.clock.sleep(ev.get('d', 0))
+        if op == "finger_search" and ev['r'] == FP_OK:
+            self.finger_id = ev.get('id')
+        return ev['r']
+
+    def image_2_tz(self, slot=1):
+        return self._next("image_2_tz")
+
+    def finger_search(self):
+        return self._next("finger_search")
+
+    def create_model(self):
+        return self._next("create_model")
+
+    def store_model(self, location_id):
+        return self._next("store_model")
+
+
+class ReplayVotedFilter(VotedFilter):
+    """Recorded verdicts in order; confirm() goes to the replayed backend."""
+
+    def __init__(self, events):
+        super().__init__()
+        self._hits = deque(ev['hit'] for ev in events)
+
+    def might_have_voted(self, aadhaar_id):
+        return self._hits.popleft() if self._hits else False
+
+
+class ReplayKeyboard:
+    """Delivers recorded key events once the replay clock reaches them."""
+
+    def __init__(self, events, timeline, name="Replay Keyboard"):
+        self.name = name
+        self.timeline = timeline
+        self._events = deque(events)
+        self._lock = threading.Lock()
+
+    def grab(self):
+        pass
+
+    def ungrab(self):
+        pass
+
+    def read_loop(self):
+        while True:
+            ev = None
+            with self._lock:
+                due = self._events[0]['t'] - self.timeline.elapsed() if self._events else None
+                if due is not None and due <= 0:
+                    ev = self._events.popleft()
+            if ev is not None:
+                yield kiosk_hw._SimEvent(ecodes.EV_KEY, ev['c'], ev['v'])
+                continue
+            # Wake up like SimKeyboard so callers can check timeouts/START
+            self.timeline.clock.sleep(0.2 if due is None else min(0.2, due))
+            yield kiosk_hw._SimEvent(0, 0, 0)
+
+
+class ReplayResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.ok = 200 <= status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ReplayBackend:
+    """Returns recorded responses after their recorded latency."""
+
+    def __init__(self, events, timeline):
+        self.timeline = timeline
+        self._lock = threading.Lock()
+        self._queues = defaultdict(deque)
+        for ev in events:
+            self._queues[(ev['m'], ev['p'])].append(ev)
+
+    def _pop(self, method, endpoint):
+        q = self._queues[(method, endpoint)]
+        if endpoint not in POLLED:
+            return q.popleft() if q else None
+        # Polled endpoints: serve the latest recorded change that is due,
+        # once; otherwise the idle answer.
+        now = self.timeline.elapsed()
+        ev = None
+        while q and q[0]['t'] <= now:
+            ev = q.popleft()
+        return ev or {'lat': 0.02, 's': 200, 'b': POLLED[endpoint]}
+
+    def request(self, method, path, **kwargs):
+        endpoint = path.split("?", 1)[0]
+        with self._lock:
+            ev = self._pop(method, endpoint)
+        if ev is None:
+            raise ConnectionError(f"replay: no recorded response left for {method} {endpoint}")
+        self.timeline.clock.sleep(ev.get('lat', 0))
+        if 'err' in ev:
+            raise ConnectionError(ev['err'])
+        return ReplayResponse(ev['s'], ev['b'])
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        pass
+
+    def unused(self):
+        """Recorded responses the replay never asked for (flow diverged)."""
+        with self._lock:
+            return {f"{m} {p}": len(q) for (m, p), q in self._queues.items()
+                    if q and p not in POLLED}
+
+
+def replay(path, speed=1.0, pipeline=None, tail=5.0, quiet=False):
+    """Run a recorded log through a Booth and return a benchmark report."""
+    from kiosk_ballot import PATH as BALLOT_PATH, Ballot
+    from kiosk_main import Booth
+
+    header, events = load(path)
+    cfg = BoothConfig.from_dict(header['booth'])
+    by_kind = defaultdict(list)
+    for ev in events:
+        by_kind[ev['k']].append(ev)
+    duration = events[-1]['t'] if events else 0.0
+
+    # The ballot the booth had, updated by the refreshes it recorded (the
+    # replayed booth does not fetch it again)
+    ballot = Ballot.from_dict(header['ballot']) if header.get('ballot') else Ballot()
+    for ev in by_kind['http']:
+        if ev['p'] == BALLOT_PATH and ev.get('s') == 200:
+            ballot.apply(json.loads(ev['b']).get('data') or {})
+    http = [ev for ev in by_kind['http'] if ev['p'] != BALLOT_PATH]
+
+    clock = ScaledClock(speed)
+    timeline = _Timeline(clock, clock.time())
+    backend = ReplayBackend(http, timeline)
+    booth = Booth(cfg, ReplayGPIO(by_kind['gpio'], timeline),
+                  kiosk_hw.open_oled(cfg, emulate=True),
+                  ReplayFingerprint(by_kind['fp'], timeline),
+                  ReplayKeyboard(by_kind['key'], timeline, name=f"{cfg.name} replay"),
+                  backend=backend,
+                  pipeline=header.get('pipeline', 0) if pipeline is None else pipeline,
+                  clock=clock, ballot=ballot,
+                  voted_filter=ReplayVotedFilter(by_kind['vf']) if by_kind['vf'] else None)
+    booth.setup_pins()
+
+    sessions = []
+    run_session = booth.run_session
+
+    def timed_session():
+        start, cpu = clock.time(), time.process_time()
+        try:
+            run_session()
+        finally:
+            sessions.append((clock.time() - start, time.process_time() - cpu))
+    booth.run_session = timed_session
+
+    stop = threading.Event()
+    out = io.StringIO() if quiet else sys.stdout
+    wall, cpu0 = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(out):
+        runner = threading.Thread(target=booth.run, args=(stop,), name=f"{cfg.name}-replay", daemon=True)
+        runner.start()
+        # Let the booth finish whatever the last recorded event started
+        while runner.is_alive() and timeline.elapsed() < duration + tail:
+            time.sleep(0.05)
+        stop.set()
+        runner.join(timeout=30)
+        booth.drain(timeout=30)
+
+    per_voter = sorted(s for s, _ in sessions)
+    return {
+        'log': os.path.basename(path),
+        'booth': cfg.name,
+        'speed': speed,
+        'recorded_s': round(duration, 2),
+        'wall_s': round(time.perf_counter() - wall, 2),
+        'cpu_s': round(time.process_time() - cpu0, 3),
+        'sessions': len(sessions),
+        'time_per_voter_s': {
+            'p50': percentile(per_voter, 50),
+            'p95': percentile(per_voter, 95),
+            'max': per_voter[-1] if per_voter else None,
+        },
+        'cpu_per_voter_s': round(sum(c for _, c in sessions) / len(sessions), 4) if sessions else None,
+        'unused_responses': backend.unused(),
+    }
+
+
+def info(path):
+    header, events = load(path)
+    counts = defaultdict(int)
+    for ev in events:
+        counts[ev['k']] += 1
+    return {
+        'booth': header['booth']['name'],
+        'started': header.get('started'),
+        'pipeline': header.get('pipeline'),
+        'duration_s': events[-1]['t'] if events else 0.0,
+        'events': dict(counts),
+        'check_ins': sum(1 for ev in events if ev['k'] == "http" and ev['p'] == "/api/voter/check-in"),
+        'votes': sum(1 for ev in events if ev['k'] == "http" and ev['p'] == "/api/vote"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay recorded kiosk sessions")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("replay", help="replay a log and report time/CPU per voter")
+    p.add_argument("log")
+    p.add_argument("--speed", type=float, default=1.0, help="replay speed (10 = ten times faster)")
+    p.add_argument("--pipeline", type=int, default=None, help="override PIPELINE_MAX_IN_FLIGHT")
+    p.add_argument("--json", help="also write the report to this file")
+    p.add_argument("--quiet", action="store_true", help="hide the booth's console output")
+    p = sub.add_parser("info", help="summarise a log")
+    p.add_argument("log")
+    args = parser.parse_args()
+
+    try:
+        if args.cmd == "info":
+            report = info(args.log)
+        else:
+            report = replay(args.log, speed=args.speed, pipeline=args.pipeline, quiet=args.quiet)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(json.dumps(report, indent=2))
+    if getattr(args, 'json', None):
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - Pipelined Voter Sessions
+
+Submitting a vote can block for up to 90s (/api/vote) plus up to 60s of
+receipt polling. The scheduler moves that wait off the booth: each verified
+voter gets a ticket, their submission runs on a worker thread, and the booth
+goes straight back to idle for the next voter. Finished receipts are kept on
+a receipt board keyed by ticket so they reach the right voter (side screen,
+idle-screen flash or lookup by ticket number at the Aadhaar prompt,
+Booth.lookup_ticket).
+
+Worker threads only talk to the backend; they never touch GPIO or the OLED.
+They log through kiosk_log like the booth (ticket as a field).
+"""
+
+import hashlib
+import itertools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import kiosk_log
+
+# Session states
+VERIFIED = "VERIFIED"        # Identity confirmed, ballot not cast yet
+SUBMITTING = "SUBMITTING"    # /api/vote in flight
+CONFIRMED = "CONFIRMED"      # Vote accepted, waiting for short receipt code
+DONE = "DONE"                # Receipt (or tx hash fallback) available
+FAILED = "FAILED"            # Vote rejected or connection failed
+
+# Tickets run 01-99; a number this short at the Aadhaar prompt is a ticket
+TICKET_DIGITS = 2
+
+
+def is_double_vote(status, message):
+    """The backend refused the ballot because the voter has voted: 403 from
+    its has_voted check, or the contract's revert passed on as a 500."""
+    message = (message or "").lower()
+    return status == 403 or "double voting" in message or "already voted" in message
+
+
+def _voter_key(aadhaar_id):
+    """Hash the Aadhaar so in-flight bookkeeping never keeps the raw number."""
+    return hashlib.sha256(str(aadhaar_id).encode()).hexdigest()
+
+
+class VoterSession:
+    """State for one voter, isolated from every other session at the booth."""
+
+    def __init__(self, ticket, aadhaar_id, voter):
+        self.ticket = ticket
+        self.aadhaar_id = aadhaar_id
+        self.voter_key = _voter_key(aadhaar_id)
+        self.name = (voter or {}).get('name', '')
+        self.candidate_id = None
+        self.state = VERIFIED
+        self.tx_hash = None
+        self.receipt_code = None
+        self.error = None
+        # Resent after a restart (resume()); the vote was counted but its
+        # receipt is gone if the backend refuses it as a double vote
+        self.resumed = False
+        self.no_receipt = False
+        # Sent with /api/vote so a duplicate delivery gets the original answer
+        self.idempotency_key = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.submitted_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    @property
+    def ticket_label(self):
+        return f"T-{self.ticket:02d}"
+
+    def summary(self):
+        """Receipt details safe to show on a side screen (no Aadhaar)."""
+        return {
+            'ticket': self.ticket_label,
+            'state': self.state,
+            'receipt_code': self.receipt_code,
+            'tx_hash': self.tx_hash,
+            'error': self.error,
+            'no_receipt': self.no_receipt,
+            'seconds': round(self.finished_at - self.submitted_at, 1)
+            if self.finished_at and self.submitted_at else None,
+        }
+
+
+class SessionScheduler:
+    """Runs vote submission + receipt polling for several voters at once."""
+
+    def __init__(self, backend, max_in_flight=2, vote_timeout=90,
+                 receipt_timeout=60, poll_interval=1.0, on_complete=None,
+                 keep_receipts=50, clock=time, log=None):
+        self.backend = backend  # kiosk_backend.BackendClient (shared pool)
+        self.max_in_flight = max_in_flight
+        self.vote_timeout = vote_timeout
+        self.receipt_timeout = receipt_timeout
+        self.poll_interval = poll_interval
+        self.on_complete = on_complete
+        self.keep_receipts = keep_receipts
+        self.clock = clock
+        # kiosk_log EventLogger; the booth passes its own
+        self.log = log or kiosk_log.get("sessions")
+
+        self._lock = threading.Lock()
+        self._tickets = itertools.count(1)
+        self._in_flight = {}      # voter_key -> session
+        self._board = {}          # ticket -> finished session
+        self._ready = []          # finished sessions not yet announced
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight),
+                                            thread_name_prefix="vote-submit")
+
+    # --- Booth-facing API ---
+
+    def new_session(self, aadhaar_id, voter):
+        """Open a session for a checked-in voter. Returns None if the same
+        voter already has a vote in flight (pipelined double-vote guard)."""
+        key = _voter_key(aadhaar_id)
+        with self._lock:
+            if key in self._in_flight:
+                return None
+            # Two-digit tickets (01-99) are easy to read off a 128x64 OLED
+            ticket = (next(self._tickets) - 1) % 99 + 1
+        return VoterSession(ticket, aadhaar_id, voter)
+
+    def has_capacity(self):
+        with self._lock:
+            return len(self._in_flight) < self.max_in_flight
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def wait_for_capacity(self, timeout=None):
+        """Block until a submission slot frees up. Returns True if one did."""
+        deadline = self.clock.time() + timeout if timeout is not None else None
+        while not self.has_capacity():
+            if deadline is not None and self.clock.time() > deadline:
+                return False
+            self.clock.sleep(0.1)
+        return True
+
+    def submit(self, session, candidate_id):
+        """Queue the vote for background submission and return immediately."""
+        session.candidate_id = candidate_id
+        session.state = SUBMITTING
+        session.submitted_at = self.clock.time()
+        with self._lock:
+            self._in_flight[session.voter_key] = session
+        self._executor.submit(self._run, session)
+        return session
+
+    def resume(self, ticket, aadhaar_id, candidate_id, idempotency_key):
+        """Resend a vote a crashed kiosk had already submitted, under its
+        original ticket and Idempotency-Key (the backend replays its first
+        answer). Call at startup, before any new session is opened.
+
+        A backend that no longer has that answer (restarted, another
+        instance, key expired) refuses the resend as a double vote: the
+        first submission was counted, so the session ends DONE with
+        no_receipt instead of FAILED."""
+        session = VoterSession(ticket, aadhaar_id, None)
+        session.idempotency_key = idempotency_key
+        session.resumed = True
+        with self._lock:
+            # New tickets carry on after the resumed ones
+            self._tickets = itertools.count(ticket + 1)
+        return self.submit(session, candidate_id)
+
+    def lookup(self, ticket):
+        """Find a finished or in-flight session by ticket number or label."""
+        if isinstance(ticket, str):
+            ticket = int(ticket.upper().replace("T-", "") or 0)
+        with self._lock:
+            if ticket in self._board:
+                return self._board[ticket]
+            for session in self._in_flight.values():
+                if session.ticket == ticket:
+                    return session
+        return None
+
+    def has_ready(self):
+        """True if pop_ready() has something to show."""
+        with self._lock:
+            return bool(self._ready)
+
+    def pop_ready(self):
+        """Return sessions finished since the last call (for display)."""
+        with self._lock:
+            ready, self._ready = self._ready, []
+        return ready
+
+    def wait_all(self, timeout=None):
+        """Wait for every in-flight submission (used on shutdown)."""
+        with self._lock:
+            pending = list(self._in_flight.values())
+        deadline = self.clock.time() + timeout if timeout is not None else None
+        for session in pending:
+            remaining = None if deadline is None else max(0, deadline - self.clock.time())
+            session.done.wait(remaining)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    # --- Worker ---
+
+    def _run(self, session):
+        try:
+            self._submit_vote(session)
+            if session.state == CONFIRMED:
+                self._poll_receipt(session)
+        except Exception as e:
+            session.state = FAILED
+            session.error = str(e) or "Connection Fail"
+            self.log.error("vote_error", ticket=session.ticket_label, error=e)
+        finally:
+            self._finish(session)
+
+    def _submit_vote(self, session):
+        response = self.backend.post(
+            "/api/vote",
+            json={"aadhaar_id": session.aadhaar_id, "candidate_id": session.candidate_id},
+            headers={"Idempotency-Key": session.idempotency_key},
+            timeout=self.vote_timeout)
+        # The booth no longer needs the raw Aadhaar once the request is sent
+        session.aadhaar_id = None
+
+        if response.status_code != 200:
+            try:
+                session.error = response.json().get('message', '') or "Error"
+            except Exception:
+                session.error = "Error"
+            if session.resumed and is_double_vote(response.status_code, session.error):
+                self.log.info("vote_already_recorded", ticket=session.ticket_label, status=response.status_code)
+                session.error = None
+                session.no_receipt = True
+                session.state = DONE
+                return
+            session.state = FAILED
+            self.log.warning("vote_rejected", ticket=session.ticket_label, status=response.status_code,
+                             error=session.error)
+            return
+
+        data = response.json().get('data', {}) or {}
+        session.tx_hash = data.get('transaction_hash')
+        session.receipt_code = data.get('receipt_code') or data.get('short_code')
+        session.state = DONE if session.receipt_code else CONFIRMED
+        self.log.info("vote_tx", ticket=session.ticket_label, tx_hash=session.tx_hash)
+
+    def _poll_receipt(self, session):
+        poll_start = self.clock.time()
+        while self.clock.time() - poll_start < self.receipt_timeout:
+            try:
+                r = self.backend.post("/api/lookup-receipt",
+                                  json={"tx_hash": session.tx_hash}, timeout=5)
+                if r.status_code == 200:
+                    code = r.json().get('code')
+                    if code:
+                        session.receipt_code = code
+                        break
+            except Exception:
+                pass
+            self.clock.sleep(self.poll_interval)
+        # Without a short code the tx hash still lets the voter verify manually
+        session.state = DONE
+
+    def _finish(self, session):
+        session.finished_at = self.clock.time()
+        with self._lock:
+            self._in_flight.pop(session.voter_key, None)
+            self._board[session.ticket] = session
+            while len(self._board) > self.keep_receipts:
+                self._board.pop(next(iter(self._board)))
+            self._ready.append(session)
+        session.done.set()
+        if self.on_complete:
+            try:
+                self.on_complete(session)
+            except Exception as e:
+                self.log.error("receipt_callback_error", exc_info=True, ticket=session.ticket_label, error=e)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 Kiosk - "Already Voted" Filter
+
+A voter who has already voted used to be turned away only after a check-in
+round trip (over the tunnel, and counted by the backend's check-in rate
+limit). The backend now publishes a Bloom filter of the Aadhaar numbers
+that have voted, and the kiosk keeps a replica in memory:
+
+- GET /api/voted-filter returns the whole filter once: bit count, hash
+  count, salt and the bit array (base64). Afterwards
+  GET /api/voted-filter?id=<id>&since=<seq> returns only the voters added
+  since `seq`. A new id (new election, rebuilt filter, another backend
+  instance) means a full download. A background thread polls every
+  `voted_filter_interval` seconds.
+- A voter's bits are (h1 + n * h2) % bits for n < hashes, where h1 and
+  h2 | 1 are the first two big-endian uint32 of sha256(salt + aadhaar).
+  Checking a number is one hash and a few bit tests (microseconds).
+- A miss means "not voted as far as the backend knew" and the check-in runs
+  as before. A hit may be a false positive, so the booth shows the
+  rejection at once and confirms it with POST /api/voted-filter/confirm,
+  which the backend does not count against the check-in limit. A false
+  positive, or a confirm that gets no answer, goes on to the normal
+  check-in.
+- Votes confirmed at this kiosk, and check-ins answered "already voted",
+  are added locally right away.
+- Both routes need the kiosk credential (`kiosk_api_key`, sent as
+  X-Kiosk-Key). Without it the backend refuses them and every check is a
+  miss.
+"""
+
+import base64
+import hashlib
+import math
+import os
+import struct
+import threading
+import time
+
+from votechain_config import config
+from votechain_metrics import metrics
+
+PATH = "/api/voted-filter"
+CONFIRM_PATH = "/api/voted-filter/confirm"
+# A full filter is a few hundred KB over the tunnel
+FETCH_TIMEOUT = 15.0
+
+
+def _auth():
+    return {"X-Kiosk-Key": config.kiosk_api_key} if config.kiosk_api_key else {}
+
+
+def voter_key(salt, aadhaar_id):
+    """(h1, h2) of one voter: the first two big-endian uint32 of
+    sha256(salt + aadhaar), h2 forced odd."""
+    h1, h2 = struct.unpack(">II", hashlib.sha256(salt + aadhaar_id.encode()).digest()[:8])
+    return h1, h2 | 1
+
+
+class BloomFilter:
+    """Salted Bloom filter with double hashing, laid out like server.js:
+    bit i is bit (i % 8) of byte (i >> 3)."""
+
+    def __init__(self, bits, hashes, salt, array=None):
+        if bits <= 0 or hashes <= 0:
+            raise ValueError(f"bad filter size: {bits} bits, {hashes} hashes")
+        self.bits = bits
+        self.hashes = hashes
+        self.salt = salt
+        self.array = bytearray((bits + 7) // 8) if array is None else bytearray(array)
+        if len(self.array) != (bits + 7) // 8:
+            raise ValueError(f"filter is {len(self.array)} bytes, expected {(bits + 7) // 8}")
+
+    @classmethod
+    def sized(cls, capacity, fp_rate, salt=None):
+        """A filter for `capacity` voters at about `fp_rate` false positives."""
+        bits = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        return cls(bits, max(1, round(bits / capacity * math.log(2))), salt or os.urandom(16))
+
+    def _positions(self, key):
+        h1, h2 = key
+        return [(h1 + n * h2) % self.bits for n in range(self.hashes)]
+
+    def add_key(self, key):
+        """Set a voter's bits; False if they were all set already."""
+        added = False
+        array = self.array
+        for bit in self._positions(key):
+            mask = 1 << (bit & 7)
+            if not array[bit >> 3] & mask:
+                array[bit >> 3] |= mask
+                added = True
+        return added
+
+    def add(self, aadhaar_id):
+        return self.add_key(voter_key(self.salt, aadhaar_id))
+
+    def __contains__(self, aadhaar_id):
+        array = self.array
+        return all(array[bit >> 3] & (1 << (bit & 7))
+                   for bit in self._positions(voter_key(self.salt, aadhaar_id)))
+
+
+class VotedFilter:
+    """The kiosk's replica of the backend's voted filter, shared by all
+    booths. Empty (every check a miss) until the first download."""
+
+    def __init__(self):
+        self.id = None
+        self.seq = 0
+        self.bloom = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._failing = False
+
+    @classmethod
+    def for_kiosk(cls, backend):
+        """A started filter, or None if `voted_filter` is off."""
+        if not config.voted_filter:
+            return None
+        if not config.kiosk_api_key:
+            print("⚠️ KIOSK_API_KEY not set: the backend will refuse the voted filter")
+        voted_filter = cls()
+        voted_filter.start(backend)
+        return voted_filter
+
+    # --- Booth-facing API ---
+
+    def might_have_voted(self, aadhaar_id):
+        """False: not in the filter, check in as usual. True: probably
+        voted; confirm() before the rejection stands."""
+        bloom = self.bloom
+        if bloom is None:
+            return False
+        start = time.perf_counter()
+        hit = aadhaar_id in bloom
+        metrics.observe("voted_filter_check_s", time.perf_counter() - start)
+        metrics.inc("voted_filter_checks", result="hit" if hit else "miss")
+        return hit
+
+    def add(self, aadhaar_id):
+        """This kiosk saw the voter vote (or the backend say so)."""
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.add(aadhaar_id)
+
+    def confirm(self, backend, aadhaar_id):
+        """Ask the backend about a filter hit: True (voted), False (a false
+        positive) or None (no answer)."""
+        try:
+            response = backend.post(CONFIRM_PATH, json={"aadhaar_id": aadhaar_id}, headers=_auth(),
+                                    timeout=config.checkin_timeout)
+            if response.status_code != 200:
+                return None
+            voted = bool(response.json()["data"]["voted"])
+        except Exception:
+            return None
+        metrics.inc("voted_filter_confirms", result="voted" if voted else "false_positive")
+        return voted
+
+    # --- Replication ---
+
+    def apply(self, data):
+        """Take a /api/voted-filter answer (full filter or delta). Raises
+        ValueError if it is malformed."""
+        with self._lock:
+            if "delta" in data:
+                if data.get("id") != self.id or self.bloom is None:
+                    raise ValueError("delta for another filter")
+                for h in data["delta"]:
+                    h1, h2 = struct.unpack(">II", bytes.fromhex(h))
+                    self.bloom.add_key((h1, h2 | 1))
+                self.seq = int(data["seq"])
+                return len(data["delta"])
+            try:
+                bloom = BloomFilter(int(data["bits"]), int(data["hashes"]), bytes.fromhex(data["salt"]),
+                                    base64.b64decode(data["filter"]))
+                seq = int(data["seq"])
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"bad filter: {e}")
+            self.bloom, self.id, self.seq = bloom, data["id"], seq
+        metrics.set("voted_filter_bytes", len(bloom.array))
+        print(f"🧮 Voted filter {data['id']}: {bloom.bits} bits x {bloom.hashes} hashes, seq {seq}")
+        return None
+
+    def refresh(self, backend):
+        """Fetch the changes (or the whole filter). Returns True on success."""
+        path = PATH if self.id is None else f"{PATH}?id={self.id}&since={self.seq}"
+        start = time.perf_counter()
+        try:
+            response = backend.get(path, headers=_auth(), timeout=FETCH_TIMEOUT)
+            if response.status_code != 200:
+                raise ValueError(f"HTTP {response.status_code}")
+            data = response.json()["data"]
+            added = self.apply(data)
+        except Exception as e:
+            metrics.inc("voted_filter_fetches", result="error")
+            if not self._failing:
+                print(f"⚠️ Voted filter not updated: {e}")
+            self._failing = True
+            return False
+        finally:
+            metrics.observe("voted_filter_fetch_s", time.perf_counter() - start)
+        metrics.inc("voted_filter_fetches", result="full" if added is None else "delta")
+        metrics.set("voted_filter_seq", self.seq)
+        self._failing = False
+        return True
+
+    def start(self, backend):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(backend,),
+                                        name="kiosk-voted-filter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, backend):
+        while not self._stop.is_set():
+            self.refresh(backend)
+            self._stop.wait(config.voted_filter_interval)
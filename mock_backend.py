@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Mock Backend
+
+Offline stand-in for backend/server.js, for benchmarking the kiosk on a
+laptop with no Supabase, RPC node or tunnel. It answers the kiosk endpoints
+with the same status codes and JSON shapes as the real server:
+
+    POST /api/voter/check-in          POST /api/vote
+    POST /api/lookup-receipt          GET  /api/kiosk/poll-commands (?wait= long poll)
+    POST /api/kiosk/enrollment-complete
+    GET  /api/health                  GET  /api/candidates (ETag / If-None-Match)
+    GET  /api/voted-filter (?id=&since= deltas)
+    POST /api/voted-filter/confirm
+
+It also serves Supabase's system_config table over PostgREST (GET/PATCH/POST
+/rest/v1/system_config with eq/gt/gte/lt/like filters), so the tunnel manager's writer
+can be pointed at it with SUPABASE_URL=http://127.0.0.1:3000.
+
+Latency, errors, late receipt codes and tunnel jitter are set by a profile
+(JSON, merged over DEFAULT_PROFILE). Latencies use a distribution spec:
+
+    fixed:0.05   uniform:0.02,0.2   normal:1.0,0.3
+    lognormal:4,0.5 (median, sigma)  exp:5 (mean)
+
+Control endpoints for benchmarks:
+    GET  /mock/stats    per-endpoint counts and latency percentiles
+    POST /mock/enroll   queue a remote enrollment {"name": ..., "target_finger_id": ...}
+    POST /mock/reset    forget voters who voted, receipts and stats
+
+Usage:
+    python3 mock_backend.py --port 3000 --seed 1
+    python3 mock_backend.py --profile slow-tunnel.json --set tunnel.spike_rate=0.05
+"""
+
+import argparse
+import asyncio
+import base64
+import copy
+import fnmatch
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+from votechain_http import CloseConnection, Response, json_response, serve
+from votechain_metrics import Metrics
+from kiosk_voted_filter import BloomFilter, voter_key
+
+DEFAULT_PROFILE = {
+    "endpoints": {
+        "/api/voter/check-in": {"latency": "lognormal:0.15,0.4"},
+        "/api/vote": {"latency": "lognormal:4,0.5"},
+        "/api/lookup-receipt": {"latency": "lognormal:0.12,0.3"},
+        "/api/kiosk/poll-commands": {"latency": "fixed:0.02"},
+        "/api/kiosk/enrollment-complete": {"latency": "fixed:0.05"},
+        "/api/health": {"latency": "fixed:0"},
+        "/api/candidates": {"latency": "fixed:0.05"},
+        "/api/voted-filter": {"latency": "fixed:0.03"},
+        "/api/voted-filter/confirm": {"latency": "lognormal:0.08,0.3"},
+        "/rest/v1/system_config": {"latency": "lognormal:0.08,0.3"},
+    },
+    # Defaults for every endpoint (an endpoint entry overrides these)
+    "errors": {
+        "error_rate": 0.0,      # answer with `error_status`
+        "error_status": 500,
+        "hang_rate": 0.0,       # never answer (client hits its timeout)
+        "hang_seconds": 120,
+    },
+    "receipts": {
+        "inline_rate": 0.8,     # votes whose receipt_code comes back immediately
+        "delay": "exp:8",       # when the rest show up in /api/lookup-receipt
+        "lost_rate": 0.0,       # receipts that never show up
+    },
+    "tunnel": {
+        "jitter": "fixed:0",    # added to every request
+        "spike_rate": 0.0,      # occasional multi-second stalls
+        "spike": "uniform:2,8",
+        "gateway_rate": 0.0,    # Cloudflare-style 502 page
+        "drop_rate": 0.0,       # connection closed without a response
+    },
+    # Empty = any well-formed Aadhaar is an eligible voter
+    "voters": [],
+    # The ballot served by /api/candidates (getAllCandidates on the contract)
+    "candidates": [{"id": 1, "name": "CANDIDATE A"}, {"id": 2, "name": "CANDIDATE B"}],
+    "contract": "0x000000000000000000000000000000000000c0de",
+    # Bloom filter of voters who voted, as in server.js
+    "voted_filter": {"capacity": 200000, "fp_rate": 0.0001, "delta_max": 20000},
+}
+
+POLL_WAIT_MAX_S = 25          # poll-commands?wait= cap, as in server.js
+RECEIPT_CHARS = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"  # Same alphabet as server.js
+AADHAAR_RE = re.compile(r"^\d{12}$")
+FILTER_OPS = {
+    "eq": lambda a, b: a == b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "like": lambda a, b: fnmatch.fnmatchcase(a, b),
+}
+
+
+def parse_dist(spec):
+    """Turn a distribution spec into `sample(rng) -> seconds` (never < 0)."""
+    if isinstance(spec, (int, float)):
+        spec = f"fixed:{spec}"
+    kind, _, args = str(spec).partition(":")
+    try:
+        params = [float(x) for x in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Bad latency spec: {spec}")
+    samplers = {
+        "fixed": (1, lambda rng, p: p[0]),
+        "uniform": (2, lambda rng, p: rng.uniform(p[0], p[1])),
+        "normal": (2, lambda rng, p: rng.gauss(p[0], p[1])),
+        "lognormal": (2, lambda rng, p: rng.lognormvariate(math.log(p[0]), p[1]) if p[0] > 0 else 0.0),
+        "exp": (1, lambda rng, p: rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0),
+    }
+    if kind not in samplers or len(params) != samplers[kind][0]:
+        raise ValueError(f"Bad latency spec: {spec}")
+    fn = samplers[kind][1]
+    return lambda rng: max(0.0, fn(rng, params))
+
+
+def merge(base, override):
+    out = copy.deepcopy(base)
+    for k, v in override.items():
+        if isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = merge(out[k], v)
+        else:
+            out[k] = v
+    return out
+
+
+def apply_set(profile, assignment):
+    """Apply a --set path.to.key=value override (value parsed as JSON if possible)."""
+    path, _, raw = assignment.partition("=")
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    node = profile
+    keys = path.split(".")
+    # Endpoint paths contain no dots, so "endpoints./api/vote.latency" splits cleanly
+    for k in keys[:-1]:
+        node = node.setdefault(k, {})
+    node[keys[-1]] = value
+
+
+class MockBackend:
+    def __init__(self, profile, seed=None):
+        self.profile = profile
+        self.rng = random.Random(seed)
+        self.metrics = Metrics()
+        self.started = time.time()
+        self._tx_counter = 0
+        self.voted = set()
+        self.receipts = {}          # tx_hash -> (code, available_at)
+        self.pending_enrollment = None
+        self.command_queued = asyncio.Event()   # wakes long-polled poll-commands
+        self.voters = {v["aadhaar_id"]: v for v in profile.get("voters", [])}
+        self._new_voted_filter()
+        self.system_config = {}
+        self.idempotent = {}        # Idempotency-Key -> (body hash, Future[Response | None])
+        self._set_config("backend_url", "https://waiting-for-tunnel.com")
+
+        errors = profile.get("errors", {})
+        self.endpoints = {}
+        for path, cfg in profile.get("endpoints", {}).items():
+            cfg = dict(errors, **cfg)
+            cfg["sample"] = parse_dist(cfg.get("latency", "fixed:0"))
+            self.endpoints[path] = cfg
+        tunnel = profile.get("tunnel", {})
+        self.tunnel = dict(tunnel, jitter_s=parse_dist(tunnel.get("jitter", "fixed:0")),
+                           spike_s=parse_dist(tunnel.get("spike", "fixed:0")))
+        receipts = profile.get("receipts", {})
+        self.receipt_cfg = dict(receipts, delay_s=parse_dist(receipts.get("delay", "fixed:0")))
+
+        self.routes = {
+            ("POST", "/api/voter/check-in"): self.check_in,
+            ("POST", "/api/vote"): self.vote,
+            ("POST", "/api/lookup-receipt"): self.lookup_receipt,
+            ("GET", "/api/kiosk/poll-commands"): self.poll_commands,
+            ("POST", "/api/kiosk/enrollment-complete"): self.enrollment_complete,
+            ("GET", "/api/health"): self.health,
+            ("GET", "/api/candidates"): self.candidates,
+            ("GET", "/api/voted-filter"): self.get_voted_filter,
+            ("POST", "/api/voted-filter/confirm"): self.confirm_voted,
+            ("GET", "/rest/v1/system_config"): self.select_config,
+            ("PATCH", "/rest/v1/system_config"): self.update_config,
+            ("POST", "/rest/v1/system_config"): self.upsert_config,
+            ("GET", "/mock/stats"): self.stats,
+            ("POST", "/mock/enroll"): self.mock_enroll,
+            ("POST", "/mock/reset"): self.reset,
+        }
+
+    def chance(self, rate):
+        return rate > 0 and self.rng.random() < rate
+
+    # --- Request pipeline ---
+
+    async def handle(self, req):
+        start = time.perf_counter()
+        endpoint = req.path
+        handler = self.routes.get((req.method, endpoint))
+        if handler is None:
+            return json_response(404, {"status": "error", "message": "Not found"})
+        if endpoint.startswith("/mock/"):
+            return await handler(req)
+        key = req.headers.get("idempotency-key") if endpoint == "/api/vote" else None
+        body_hash = _body_hash(req) if key else None
+        if key and key in self.idempotent:
+            first_hash, first = self.idempotent[key]
+            if first_hash != body_hash:
+                return json_response(422, {"status": "error",
+                                           "message": "Idempotency-Key reused with a different request."})
+            # Same ballot again: wait for the first request and replay it
+            first = await first
+            if first is not None:
+                self.metrics.inc("idempotent_replays", endpoint=endpoint)
+                return Response(first.status, first.body, dict(first.headers, **{"Idempotent-Replayed": "true"}))
+        pending = None
+        if key:
+            pending = asyncio.get_running_loop().create_future()
+            self.idempotent[key] = (body_hash, pending)
+        resp = None
+        try:
+            resp = await self._faults(endpoint)
+            if resp is None:
+                cfg = self.endpoints.get(endpoint, {})
+                await asyncio.sleep(cfg["sample"](self.rng) if cfg else 0)
+                resp = await handler(req)
+        except CloseConnection:
+            self.metrics.inc("dropped", endpoint=endpoint)
+            raise
+        finally:
+            if pending is not None:
+                keep = resp is not None and resp.status < 500 and resp.status != 429
+                if not keep:
+                    self.idempotent.pop(key, None)
+                pending.set_result(resp if keep else None)
+        self.metrics.inc("responses", endpoint=endpoint, status=resp.status)
+        self.metrics.observe("latency_s", time.perf_counter() - start, endpoint=endpoint)
+        return resp
+
+    async def _faults(self, endpoint):
+        """Tunnel jitter/spikes/drops, then per-endpoint errors and hangs.
+        Returns an error Response, or None to serve normally."""
+        t = self.tunnel
+        delay = t["jitter_s"](self.rng)
+        if self.chance(t.get("spike_rate", 0)):
+            delay += t["spike_s"](self.rng)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.chance(t.get("drop_rate", 0)):
+            raise CloseConnection()
+        if self.chance(t.get("gateway_rate", 0)):
+            return Response(502, b"<html><body>502 Bad Gateway</body></html>", content_type="text/html")
+
+        cfg = self.endpoints.get(endpoint, {})
+        if self.chance(cfg.get("hang_rate", 0)):
+            await asyncio.sleep(cfg.get("hang_seconds", 120))
+            raise CloseConnection()
+        if self.chance(cfg.get("error_rate", 0)):
+            return json_response(cfg.get("error_status", 500),
+                                 {"status": "error", "message": "Injected failure", "data": None})
+        return None
+
+    # --- Kiosk endpoints (same shapes as backend/server.js) ---
+
+    def find_voter(self, aadhaar_id):
+        if self.voters:
+            return self.voters.get(aadhaar_id)
+        return {"aadhaar_id": aadhaar_id, "name": f"Voter {aadhaar_id[-4:]}",
+                "fingerprint_id": int(aadhaar_id) % 200 + 1, "photo_url": None}
+
+    async def check_in(self, req):
+        aadhaar_id = _body(req).get("aadhaar_id")
+        if not isinstance(aadhaar_id, str) or not AADHAAR_RE.match(aadhaar_id.strip()):
+            return json_response(400, {"status": "error", "message": "Invalid Aadhaar ID format."})
+        voter = self.find_voter(aadhaar_id)
+        if not voter:
+            return json_response(404, {"status": "error", "message": "Voter not found.", "data": None})
+        if aadhaar_id in self.voted:
+            self.mark_voted(aadhaar_id)
+            return json_response(403, {"status": "error", "message": "Voter has already voted.", "data": None})
+        return json_response(200, {"status": "success", "message": "Voter eligible.", "data": {
+            "name": voter["name"], "fingerprint_id": voter["fingerprint_id"],
+            "photo_url": voter.get("photo_url")}})
+
+    async def vote(self, req):
+        body = _body(req)
+        aadhaar_id = body.get("aadhaar_id")
+        if not isinstance(aadhaar_id, str) or not AADHAAR_RE.match(aadhaar_id):
+            return json_response(400, {"status": "error", "message": "Invalid Aadhaar ID."})
+        try:
+            cid = int(body.get("candidate_id"))
+        except (TypeError, ValueError):
+            cid = 0
+        if cid <= 0:
+            return json_response(400, {"status": "error", "message": "Invalid candidate ID."})
+        if aadhaar_id in self.voted:
+            return json_response(403, {"status": "error", "message": "Double voting detected!", "data": None})
+        self.voted.add(aadhaar_id)
+        self.mark_voted(aadhaar_id)
+
+        self._tx_counter += 1
+        tx_hash = "0x" + hashlib.sha256(f"{self._tx_counter}:{aadhaar_id}".encode()).hexdigest()
+        code = "".join(self.rng.choice(RECEIPT_CHARS) for _ in range(6))
+        code = code[:3] + "-" + code[3:]
+        rc = self.receipt_cfg
+        inline = self.chance(rc.get("inline_rate", 1.0))
+        if not self.chance(rc.get("lost_rate", 0)):
+            available = time.time() + (0 if inline else rc["delay_s"](self.rng))
+            self.receipts[tx_hash] = (code, available)
+        self.metrics.inc("votes", candidate=cid)
+        return json_response(200, {"status": "success", "message": "Vote officially recorded on-chain.",
+                                   "data": {"transaction_hash": tx_hash,
+                                            "receipt_code": code if inline else None}})
+
+    async def lookup_receipt(self, req):
+        tx_hash = str(_body(req).get("tx_hash") or "")
+        if not tx_hash.startswith("0x") or len(tx_hash) != 66:
+            return json_response(400, {"status": "error", "message": "Invalid transaction hash."})
+        code, available = self.receipts.get(tx_hash, (None, None))
+        if code is None or time.time() < available:
+            return json_response(404, {"status": "error", "message": "Receipt not found."})
+        return json_response(200, {"status": "success", "code": code})
+
+    async def poll_commands(self, req):
+        try:
+            wait = min(POLL_WAIT_MAX_S, max(0.0, float(req.query.get("wait", 0))))
+        except ValueError:
+            wait = 0.0
+        e = self.pending_enrollment
+        if wait and not (e and e["status"] == "WAITING_FOR_KIOSK"):
+            # Long poll: hold the request until /mock/enroll queues a command
+            try:
+                await asyncio.wait_for(self.command_queued.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            e = self.pending_enrollment
+        if e and e["status"] == "WAITING_FOR_KIOSK":
+            return json_response(200, dict(e, command="ENROLL"))
+        return json_response(200, {"command": "NONE"})
+
+    async def enrollment_complete(self, req):
+        if not self.pending_enrollment:
+            return json_response(400, {"status": "error", "message": "No active enrollment request."})
+        success = _body(req).get("success")
+        self.pending_enrollment = None
+        if success:
+            return json_response(200, {"status": "success", "message": "Voter enrolled successfully."})
+        return json_response(200, {"status": "received", "message": "Enrollment failed, cleared."})
+
+    async def health(self, req):
+        return json_response(200, {"status": "ok", "service": "VoteChain Mock Backend",
+                                   "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())})
+
+    async def candidates(self, req):
+        contract = self.profile.get("contract")
+        candidates = [{"id": int(c["id"]), "name": str(c["name"])} for c in self.profile.get("candidates", [])]
+        version = hashlib.sha256(json.dumps([contract, candidates]).encode()).hexdigest()[:32]
+        headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+        tags = [t.strip() for t in req.headers.get("if-none-match", "").split(",")]
+        if headers["ETag"] in tags:
+            self.metrics.inc("not_modified", endpoint=req.path)
+            return Response(304, b"", headers)
+        return json_response(200, {"status": "ok", "data": {
+            "contract": contract, "version": version, "candidates": candidates}}, headers)
+
+    # --- Voted filter (same layout and hashing as server.js) ---
+
+    def _new_voted_filter(self):
+        cfg = self.profile.get("voted_filter", {})
+        self.filter_id = "%012x" % self.rng.getrandbits(48)
+        self.filter_seq = 0
+        self.filter_deltas = []
+        self.bloom = BloomFilter.sized(cfg.get("capacity", 200000), cfg.get("fp_rate", 0.0001),
+                                       self.rng.getrandbits(128).to_bytes(16, "big"))
+
+    def mark_voted(self, aadhaar_id):
+        key = voter_key(self.bloom.salt, aadhaar_id)
+        if self.bloom.add_key(key):
+            self.filter_seq += 1
+            self.filter_deltas.append("%08x%08x" % key)
+            del self.filter_deltas[:-self.profile.get("voted_filter", {}).get("delta_max", 20000)]
+
+    async def get_voted_filter(self, req):
+        try:
+            since = int(req.query.get("since", ""))
+        except ValueError:
+            since = None
+        oldest = self.filter_seq - len(self.filter_deltas)
+        if req.query.get("id") == self.filter_id and since is not None and oldest <= since <= self.filter_seq:
+            return json_response(200, {"status": "ok", "data": {
+                "id": self.filter_id, "seq": self.filter_seq, "delta": self.filter_deltas[since - oldest:]}})
+        b = self.bloom
+        return json_response(200, {"status": "ok", "data": {
+            "id": self.filter_id, "seq": self.filter_seq, "bits": b.bits, "hashes": b.hashes,
+            "salt": b.salt.hex(), "filter": base64.b64encode(b.array).decode()}})
+
+    async def confirm_voted(self, req):
+        aadhaar_id = _body(req).get("aadhaar_id")
+        if not isinstance(aadhaar_id, str) or not AADHAAR_RE.match(aadhaar_id):
+            return json_response(400, {"status": "error", "message": "Invalid Aadhaar ID format."})
+        voted = aadhaar_id in self.voted
+        if voted:
+            self.mark_voted(aadhaar_id)
+        return json_response(200, {"status": "ok", "data": {"voted": voted}})
+
+    # --- Supabase system_config (PostgREST) ---
+
+    def _set_config(self, key, value):
+        self.system_config[key] = {
+            "key": key, "value": value,
+            "updated_at": datetime.now(timezone.utc).isoformat(timespec="microseconds"),
+        }
+
+    def _config_rows(self, req):
+        rows = list(self.system_config.values())
+        for column, cond in req.query.items():
+            if column == "select":
+                continue
+            op, _, value = cond.partition(".")
+            if op not in FILTER_OPS:
+                raise ValueError(f"unsupported filter {column}={cond}")
+            # Values compare as strings (ISO timestamps sort correctly)
+            rows = [r for r in rows if FILTER_OPS[op](str(r.get(column)), value)]
+        return rows
+
+    async def select_config(self, req):
+        try:
+            return json_response(200, self._config_rows(req))
+        except ValueError as e:
+            return json_response(400, {"message": str(e)})
+
+    async def update_config(self, req):
+        try:
+            rows = self._config_rows(req)
+        except ValueError as e:
+            return json_response(400, {"message": str(e)})
+        value = _body(req).get("value")
+        for row in rows:
+            self._set_config(row["key"], value)
+        if "return=representation" not in req.headers.get("prefer", ""):
+            return Response(204)
+        return json_response(200, [self.system_config[r["key"]] for r in rows])
+
+    async def upsert_config(self, req):
+        try:
+            rows = req.json()
+        except ValueError:
+            rows = None
+        rows = rows if isinstance(rows, list) else [rows]
+        if not all(isinstance(r, dict) and r.get("key") and "value" in r for r in rows):
+            return json_response(400, {"message": "key and value are required"})
+        for row in rows:
+            self._set_config(row["key"], row["value"])
+        return json_response(201, [self.system_config[r["key"]] for r in rows])
+
+    # --- Control endpoints ---
+
+    async def stats(self, req):
+        return json_response(200, self.metrics.snapshot())
+
+    async def mock_enroll(self, req):
+        body = _body(req)
+        self.pending_enrollment = {
+            "status": "WAITING_FOR_KIOSK",
+            "name": body.get("name", "Test Voter"),
+            "aadhaar_id": body.get("aadhaar_id", "000000000000"),
+            "constituency": body.get("constituency", "Test"),
+            "target_finger_id": int(body.get("target_finger_id", 1)),
+            "timestamp": int(time.time() * 1000),
+        }
+        # Wake every waiting poll, then re-arm for the next command
+        self.command_queued.set()
+        self.command_queued = asyncio.Event()
+        return json_response(200, {"status": "success", "enrollment": self.pending_enrollment})
+
+    async def reset(self, req):
+        self.voted.clear()
+        self._new_voted_filter()
+        self.receipts.clear()
+        self.idempotent.clear()
+        self.pending_enrollment = None
+        self.metrics = Metrics()
+        return json_response(200, {"status": "success"})
+
+
+def _body(req):
+    try:
+        body = req.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+def _body_hash(req):
+    """What an Idempotency-Key is bound to, as in server.js."""
+    return hashlib.sha256(json.dumps(_body(req), sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def load_profile(path=None, overrides=()):
+    profile = copy.deepcopy(DEFAULT_PROFILE)
+    if path:
+        with open(path) as f:
+            profile = merge(profile, json.load(f))
+    for assignment in overrides:
+        apply_set(profile, assignment)
+    return profile
+
+
+async def run(host, port, profile, seed=None):
+    mock = MockBackend(profile, seed=seed)
+    server = await serve(mock.handle, host, port)
+    print(f"✅ Mock backend listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline mock of the VoteChain kiosk API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--profile", help="JSON profile merged over the defaults")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a profile value, e.g. endpoints./api/vote.latency=fixed:1")
+    parser.add_argument("--seed", type=int, help="seed the random faults for repeatable runs")
+    parser.add_argument("--print-profile", action="store_true", help="print the effective profile and exit")
+    args = parser.parse_args()
+
+    try:
+        profile = load_profile(args.profile, args.set)
+        MockBackend(profile)  # Validate latency specs before binding the port
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.print_profile:
+        print(json.dumps(profile, indent=2))
+        return
+    try:
+        asyncio.run(run(args.host, args.port, profile, seed=args.seed))
+    except KeyboardInterrupt:
+        print("\n🛑 Mock backend stopped")
+
+
+if __name__ == '__main__':
+    main()
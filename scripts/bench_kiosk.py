@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Kiosk Benchmark Suite
+
+Measures kiosk_main.Booth on simulated hardware (kiosk_hw) so changes to the
+voter flow can be compared against a stored baseline instead of guessed.
+
+Micro benchmarks (timeit, median of --repeat runs, microseconds per call):
+
+    show_msg            three-line screen on the luma dummy OLED
+    show_msg_big        big_text screen (TrueType font)
+    show_idle           VOTE/CHAIN idle screen with shadows
+    keyboard_decode     one Aadhaar entry (12 key presses) through
+                        read_aadhaar_from_keyboard_device, OLED off
+    tick_animation      the confirmation tick; also reported per frame
+    receipt_poll        blocking submit_vote whose receipt code shows up
+                        on the 5th /api/lookup-receipt, canned backend
+    tunnel_url_regex    cloudflared's URL pattern over a startup banner,
+                        per output line
+
+Macro benchmark:
+
+    session_e2e         full voter sessions (START, Aadhaar, finger, two
+                        presses on candidate A) through Booth.run against
+                        mock_backend.py in a subprocess, on a scaled clock.
+                        Reports CPU per voter (this process only), booth
+                        time per voter and this process's RSS afterwards
+                        (rss_mb, steady state after the sessions).
+
+Sleeps in the micro benchmarks run on a virtual clock, so only CPU work is
+timed.
+
+    python3 scripts/bench_kiosk.py run --save baseline.json
+    python3 scripts/bench_kiosk.py run --baseline baseline.json     # exit 1 on regression
+    python3 scripts/bench_kiosk.py run --only show_msg,show_idle --repeat 9
+    python3 scripts/bench_kiosk.py compare baseline.json new.json
+
+Every metric is lower-is-better; a regression is one more than --threshold
+(default 20%) above the baseline.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import timeit
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import kiosk_hw  # noqa: E402
+from kiosk_hw import BoothConfig, SimFingerprint, SimGPIO, SimKeyboard, ecodes  # noqa: E402
+from kiosk_replay import ReplayResponse, ScaledClock  # noqa: E402
+from tunnel_manager import CloudflaredProvider  # noqa: E402
+
+REGRESSION_THRESHOLD = 0.20
+
+# mock_backend.py --set overrides for session_e2e: short real latencies so
+# the booth's own work dominates, and half the receipts arrive late
+MOCK_SETTINGS = [
+    "endpoints./api/voter/check-in.latency=fixed:0.01",
+    "endpoints./api/vote.latency=fixed:0.05",
+    "endpoints./api/lookup-receipt.latency=fixed:0.01",
+    "endpoints./api/kiosk/poll-commands.latency=fixed:0",
+    "receipts.inline_rate=0.5",
+    "receipts.delay=fixed:0.5",
+]
+
+CLOUDFLARED_BANNER = """\
+2025-12-04T10:12:01Z INF Thank you for trying Cloudflare Tunnel. Doing so, without a Cloudflare account, is a quick way to experiment and try it out.
+2025-12-04T10:12:01Z INF Requesting new quick Tunnel on trycloudflare.com...
+2025-12-04T10:12:03Z INF +--------------------------------------------------------------------------------------------+
+2025-12-04T10:12:03Z INF |  Your quick Tunnel has been created! Visit it at (it may take some time to be reachable):  |
+2025-12-04T10:12:03Z INF |  https://destination-payments-amongst-machine.trycloudflare.com                            |
+2025-12-04T10:12:03Z INF +--------------------------------------------------------------------------------------------+
+2025-12-04T10:12:03Z INF Cannot determine default configuration path. No file [config.yml config.yaml] in [~/.cloudflared]
+2025-12-04T10:12:03Z INF Version 2024.11.1
+2025-12-04T10:12:03Z INF GOOS: linux, GOVersion: go1.22.5, GoArch: arm64
+2025-12-04T10:12:03Z INF Settings: map[ha-connections:1 protocol:quic url:http://localhost:3000]
+2025-12-04T10:12:03Z INF Generated Connector ID: 7a3c1f0e-5b2d-4c8e-9f1a-2d6b8e4c0a17
+2025-12-04T10:12:03Z INF Initial protocol quic
+2025-12-04T10:12:03Z INF ICMP proxy will use 192.168.1.42 as source for IPv4
+2025-12-04T10:12:03Z INF Starting metrics server on 127.0.0.1:20241/metrics
+2025-12-04T10:12:04Z INF Registered tunnel connection connIndex=0 connection=0b1e2f3a event=0 ip=198.41.200.13 location=sin11 protocol=quic
+2025-12-04T10:12:04Z INF Updated to new configuration config=null version=0
+""".splitlines()
+
+
+# ============================================================
+# SIMULATED DEPENDENCIES
+# ============================================================
+
+class VirtualClock:
+    """time()/sleep() where sleeping only moves the clock forward."""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+
+
+class BenchGPIO(SimGPIO):
+    """SimGPIO whose buttons are tapped: each tap reads LOW exactly once,
+    so a press is seen by whichever loop reads the pin next."""
+
+    def __init__(self):
+        super().__init__()
+        self._taps = {}
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        # A tap is a single read, not an edge: the booth has to poll
+        raise RuntimeError("tapped buttons have no edge detection")
+
+    def tap(self, pin, times=1):
+        with self._lock:
+            self._taps[pin] = self._taps.get(pin, 0) + times
+
+    def input(self, pin):
+        with self._lock:
+            if self._taps.get(pin):
+                self._taps[pin] -= 1
+                return self.LOW
+        return super().input(pin)
+
+
+class ScriptedKeyboard:
+    """Replays the same key events on every read_loop()."""
+
+    name = "bench keyboard"
+
+    def __init__(self, text):
+        codes = {str(d): getattr(ecodes, f"KEY_{d}") for d in range(10)}
+        self.events = []
+        for code in [codes[ch] for ch in text] + [ecodes.KEY_ENTER]:
+            self.events.append(kiosk_hw._SimEvent(ecodes.EV_KEY, code, 1))
+            self.events.append(kiosk_hw._SimEvent(ecodes.EV_KEY, code, 0))
+
+    def grab(self):
+        pass
+
+    def ungrab(self):
+        pass
+
+    def read_loop(self):
+        return iter(self.events)
+
+
+class CannedBackend:
+    """Answers the vote, then 404 on lookup-receipt until the code is due."""
+
+    def __init__(self, polls_until_code=5):
+        self.polls_until_code = polls_until_code
+        self._polls = 0
+
+    def post(self, path, **kwargs):
+        if path == "/api/vote":
+            self._polls = 0
+            return ReplayResponse(200, json.dumps({"status": "success", "data": {
+                "transaction_hash": "0x" + "ab" * 32, "receipt_code": None}}))
+        if path == "/api/lookup-receipt":
+            self._polls += 1
+            if self._polls < self.polls_until_code:
+                return ReplayResponse(404, '{"status": "error", "message": "Receipt not found."}')
+            return ReplayResponse(200, '{"status": "success", "code": "K7Q-M2X"}')
+        raise ConnectionError(f"bench: unexpected POST {path}")
+
+    def get(self, path, **kwargs):
+        raise ConnectionError(f"bench: unexpected GET {path}")
+
+
+def oled_available():
+    """Whether luma can open the emulated OLED the booths draw on."""
+    return kiosk_hw.open_oled(BoothConfig(name="bench"), emulate=True) is not None
+
+
+def _booth(device=True, keyboard=None, backend=None, clock=None):
+    """A booth on simulated hardware; imports kiosk_main. With device=True
+    it draws on an emulated OLED, which needs luma."""
+    from kiosk_main import Booth
+    cfg = BoothConfig(name="bench")
+    oled = kiosk_hw.open_oled(cfg, emulate=True) if device else None
+    if device and oled is None:
+        # Without a device every screen is a no-op; don't time that
+        raise ImportError("luma.core is not installed: no OLED to render on")
+    booth = Booth(cfg, BenchGPIO(), oled,
+                  SimFingerprint(scan_latency=0), keyboard, backend=backend or CannedBackend(),
+                  pipeline=0, clock=clock or VirtualClock())
+    booth.setup_pins()
+    return booth
+
+
+# ============================================================
+# MICRO BENCHMARKS
+# ============================================================
+# Each returns (callable, extra): the callable is timed, extra maps an
+# additional metric name to a divisor of the per-call time.
+
+def bench_show_msg():
+    booth = _booth()
+    return lambda: booth.show_msg("Enter Aadhaar", "123456789012", "_"), {}
+
+
+def bench_show_msg_big():
+    booth = _booth()
+    return lambda: booth.show_msg("Vote Confirmed!", "Finalizing...", "", big_text=True), {}
+
+
+def bench_show_idle():
+    booth = _booth()
+    return booth.show_idle, {}
+
+
+def bench_keyboard_decode():
+    booth = _booth(device=False, keyboard=ScriptedKeyboard("123456789012"))
+    return booth.read_aadhaar_from_keyboard_device, {}
+
+
+def bench_tick_animation():
+    booth = _booth()
+    # 8 + 10 progressive frames and the final tick
+    return booth.tick_animation, {"frame_us": 19}
+
+
+def bench_receipt_poll():
+    booth = _booth(device=False)
+    # submit_vote waits for START on the receipt screen: hold it down
+    booth.gpio.output(booth.cfg.btn_start, booth.gpio.LOW)
+    return lambda: booth.submit_vote("123456789012", 1), {}
+
+
+def bench_tunnel_url_regex():
+    provider = CloudflaredProvider()
+
+    def scan():
+        for line in CLOUDFLARED_BANNER:
+            provider.match_url(line)
+    return scan, {"line_us": len(CLOUDFLARED_BANNER)}
+
+
+MICRO = {
+    "show_msg": bench_show_msg,
+    "show_msg_big": bench_show_msg_big,
+    "show_idle": bench_show_idle,
+    "keyboard_decode": bench_keyboard_decode,
+    "tick_animation": bench_tick_animation,
+    "receipt_poll": bench_receipt_poll,
+    "tunnel_url_regex": bench_tunnel_url_regex,
+}
+
+
+def run_micro(name, repeat):
+    fn, per = MICRO[name]()
+    # The booth logs through kiosk_log (to stdout); keep that cost but not the output
+    with contextlib.redirect_stdout(io.StringIO()):
+        timer = timeit.Timer(fn)
+        loops, _ = timer.autorange()    # at least 0.2s per run
+        runs = [t / loops * 1e6 for t in timer.repeat(repeat=repeat, number=loops)]
+    median = statistics.median(runs)
+    metrics = {"median_us": round(median, 2)}
+    for metric, divisor in per.items():
+        metrics[metric] = round(median / divisor, 3)
+    return {"kind": "micro", "metrics": metrics, "min_us": round(min(runs), 2), "loops": loops}
+
+
+# ============================================================
+# MACRO BENCHMARK
+# ============================================================
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def mock_backend(settings, verbose=False):
+    port = _free_port()
+    cmd = [sys.executable, os.path.join(ROOT, "mock_backend.py"), "--port", str(port), "--seed", "1"]
+    for assignment in settings:
+        cmd += ["--set", assignment]
+    proc = subprocess.Popen(cmd, stdout=None if verbose else subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                urllib.request.urlopen(f"{url}/api/health", timeout=1).close()
+                break
+            except OSError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("mock_backend.py did not start")
+                time.sleep(0.05)
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=5)
+
+
+def run_session_e2e(voters, speed, pipeline, mock_settings, verbose=False):
+    from kiosk_backend import BackendClient
+    from kiosk_main import Booth
+    from kiosk_memory import rss_bytes
+
+    rng = random.Random(1)
+    with mock_backend(mock_settings, verbose=verbose) as url:
+        cfg = BoothConfig(name="bench")
+        clock = ScaledClock(speed)
+        gpio = BenchGPIO()
+        finger = SimFingerprint(scan_latency=0.05 / speed)
+        keyboard = SimKeyboard()
+        backend = BackendClient(url)
+        booth = Booth(cfg, gpio, kiosk_hw.open_oled(cfg, emulate=True), finger, keyboard,
+                      backend=backend, pipeline=pipeline, clock=clock)
+        booth.setup_pins()
+
+        sessions = []
+        done = threading.Event()
+        run_session = booth.run_session
+
+        def timed_session():
+            start = clock.time()
+            try:
+                run_session()
+            finally:
+                sessions.append(clock.time() - start)
+                done.set()
+        booth.run_session = timed_session
+
+        stop = threading.Event()
+        out = None if verbose else io.StringIO()
+        with contextlib.redirect_stdout(out) if out else contextlib.nullcontext():
+            runner = threading.Thread(target=booth.run, args=(stop,), name="bench-booth", daemon=True)
+            runner.start()
+            wall, cpu = time.perf_counter(), time.process_time()
+            for _ in range(voters):
+                aadhaar = "".join(rng.choice("0123456789") for _ in range(12))
+                done.clear()
+                # Everything a voter does, queued up front: each input is
+                # only read once the flow gets to it
+                keyboard.type(aadhaar)
+                finger.present(int(aadhaar) % 200 + 1)     # mock_backend's fingerprint_id
+                gpio.tap(cfg.btn_a, 2)                      # select, then confirm
+                gpio.tap(cfg.btn_start)
+                if not done.wait(timeout=120):
+                    raise RuntimeError("voter session did not finish within 120s")
+            booth.drain(timeout=60)
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            stop.set()
+            runner.join(timeout=10)
+        backend.close()
+
+    return {
+        "kind": "macro",
+        "metrics": {
+            "cpu_per_voter_ms": round(cpu / voters * 1000, 2),
+            "rss_mb": round((rss_bytes() or 0) / 1024 / 1024, 1),
+            "booth_s_per_voter": round(statistics.median(sessions), 2),
+        },
+        "voters": voters,
+        "speed": speed,
+        "pipeline": pipeline,
+        "oled": booth.device is not None,
+        "wall_s": round(wall, 2),
+    }
+
+
+# ============================================================
+# BASELINES
+# ============================================================
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return (rows, regressions). rows: (bench, metric, old, new, change)."""
+    rows, regressions = [], []
+    base = baseline.get("results", {})
+    for name, result in results.items():
+        old = base.get(name)
+        if not old:
+            continue
+        for metric, value in result["metrics"].items():
+            before = old["metrics"].get(metric)
+            if not before:
+                continue
+            change = value / before - 1
+            rows.append((name, metric, before, value, change))
+            if change > threshold:
+                regressions.append(f"{name}: {metric} {value} vs baseline {before} ({change:+.0%})")
+    return rows, regressions
+
+
+def print_comparison(rows):
+    print(f"\n{'benchmark':<18}{'metric':<20}{'baseline':>12}{'now':>12}{'change':>9}")
+    for name, metric, before, value, change in rows:
+        print(f"{name:<18}{metric:<20}{before:>12}{value:>12}{change:>+9.0%}")
+
+
+def print_results(results):
+    print(f"\n{'benchmark':<18}{'metric':<20}{'value':>12}")
+    for name, result in results.items():
+        for metric, value in result["metrics"].items():
+            print(f"{name:<18}{metric:<20}{value:>12}")
+
+
+def check(results, baseline, threshold, oled):
+    if baseline.get("oled") is not None and baseline["oled"] != oled:
+        print(f"⚠️ Baseline was run {'with' if baseline['oled'] else 'without'} an OLED device, "
+              f"this run {'with' if oled else 'without'}: session_e2e is not comparable")
+    rows, regressions = compare(results, baseline, threshold)
+    print_comparison(rows)
+    if regressions:
+        print(f"\n❌ Regressions against baseline (>{threshold:.0%}):")
+        for r in regressions:
+            print(f"   {r}")
+        return False
+    print(f"\n✅ No regressions against baseline (threshold {threshold:.0%})")
+    return True
+
+
+def cmd_run(args):
+    names = args.only or list(MICRO) + ["session_e2e"]
+    oled = oled_available()
+    results = {}
+    for name in names:
+        print(f"🔄 {name}...")
+        try:
+            if name == "session_e2e":
+                results[name] = run_session_e2e(args.voters, args.speed, args.pipeline,
+                                                MOCK_SETTINGS + args.mock_set, verbose=args.verbose)
+            else:
+                results[name] = run_micro(name, args.repeat)
+        except ImportError as e:
+            # luma / PIL / requests only exist where the kiosk can run
+            print(f"⚠️ {name} skipped: {e}")
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "python": platform.python_version(), "machine": platform.machine(),
+                       "oled": oled, "results": results}, f, indent=2)
+        print(f"✅ Results written to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            if not check(results, json.load(f), args.threshold, oled):
+                sys.exit(1)
+
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if not check(current.get("results", {}), baseline, args.threshold, current.get("oled")):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kiosk micro/macro benchmarks with stored baselines")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("run", help="run the benchmarks")
+    p.add_argument("--only", type=lambda s: [n.strip() for n in s.split(",") if n.strip()],
+                   help=f"comma-separated, from: {', '.join(list(MICRO) + ['session_e2e'])}")
+    p.add_argument("--repeat", type=int, default=5, help="timeit runs per micro benchmark (median kept)")
+    p.add_argument("--voters", type=int, default=10, help="voters for session_e2e")
+    p.add_argument("--speed", type=float, default=20.0, help="booth clock speed for session_e2e")
+    p.add_argument("--pipeline", type=int, default=2, help="PIPELINE_MAX_IN_FLIGHT for session_e2e")
+    p.add_argument("--mock-set", action="append", default=[], metavar="KEY=VALUE",
+                   help="extra mock_backend.py --set override for session_e2e")
+    p.add_argument("--verbose", action="store_true", help="show the booth's and mock's output")
+    p.add_argument("--save", help="write results JSON (usable as a baseline)")
+    p.add_argument("--baseline", help="compare with a saved run; exit 1 on regression")
+    p.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                   help="allowed slowdown as a fraction (0.2 = 20%%)")
+    p = sub.add_parser("compare", help="compare two saved runs; exit 1 on regression")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.cmd == "run" and args.only:
+        unknown = [n for n in args.only if n not in MICRO and n != "session_e2e"]
+        if unknown:
+            print(f"❌ Unknown benchmark(s): {', '.join(unknown)}")
+            sys.exit(1)
+    try:
+        cmd_run(args) if args.cmd == "run" else cmd_compare(args)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
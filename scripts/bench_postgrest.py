@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Discovery Writer Benchmark
+
+Compares the two ways the tunnel manager can publish backend_url:
+
+    postgrest   votechain_postgrest.PostgrestClient (stdlib + asyncio)
+    supabase    supabase-py create_client(...).table(...).update(...)
+
+For each, a fresh interpreter measures import + client creation time and
+peak RSS (the tunnel manager's startup cost on the Pi), then times
+--writes sequential updates of system_config.backend_url.
+
+Against the mock backend (no Supabase account needed):
+    python3 mock_backend.py --port 3000 &
+    python3 scripts/bench_postgrest.py --url http://127.0.0.1:3000 --runs 5 --writes 50
+
+Against the real project, SUPABASE_URL/SUPABASE_KEY are read from
+backend/.env (note: this rewrites backend_url; restart the tunnel after).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from votechain_config import config  # noqa: E402
+
+# Each child prints one JSON line: {"startup_s", "rss_mb", "writes_s": [...]}
+CHILD_PREAMBLE = """
+import json, resource, sys, time
+url, key, writes = sys.argv[1], sys.argv[2], int(sys.argv[3])
+t0 = time.perf_counter()
+"""
+
+CHILD_POSTGREST = CHILD_PREAMBLE + """
+import asyncio
+from votechain_postgrest import PostgrestClient
+client = PostgrestClient(url, key, retries=0)
+startup = time.perf_counter() - t0
+
+async def run():
+    out = []
+    for i in range(writes):
+        t = time.perf_counter()
+        await client.update("system_config", {"value": f"https://bench-{i}.example"}, key="eq.backend_url")
+        out.append(time.perf_counter() - t)
+    return out
+
+times = asyncio.run(run())
+print(json.dumps({"startup_s": startup, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  "writes_s": times}))
+"""
+
+CHILD_SUPABASE = CHILD_PREAMBLE + """
+from supabase import create_client
+client = create_client(url, key)
+startup = time.perf_counter() - t0
+times = []
+for i in range(writes):
+    t = time.perf_counter()
+    client.table("system_config").update({"value": f"https://bench-{i}.example"}).eq("key", "backend_url").execute()
+    times.append(time.perf_counter() - t)
+print(json.dumps({"startup_s": startup, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  "writes_s": times}))
+"""
+
+CHILDREN = {"postgrest": CHILD_POSTGREST, "supabase": CHILD_SUPABASE}
+
+
+def run_child(name, url, key, writes):
+    proc = subprocess.run([sys.executable, "-c", CHILDREN[name], url, key, str(writes)],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        last = (proc.stderr.strip().splitlines() or ["exit code %d" % proc.returncode])[-1]
+        raise RuntimeError(last)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs):
+    writes = sorted(w for r in runs for w in r["writes_s"])
+    # The first write of each run pays for the TCP/TLS handshake
+    first = [r["writes_s"][0] for r in runs if r["writes_s"]]
+    out = {
+        "runs": len(runs),
+        "startup_s": round(statistics.median(r["startup_s"] for r in runs), 4),
+        "rss_mb": round(statistics.median(r["rss_mb"] for r in runs), 1),
+    }
+    if writes:
+        out.update({
+            "first_write_s": round(statistics.median(first), 4),
+            "write_p50_s": round(writes[len(writes) // 2], 4),
+            "write_p95_s": round(writes[min(len(writes) - 1, int(len(writes) * 0.95))], 4),
+        })
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PostgREST writer against supabase-py")
+    parser.add_argument("--url", help="Supabase/mock base URL (default: SUPABASE_URL from backend/.env)")
+    parser.add_argument("--key", help="API key (default: SUPABASE_KEY, or 'bench' for the mock)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per client")
+    parser.add_argument("--writes", type=int, default=20, help="updates per run (0 = startup only)")
+    parser.add_argument("--clients", default="postgrest,supabase")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    url = args.url or config.supabase_url
+    key = args.key or (config.supabase_key if not args.url else None) or "bench"
+    if not url:
+        print("❌ No --url and no SUPABASE_URL in backend/.env")
+        sys.exit(1)
+
+    results = {}
+    for name in [c.strip() for c in args.clients.split(",") if c.strip()]:
+        if name not in CHILDREN:
+            print(f"⚠️ Unknown client {name}, skipping")
+            continue
+        print(f"🔄 {name}: {args.runs} run(s) x {args.writes} write(s)...")
+        try:
+            runs = [run_child(name, url, key, args.writes) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"   ❌ {e}")
+            results[name] = {"error": str(e)}
+            continue
+        results[name] = summarize(runs)
+        print("   " + "  ".join(f"{k}={v}" for k, v in results[name].items()))
+
+    ok = {k: v for k, v in results.items() if "error" not in v}
+    if "postgrest" in ok and "supabase" in ok:
+        p, s = ok["postgrest"], ok["supabase"]
+        print(f"\n✅ postgrest starts {s['startup_s'] / max(p['startup_s'], 1e-6):.1f}x faster "
+              f"and uses {s['rss_mb'] - p['rss_mb']:.1f} MB less RSS")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"url": url, "results": results}, f, indent=2)
+        print(f"✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Tunnel Recovery Benchmark
+
+Runs the real TunnelManager against scripted fake tunnels
+(scripts/fake_tunnel.py --plan) and a local mock backend that also plays
+Supabase's PostgREST, then measures what a kiosk would see:
+
+    first_url_s         start -> first tunnel URL printed
+    first_available_s   start -> /api/health answers through the published URL
+    write_s             manager publishes a URL -> system_config updated
+    propagation_s       manager publishes a URL -> a poller sees it
+    recovery_s          outage length: health checks failing through the
+                        published URL until they pass again
+    failed_failovers    failovers whose new URL could not be published
+                        (not counted as failovers)
+
+A kiosk-side watcher polls system_config and /api/health every --tick
+seconds, so measurements are accurate to about one tick.
+
+    python3 scripts/bench_tunnels.py                        # all scenarios
+    python3 scripts/bench_tunnels.py --scenarios crash,crash-standby --repeat 3
+    python3 scripts/bench_tunnels.py --save baseline.json
+    python3 scripts/bench_tunnels.py --baseline baseline.json   # exit 1 on regression
+
+Scenarios use the manager's real timings (RESTART_DELAY, URL_TIMEOUT, retry
+sleeps); hang-on-start therefore takes about a minute.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mock_backend import MockBackend, load_profile  # noqa: E402
+from tunnel_manager import FakeProvider, PLACEHOLDER_URL, PostgrestWriter, TunnelManager  # noqa: E402
+from votechain_http import HTTPClient, serve  # noqa: E402
+
+# plan: fake_tunnel.py --plan for the active tunnel (one step per start, the
+# last repeats); standby: plan for standby tunnels (none = no standby)
+SCENARIOS = {
+    "clean":         {"plan": "ok", "duration": 8},
+    "crash":         {"plan": "die:4,ok", "duration": 20},
+    "crash-standby": {"plan": "die:6,ok", "standby": "ok", "duration": 15},
+    "flaky-start":   {"plan": "exit,exit,ok", "duration": 35},
+    "hang-on-start": {"plan": "hang,ok", "duration": 55},
+    "stall":         {"plan": "stall:4,ok", "probe": True, "duration": 35},
+    "stall-standby": {"plan": "stall:6,ok", "probe": True, "standby": "ok", "duration": 30},
+    "crash-loop":    {"plan": "die:3,exit", "duration": 45},
+}
+PROBE = {"interval": 1.0, "timeout": 2.0, "warmup": 3.0, "min_samples": 3, "max_failures": 3}
+# A regression: slower than baseline by this factor plus this many seconds
+REGRESSION_FACTOR = 1.25
+REGRESSION_SLACK = 0.5
+
+
+class BenchManager(TunnelManager):
+    """TunnelManager that remembers when each URL was printed, handed to the
+    writer and written."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.url_found = {}
+        self.url_publishing = {}
+        self.url_written = {}
+
+    async def start_tunnel(self, provider=None, role="active"):
+        tunnel = await super().start_tunnel(provider, role)
+        if tunnel:
+            self.url_found[tunnel.url] = tunnel.url_at
+        return tunnel
+
+    async def publish(self, url):
+        self.url_publishing.setdefault(url, time.monotonic())
+        ok = await super().publish(url)
+        if ok:
+            self.url_written.setdefault(url, time.monotonic())
+        return ok
+
+
+class Watcher:
+    """What a kiosk sees: the published URL and whether it answers."""
+
+    def __init__(self, supabase_url, tick):
+        self.rest = HTTPClient(supabase_url, max_idle=1)
+        self.tick = tick
+        self.seen = {}          # url -> first monotonic time seen in system_config
+        self.up = None
+        self.first_up = None
+        self.outages = []       # [start, end or None]
+        self._client = None
+        self._url = None
+
+    async def current_url(self):
+        try:
+            resp = await self.rest.get("/rest/v1/system_config?key=eq.backend_url", timeout=1)
+            rows = resp.json()
+        except (asyncio.TimeoutError, OSError, ConnectionError, ValueError):
+            return self._url
+        url = rows[0]["value"] if rows else None
+        return None if url == PLACEHOLDER_URL else url
+
+    async def healthy(self):
+        if not self._client:
+            return False
+        try:
+            resp = await self._client.get("/api/health", timeout=max(0.5, self.tick * 4))
+            return resp.status == 200
+        except (asyncio.TimeoutError, OSError, ConnectionError, ValueError):
+            return False
+
+    async def run(self, stop):
+        while not stop.is_set():
+            now = time.monotonic()
+            url = await self.current_url()
+            if url and url != self._url:
+                self.seen.setdefault(url, now)
+                if self._client:
+                    self._client.close()
+                self._url, self._client = url, HTTPClient(url, max_idle=1)
+            ok = await self.healthy()
+            now = time.monotonic()
+            if ok and not self.up:
+                if self.first_up is None:
+                    self.first_up = now
+                elif self.outages and self.outages[-1][1] is None:
+                    self.outages[-1][1] = now
+            elif not ok and self.up:
+                self.outages.append([now, None])
+            self.up = ok
+            try:
+                await asyncio.wait_for(stop.wait(), self.tick)
+            except asyncio.TimeoutError:
+                pass
+        self.rest.close()
+        if self._client:
+            self._client.close()
+
+
+def _r(value):
+    return round(value, 3) if value is not None else None
+
+
+async def run_scenario(name, spec, args, mock_url):
+    state = tempfile.NamedTemporaryFile(prefix=f"bench-{name}-", suffix=".count", delete=False)
+    state.close()
+    provider = FakeProvider("--plan", spec["plan"], "--state", state.name,
+                            "--startup", str(args.startup), "--style", args.style)
+    standby = None
+    if spec.get("standby"):
+        standby = FakeProvider("--plan", spec["standby"], "--startup", str(args.startup), "--style", args.style)
+    log_path = os.path.join(args.log_dir, f"bench-{name}.log")
+    os.makedirs(args.log_dir, exist_ok=True)
+
+    with open(log_path, "a") as log, contextlib.redirect_stdout(log if not args.verbose else sys.stdout):
+        print(f"\n===== {name} {time.strftime('%Y-%m-%dT%H:%M:%S')} =====")
+        port = int(mock_url.rsplit(":", 1)[1])
+        manager = BenchManager(provider, PostgrestWriter(mock_url, "bench"), port=port,
+                               standby_provider=standby, probe=dict(PROBE) if spec.get("probe") else None,
+                               url_timeout=args.url_timeout)
+        watcher = Watcher(mock_url, args.tick)
+        stop = asyncio.Event()
+        started = time.monotonic()
+        watch_task = asyncio.create_task(watcher.run(stop))
+        manager_task = asyncio.create_task(manager.run())
+        done, _ = await asyncio.wait({manager_task}, timeout=spec["duration"])
+        gave_up = bool(done)
+        # Stop watching first: the shutdown itself is not an outage
+        stop.set()
+        await watch_task
+        manager.stop()
+        await manager_task
+
+    with open(state.name) as f:
+        starts = int(f.read().strip() or 0)
+    os.unlink(state.name)
+
+    first_url = min(manager.url_found.values(), default=None)
+    recoveries = [end - start for start, end in watcher.outages if end is not None]
+    return {
+        "scenario": name,
+        "starts": starts,
+        "first_url_s": _r(first_url - started if first_url else None),
+        "first_available_s": _r(watcher.first_up - started if watcher.first_up else None),
+        "write_s": [_r(manager.url_written[u] - t) for u, t in manager.url_publishing.items()
+                    if u in manager.url_written],
+        "propagation_s": [_r(watcher.seen[u] - t) for u, t in manager.url_publishing.items()
+                          if u in watcher.seen],
+        "recovery_s": [_r(x) for x in recoveries],
+        "unrecovered": sum(1 for _, end in watcher.outages if end is None),
+        "failovers": [f["kind"] for f in manager.failovers if f["published"]],
+        "failed_failovers": sum(1 for f in manager.failovers if not f["published"]),
+        "gave_up": gave_up,
+        "log": log_path,
+    }
+
+
+def summarize(runs):
+    """Median over repeats (lists are pooled)."""
+    def med(values):
+        values = [v for v in values if v is not None]
+        return _r(statistics.median(values)) if values else None
+
+    pooled = lambda key: [v for r in runs for v in r[key]]  # noqa: E731
+    return {
+        "scenario": runs[0]["scenario"],
+        "runs": len(runs),
+        "first_url_s": med(r["first_url_s"] for r in runs),
+        "first_available_s": med(r["first_available_s"] for r in runs),
+        "write_p50_s": med(pooled("write_s")),
+        "propagation_p50_s": med(pooled("propagation_s")),
+        "recovery_p50_s": med(pooled("recovery_s")),
+        "recovery_max_s": _r(max(pooled("recovery_s"), default=None) if pooled("recovery_s") else None),
+        "outages": sum(len(r["recovery_s"]) + r["unrecovered"] for r in runs),
+        "unrecovered": sum(r["unrecovered"] for r in runs),
+        "failovers": sorted({k for r in runs for k in r["failovers"]}),
+        "failed_failovers": sum(r["failed_failovers"] for r in runs),
+        "gave_up": any(r["gave_up"] for r in runs),
+    }
+
+
+def compare(results, baseline):
+    """Return a list of regression messages."""
+    problems = []
+    base = {r["scenario"]: r for r in baseline.get("results", [])}
+    for cur in results:
+        old = base.get(cur["scenario"])
+        if not old:
+            continue
+        if cur["unrecovered"] > old["unrecovered"]:
+            problems.append(f"{cur['scenario']}: {cur['unrecovered']} unrecovered outage(s), "
+                            f"baseline {old['unrecovered']}")
+        if cur.get("failed_failovers", 0) > old.get("failed_failovers", 0):
+            problems.append(f"{cur['scenario']}: {cur['failed_failovers']} failover(s) whose URL was not "
+                            f"published, baseline {old.get('failed_failovers', 0)}")
+        for key in ("first_available_s", "recovery_p50_s", "propagation_p50_s"):
+            a, b = cur.get(key), old.get(key)
+            if b is None:
+                continue
+            if a is None:
+                problems.append(f"{cur['scenario']}: {key} missing (baseline {b}s)")
+            elif a > b * REGRESSION_FACTOR + REGRESSION_SLACK:
+                problems.append(f"{cur['scenario']}: {key} {a}s vs baseline {b}s")
+    return problems
+
+
+def print_table(results):
+    cols = ["first_url_s", "first_available_s", "write_p50_s", "propagation_p50_s",
+            "recovery_p50_s", "recovery_max_s", "outages", "unrecovered", "failed_failovers"]
+    print(f"\n{'scenario':<15}" + "".join(f"{c.replace('_s', ''):>19}" for c in cols))
+    for r in results:
+        cells = "".join(f"{'-' if r[c] is None else r[c]:>19}" for c in cols)
+        print(f"{r['scenario']:<15}{cells}{'  (gave up)' if r['gave_up'] else ''}")
+
+
+async def amain(args):
+    # One mock backend (API + PostgREST) for the whole run; each scenario
+    # gets a fresh MockBackend so system_config starts at the placeholder
+    current = {}
+    server = await serve(lambda req: current["mock"].handle(req), "127.0.0.1", 0)
+    mock_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    results = []
+    try:
+        for name in args.scenarios:
+            runs = []
+            for i in range(args.repeat):
+                print(f"🔄 {name} ({i + 1}/{args.repeat}, up to {SCENARIOS[name]['duration']}s)...")
+                current["mock"] = MockBackend(load_profile())
+                runs.append(await run_scenario(name, SCENARIOS[name], args, mock_url))
+            results.append(summarize(runs))
+    finally:
+        server.close()
+        # Let closed client connections reach EOF on the server side
+        await asyncio.sleep(0.2)
+        leftovers = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in leftovers:
+            task.cancel()
+        await asyncio.gather(*leftovers, return_exceptions=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure tunnel manager recovery times with fake tunnels")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--tick", type=float, default=0.1, help="watcher poll interval (s)")
+    parser.add_argument("--startup", type=float, default=0.5, help="fake tunnel seconds to URL")
+    parser.add_argument("--style", choices=["localtunnel", "cloudflared"], default="cloudflared")
+    parser.add_argument("--url-timeout", type=float, default=30, help="manager's URL timeout (s)")
+    parser.add_argument("--log-dir", default=os.path.join(tempfile.gettempdir(), "votechain-bench"))
+    parser.add_argument("--verbose", action="store_true", help="show the manager's output")
+    parser.add_argument("--save", help="write results JSON (usable as --baseline)")
+    parser.add_argument("--baseline", help="compare with a saved run; exit 1 on regression")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        print(f"❌ Unknown scenario(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    try:
+        results = asyncio.run(amain(args))
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped")
+        return
+    print_table(results)
+    print(f"\nManager output: {args.log_dir}/bench-<scenario>.log")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}, f, indent=2)
+        print(f"✅ Results written to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f))
+        if problems:
+            print("\n❌ Regressions against baseline:")
+            for p in problems:
+                print(f"   {p}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
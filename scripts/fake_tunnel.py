@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Fake Tunnel
+
+Local stand-in for cloudflared/localtunnel used by the tunnel manager's
+"fake" provider. It forwards a random local port to the backend port and
+prints a localtunnel-style "your url is: ..." line, so the manager's URL
+detection, crash handling and health probes can be exercised offline.
+
+    python3 scripts/fake_tunnel.py --port 3000 --startup 2 --die-after 30 --latency 0.05
+
+Failure scripts (scripts/bench_tunnels.py) give each start of the tunnel its
+own behaviour. The start count is kept in --state, and the last step
+repeats:
+
+    --plan exit,hang,die:5,ok --state /tmp/plan.count
+
+    ok        print the URL and forward until killed
+    die:N     exit N seconds after the URL (crash)
+    stall:N   stop answering N seconds after the URL (process stays alive)
+    exit      exit before printing a URL
+    hang      never print a URL
+
+--style cloudflared prints cloudflared-like INF/ERR lines around the URL
+(still a local http:// URL) to exercise the log classifier.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+
+async def pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+def next_step(plan, state):
+    """Behaviour for this start: (action, seconds)."""
+    steps = [s.strip() for s in plan.split(",") if s.strip()]
+    count = 0
+    if state:
+        try:
+            with open(state) as f:
+                count = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            count = 0
+        with open(state, "w") as f:
+            f.write(str(count + 1))
+    action, _, seconds = steps[min(count, len(steps) - 1)].partition(":")
+    return action, float(seconds or 0)
+
+
+def log(style, level, message):
+    if style == "cloudflared":
+        print(f"2024-01-01T00:00:00Z {level} {message}", flush=True)
+    else:
+        print(f"{level} {message}", flush=True)
+
+
+async def run(args):
+    action, seconds = next_step(args.plan, args.state) if args.plan else ("ok", 0.0)
+    if args.die_after and action == "ok":
+        action, seconds = "die", args.die_after
+    stalled = False
+    clients = set()
+
+    async def handle(client_reader, client_writer):
+        if stalled:
+            # Accept and never answer, like a tunnel whose edge lost the origin
+            await asyncio.sleep(3600)
+            return
+        # Per-connection overhead, like the extra hop through an edge server
+        if args.latency:
+            await asyncio.sleep(args.latency * random.uniform(0.5, 1.5))
+        try:
+            up_reader, up_writer = await asyncio.open_connection("127.0.0.1", args.port)
+        except OSError:
+            client_writer.close()
+            return
+        clients.add(client_writer)
+        try:
+            await asyncio.gather(pipe(client_reader, up_writer), pipe(up_reader, client_writer))
+        finally:
+            clients.discard(client_writer)
+
+    log(args.style, "INF", "Requesting new quick tunnel...")
+    await asyncio.sleep(args.startup)
+    if action == "exit":
+        log(args.style, "ERR", "failed to request quick Tunnel: 500 Internal Server Error")
+        sys.exit(args.exit_code)
+    if action == "hang":
+        await asyncio.sleep(3600)
+        return
+
+    server = await asyncio.start_server(handle, "127.0.0.1", args.listen)
+    port = server.sockets[0].getsockname()[1]
+    if args.style == "cloudflared":
+        log(args.style, "INF", f"|  your url is: http://127.0.0.1:{port}  |")
+        log(args.style, "INF", f"Registered tunnel connection connIndex=0 connection=fake ip=127.0.0.1 "
+                               f"location=local{os.getpid() % 10} protocol=quic")
+    else:
+        print(f"your url is: http://127.0.0.1:{port}", flush=True)
+
+    async with server:
+        if action == "die":
+            await asyncio.sleep(seconds)
+            log(args.style, "ERR", f"Connection terminated (fake tunnel exiting with {args.exit_code})")
+            sys.exit(args.exit_code)
+        if action == "stall":
+            await asyncio.sleep(seconds)
+            log(args.style, "WRN", "Connection terminated error=\"stalled\" connIndex=0")
+            stalled = True
+            # Kept-alive connections go quiet too
+            for writer in list(clients):
+                writer.close()
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake tunnel for offline tunnel-manager tests")
+    parser.add_argument("--port", type=int, default=3000, help="backend port to forward to")
+    parser.add_argument("--listen", type=int, default=0, help="public port (0 = random)")
+    parser.add_argument("--startup", type=float, default=0.5, help="seconds before the URL is printed")
+    parser.add_argument("--die-after", type=float, default=0, help="exit after N seconds (0 = never)")
+    parser.add_argument("--exit-code", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="added seconds per connection")
+    parser.add_argument("--plan", help="comma-separated behaviour per start (see module docstring)")
+    parser.add_argument("--state", help="file counting starts for --plan")
+    parser.add_argument("--style", choices=["localtunnel", "cloudflared"], default="localtunnel")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Backend Load Generator
+
+Simulates N kiosks running the real voter sequence against backend/server.js
+(or mock_backend.py):
+
+    think (Aadhaar typing) -> POST /api/voter/check-in
+    think (fingerprint + ballot) -> POST /api/vote
+    POST /api/lookup-receipt every second until the short code shows up
+
+Kiosk counts are stepped up (--ramp 1,2,4,8,16) and each step reports
+throughput, p50/p95/p99 latency per endpoint and an error breakdown. The
+knee is the first step where /api/vote p95 more than doubles from the
+first step or throughput stops growing.
+
+For a realistic run against a local chain:
+    npx hardhat node                       # terminal 1
+    SEPOLIA_RPC_URL=http://127.0.0.1:8545 RL_CHECKIN_MAX=100000 RL_VOTE_MAX=100000 \\
+        node backend/server.js             # terminal 2
+    python3 scripts/load_test.py --voters voters.txt --ramp 1,2,4,8,16 --step-seconds 60
+
+voters.txt holds one enrolled Aadhaar per line; every vote uses up one voter.
+Without --voters random Aadhaar numbers are used (fine for mock_backend.py).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mock_backend import parse_dist  # noqa: E402
+from votechain_http import HTTPClient  # noqa: E402
+from votechain_metrics import percentile  # noqa: E402
+
+ENDPOINTS = ("/api/voter/check-in", "/api/vote", "/api/lookup-receipt")
+
+
+def _bucket(message):
+    """Group error messages that differ only in numbers/hashes
+    (e.g. 'nonce too low: next nonce 41, tx nonce 40')."""
+    message = re.sub(r"0x[0-9a-fA-F]+", "0x…", str(message))
+    return re.sub(r"\d+", "N", message)[:80]
+
+
+class StepStats:
+    def __init__(self, kiosks):
+        self.kiosks = kiosks
+        self.latency = defaultdict(list)
+        self.status = defaultdict(Counter)
+        self.errors = Counter()
+        self.voters_done = 0
+        self.receipts_late = 0
+        self.receipts_missing = 0
+        self.time_per_voter = []
+        self.started = time.monotonic()
+        self.ended = None
+
+    def record(self, endpoint, seconds, status=None, error=None):
+        self.latency[endpoint].append(seconds)
+        self.status[endpoint][status if status is not None else "exception"] += 1
+        if error:
+            self.errors[f"{endpoint} {status or ''} {_bucket(error)}".replace("  ", " ")] += 1
+
+    def report(self):
+        duration = (self.ended or time.monotonic()) - self.started
+        out = {
+            "kiosks": self.kiosks,
+            "duration_s": round(duration, 1),
+            "voters_done": self.voters_done,
+            "throughput_vpm": round(self.voters_done / duration * 60, 2) if duration else 0,
+            "receipts_late": self.receipts_late,
+            "receipts_missing": self.receipts_missing,
+            "time_per_voter_p50_s": percentile(sorted(self.time_per_voter), 50),
+            "endpoints": {},
+            "errors": dict(self.errors.most_common(10)),
+        }
+        for ep in ENDPOINTS:
+            values = sorted(self.latency.get(ep, []))
+            if not values:
+                continue
+            out["endpoints"][ep] = {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 4),
+                "p95": round(percentile(values, 95), 4),
+                "p99": round(percentile(values, 99), 4),
+                "status": {str(k): v for k, v in self.status[ep].items()},
+            }
+        return out
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.typing = parse_dist(args.think_checkin)
+        self.ballot = parse_dist(args.think_vote)
+        self.voters = []
+        if args.voters:
+            with open(args.voters) as f:
+                self.voters = [line.strip() for line in f if re.match(r"^\d{12}$", line.strip())]
+            self.rng.shuffle(self.voters)
+
+    def next_aadhaar(self):
+        if self.args.voters:
+            return self.voters.pop() if self.voters else None
+        return "".join(self.rng.choice("0123456789") for _ in range(12))
+
+    async def timed(self, stats, client, endpoint, body, timeout, expected=(200,)):
+        start = time.perf_counter()
+        try:
+            resp = await client.post(endpoint, json_body=body, timeout=timeout)
+        except asyncio.TimeoutError:
+            stats.record(endpoint, time.perf_counter() - start, error="client timeout")
+            return None
+        except (OSError, ConnectionError) as e:
+            stats.record(endpoint, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            return None
+        error = None
+        if resp.status not in expected:
+            try:
+                error = resp.json().get("message") or resp.text[:80]
+            except ValueError:
+                error = resp.text[:80] or f"HTTP {resp.status}"
+        stats.record(endpoint, time.perf_counter() - start, resp.status, error)
+        return resp
+
+    async def kiosk(self, stats, deadline):
+        """One simulated kiosk, each with its own keep-alive connection."""
+        client = HTTPClient(self.args.url, max_idle=1)
+        try:
+            while time.monotonic() < deadline:
+                aadhaar = self.next_aadhaar()
+                if aadhaar is None:
+                    print("⚠️ Ran out of voters")
+                    return
+                started = time.monotonic()
+                await asyncio.sleep(self.typing(self.rng))
+                resp = await self.timed(stats, client, "/api/voter/check-in", {"aadhaar_id": aadhaar}, 5)
+                if resp is None or resp.status != 200:
+                    continue
+                await asyncio.sleep(self.ballot(self.rng))
+                resp = await self.timed(stats, client, "/api/vote", {
+                    "aadhaar_id": aadhaar,
+                    "candidate_id": self.rng.randint(1, self.args.candidates)}, 90)
+                if resp is None or resp.status != 200:
+                    continue
+                data = resp.json().get("data") or {}
+                if not data.get("receipt_code") and data.get("transaction_hash"):
+                    await self.poll_receipt(stats, client, data["transaction_hash"])
+                stats.voters_done += 1
+                stats.time_per_voter.append(time.monotonic() - started)
+        finally:
+            client.close()
+
+    async def poll_receipt(self, stats, client, tx_hash):
+        stats.receipts_late += 1
+        poll_start = time.monotonic()
+        while time.monotonic() - poll_start < 60:
+            # 404 just means "not inserted yet"
+            resp = await self.timed(stats, client, "/api/lookup-receipt", {"tx_hash": tx_hash}, 5,
+                                    expected=(200, 404))
+            if resp is not None and resp.status == 200 and resp.json().get("code"):
+                return
+            await asyncio.sleep(1.0)
+        stats.receipts_missing += 1
+
+    async def step(self, kiosks):
+        stats = StepStats(kiosks)
+        deadline = time.monotonic() + self.args.step_seconds
+        await asyncio.gather(*(self.kiosk(stats, deadline) for _ in range(kiosks)))
+        stats.ended = time.monotonic()
+        return stats.report()
+
+    async def run(self):
+        results = []
+        for kiosks in self.args.ramp:
+            print(f"🔄 {kiosks} kiosk(s) for {self.args.step_seconds}s...")
+            report = await self.step(kiosks)
+            results.append(report)
+            print_step(report)
+            if self.args.voters and not self.voters:
+                break
+        return results
+
+
+def find_knee(results, endpoint="/api/vote"):
+    """First step where latency falls apart: p95 > 2x the first step's,
+    or throughput grows < 10% although the kiosk count went up."""
+    base = results[0]["endpoints"].get(endpoint, {}).get("p95") if results else None
+    for prev, cur in zip(results, results[1:]):
+        p95 = cur["endpoints"].get(endpoint, {}).get("p95")
+        if base and p95 and p95 > 2 * base:
+            return {"kiosks": cur["kiosks"], "reason": f"{endpoint} p95 {p95}s > 2x {base}s"}
+        if prev["throughput_vpm"] and cur["throughput_vpm"] < prev["throughput_vpm"] * 1.1:
+            return {"kiosks": cur["kiosks"],
+                    "reason": f"throughput {cur['throughput_vpm']} vpm vs {prev['throughput_vpm']} vpm"}
+    return None
+
+
+def print_step(r):
+    print(f"   {r['kiosks']:>3} kiosks  {r['throughput_vpm']:>7} voters/min  "
+          f"({r['voters_done']} done, {r['receipts_missing']} without receipt)")
+    for ep, s in r["endpoints"].items():
+        print(f"       {ep:<22} n={s['count']:<5} p50={s['p50']:<8} p95={s['p95']:<8} p99={s['p99']:<8} {s['status']}")
+    for err, n in r["errors"].items():
+        print(f"       ❌ {n:>4}× {err}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate N kiosks against the VoteChain backend")
+    parser.add_argument("--url", default="http://127.0.0.1:3000", help="backend base URL")
+    parser.add_argument("--ramp", default="1,2,4,8", help="kiosk counts to step through")
+    parser.add_argument("--step-seconds", type=float, default=60)
+    parser.add_argument("--voters", help="file with one enrolled Aadhaar per line")
+    parser.add_argument("--candidates", type=int, default=2)
+    parser.add_argument("--think-checkin", default="uniform:4,10", help="Aadhaar typing time")
+    parser.add_argument("--think-vote", default="uniform:5,15", help="fingerprint + ballot time")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", help="write the full report to this file")
+    args = parser.parse_args()
+    try:
+        args.ramp = [int(x) for x in args.ramp.split(",") if x.strip()]
+        test = LoadTest(args)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    try:
+        results = asyncio.run(test.run())
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped")
+        return
+    knee = find_knee(results)
+    print(f"\n{'⚠️ Knee at ' + str(knee['kiosks']) + ' kiosks: ' + knee['reason'] if knee else '✅ No knee within the ramp'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"url": args.url, "steps": results, "knee": knee}, f, indent=2)
+        print(f"✅ Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Markdown Formatter
+
+One normalization engine for the docs (replaces fix_md_spacing.py and
+ensure_blank_before_headings.py). Each file is split into tokens (plain
+lines and whole fenced blocks), run through RULES in order and rendered
+back:
+
+    fence_language      ``` without a language gets one guessed from its body
+    fence_spacing       blank line before and after every fenced block
+    heading_spacing     blank line before and after headings
+    demote_extra_h1     only the title may be an H1; later ones become H2
+
+The rules are generator stages, so a file is read once, line by line,
+holding only the current fenced block: large generated docs are checked in
+constant memory. Output is compared with the original as it streams; a fix
+goes to a temp file beside the original and is renamed over it, so a crash
+never leaves a half-written doc (and no .bak copies).
+
+Files are processed across a process pool. A cache of size/mtime/SHA-256
+per file skips files that are already clean, so a repeat run over the
+whole tree only stats them. Changing this script invalidates the cache.
+
+    python3 scripts/md_format.py                    # docs/ and the top-level *.md
+    python3 scripts/md_format.py docs/DEPLOYMENT.md README.md
+    python3 scripts/md_format.py --check            # exit 1 if anything needs fixing (CI)
+    python3 scripts/md_format.py --diff             # show the fixes as a unified diff
+    python3 scripts/md_format.py --no-cache --jobs 1
+"""
+
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_PATHS = [os.path.join(ROOT, "docs"), ROOT]
+CACHE_PATH = os.path.expanduser("~/.cache/votechain/md_format.json")
+SKIP_DIRS = {".git", "node_modules", "dist", "artifacts", "cache", "typechain-types", "__pycache__"}
+# Below this many files a pool costs more than it saves
+POOL_MIN_FILES = 8
+
+FENCE = re.compile(r"^(?P<indent> {0,3})(?P<ticks>`{3,}|~{3,})(?P<info>[^`]*)$")
+HEADING = re.compile(r"^#{1,6}(\s|$)")
+
+# Fence language guesses, checked in order (compiled once)
+LANGUAGES = [
+    ("python", re.compile(r"\bpython\b|^\s*def\s|^\s*(import|from)\s+\w|print\(|\basync def\b|\bawait\b",
+                          re.I | re.M)),
+    ("bash", re.compile(r"^\s*(\$ )?(node|npm|npx|apt|apt-get|sudo|git|curl|wget|systemctl|service|cd|bash|sh|"
+                        r"pm2|python3?|pip3?|cloudflared|ssh|scp|cp|mv|rm|ls|cat|tail|chmod|export)\b", re.M)),
+    ("ini", re.compile(r"^\[(Unit|Service|Install)\]|^(ExecStart|WantedBy|Restart)=", re.M)),
+    ("sql", re.compile(r"^\s*(SELECT|INSERT|UPDATE|CREATE|ALTER|DROP)\b", re.M)),
+    ("json", re.compile(r"^\s*[\[{]\s*$|^\s*\"[^\"]+\"\s*:", re.M)),
+    ("conf", re.compile(r"^\s*[\w.-]+\s*(=|:\s)|static ip_address|interface|dhcpcd", re.I | re.M)),
+]
+
+
+# ============================================================
+# TOKENS
+# ============================================================
+
+class Fence:
+    """A fenced code block: opener, body lines, closer (None if unclosed)."""
+
+    def __init__(self, indent, ticks, info, body=None, closer=None):
+        self.indent = indent
+        self.ticks = ticks
+        self.info = info.strip()
+        self.body = body or []
+        self.closer = closer
+
+    def closes(self, line):
+        m = FENCE.match(line)
+        return bool(m and not m.group("info").strip() and m.group("ticks")[0] == self.ticks[0]
+                    and len(m.group("ticks")) >= len(self.ticks))
+
+    def lines(self):
+        yield f"{self.indent}{self.ticks}{self.info}"
+        yield from self.body
+        if self.closer is not None:
+            yield self.closer
+
+
+def read_lines(path):
+    """Lines of a file without their line endings, one at a time."""
+    with open(path, encoding="utf-8", newline="") as f:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+
+def tokenize(lines):
+    """Plain lines (str) and Fence blocks. Only the current fence is held."""
+    fence = None
+    for line in lines:
+        if fence is not None:
+            if fence.closes(line):
+                fence.closer = line
+                yield fence
+                fence = None
+            else:
+                fence.body.append(line)
+            continue
+        m = FENCE.match(line)
+        if m and not (m.group("ticks")[0] == "`" and "`" in m.group("info")):
+            fence = Fence(m.group("indent"), m.group("ticks"), m.group("info"))
+        else:
+            yield line
+    if fence is not None:
+        yield fence
+
+
+def render(tokens):
+    """Tokens back to lines, dropping trailing blank lines."""
+    blanks = []
+    for token in tokens:
+        for line in (token.lines() if isinstance(token, Fence) else (token,)):
+            if not line.strip():
+                blanks.append(line)
+                continue
+            yield from blanks
+            blanks = []
+            yield line
+
+
+def _blank(token):
+    return isinstance(token, str) and not token.strip()
+
+
+def _heading(token):
+    return isinstance(token, str) and HEADING.match(token) is not None
+
+
+# ============================================================
+# RULES
+# ============================================================
+# Each rule is a generator stage: tokens in, tokens out, counting what it
+# fixed in `found[rule name]`. A stage only remembers the token it last
+# emitted, so the pipeline runs in one pass over the file.
+
+def guess_language(body):
+    text = "\n".join(body)
+    for name, pattern in LANGUAGES:
+        if pattern.search(text):
+            return name
+    return "text"
+
+
+def fence_language(tokens, found):
+    for token in tokens:
+        if isinstance(token, Fence) and not token.info:
+            token.info = guess_language(token.body)
+            found["fence_language"] += 1
+        yield token
+
+
+def fence_spacing(tokens, found):
+    prev, after_fence = None, False
+    for token in tokens:
+        if after_fence and not _blank(token):
+            found["fence_spacing"] += 1
+            prev = ""
+            yield prev
+        after_fence = isinstance(token, Fence)
+        if after_fence and prev is not None and not _blank(prev):
+            found["fence_spacing"] += 1
+            yield ""
+        prev = token
+        yield token
+
+
+def heading_spacing(tokens, found):
+    prev, after_heading = None, False
+    for token in tokens:
+        heading = _heading(token)
+        if after_heading and not _blank(token) and not heading:
+            found["heading_spacing"] += 1
+            prev = ""
+            yield prev
+        if heading and prev is not None and not _blank(prev):
+            found["heading_spacing"] += 1
+            yield ""
+        after_heading = heading
+        prev = token
+        yield token
+
+
+def demote_extra_h1(tokens, found):
+    seen_content = False
+    for token in tokens:
+        if isinstance(token, str) and token.startswith("# ") and seen_content:
+            found["demote_extra_h1"] += 1
+            token = "#" + token
+        if not _blank(token):
+            seen_content = True
+        yield token
+
+
+RULES = [fence_language, fence_spacing, heading_spacing, demote_extra_h1]
+
+
+def format_lines(lines, found=None, rules=RULES):
+    """Formatted lines for an iterable of lines, lazily."""
+    found = Counter() if found is None else found
+    tokens = tokenize(lines)
+    for rule in rules:
+        tokens = rule(tokens, found)
+    return render(tokens)
+
+
+def format_text(text, rules=RULES):
+    lines = list(format_lines(text.splitlines(), rules=rules))
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+# ============================================================
+# FILES
+# ============================================================
+
+def _sha(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _sha_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def rules_version():
+    """Hash of this script: editing a rule re-checks every file."""
+    with open(os.path.abspath(__file__), "rb") as f:
+        return _sha(f.read())[:16]
+
+
+def _unified_diff(path):
+    """Only called for files that need changes; holds both versions."""
+    rel = os.path.relpath(path)
+    before = [line + "\n" for line in read_lines(path)]
+    after = [line + "\n" for line in format_lines(read_lines(path))]
+    return "".join(difflib.unified_diff(before, after, f"a/{rel}", f"b/{rel}"))
+
+
+def _start_fix(path, matched):
+    """Temp file beside `path` holding its first `matched` lines, which the
+    output has been identical to so far."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".md_format-", suffix=".tmp")
+    out = os.fdopen(fd, "w", encoding="utf-8", newline="")
+    with open(path, encoding="utf-8", newline="") as head:
+        for _ in range(matched):
+            out.write(head.readline())
+    return tmp, out
+
+
+def format_file(path, write=True, diff=False):
+    """Stream one file through the rules, comparing against the original as
+    it goes. A fix is written to a temp file beside it (started at the first
+    difference, so clean files are never written) and renamed over it.
+
+    Returns (path, changed, found, stamp, diff): stamp is (size, mtime_ns,
+    sha256) of the file if it is now clean, else None."""
+    found = Counter()
+    digest = hashlib.sha256()
+    matched, tmp, out = 0, None, None
+    changed = False
+    try:
+        with open(path, encoding="utf-8", newline="") as original:
+            for line in format_lines(read_lines(path), found):
+                line += "\n"
+                digest.update(line.encode("utf-8"))
+                if not changed:
+                    if original.readline() == line:
+                        matched += 1
+                        continue
+                    changed = True
+                    if write:
+                        tmp, out = _start_fix(path, matched)
+                if out is not None:
+                    out.write(line)
+            if not changed and original.readline():
+                changed = True      # only trailing blank lines were dropped
+                if write:
+                    tmp, out = _start_fix(path, matched)
+        if out is not None:
+            out.close()
+            shutil.copymode(path, tmp)
+            os.replace(tmp, path)
+            tmp = None
+    finally:
+        if out is not None and not out.closed:
+            out.close()
+        if tmp is not None:
+            os.unlink(tmp)
+
+    if changed and not write:
+        return path, True, dict(found), None, _unified_diff(path) if diff else None
+    st = os.stat(path)
+    return path, changed, dict(found), (st.st_size, st.st_mtime_ns, digest.hexdigest()), None
+
+
+def find_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(os.path.abspath(path))
+            continue
+        # A directory given on its own is walked; the repo root only at top level
+        top_only = os.path.abspath(path) == ROOT
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [] if top_only else sorted(d for d in dirnames if d not in SKIP_DIRS)
+            files.extend(os.path.join(dirpath, n) for n in sorted(filenames) if n.endswith(".md"))
+    return list(dict.fromkeys(os.path.abspath(f) for f in files))
+
+
+class Cache:
+    """path -> [size, mtime_ns, sha256] of files known to be clean."""
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self.entries = {}
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("version") == version:
+                self.entries = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def is_clean(self, path):
+        entry = self.entries.get(path)
+        if not entry:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if [st.st_size, st.st_mtime_ns] == entry[:2]:
+            return True
+        # Touched but maybe not edited (git checkout, copy): compare content
+        if _sha_file(path) == entry[2]:
+            self.entries[path] = [st.st_size, st.st_mtime_ns, entry[2]]
+            return True
+        return False
+
+    def mark_clean(self, path, stamp):
+        self.entries[path] = list(stamp)
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"version": self.version, "files": self.entries}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not save cache: {e}")
+
+
+def run(paths, jobs=None, cache_path=CACHE_PATH, write=True, diff=False):
+    """Format (or with write=False, check) every markdown file under `paths`.
+    Returns (checked, [(path, found, diff), ...] for files that changed or
+    need changes, skipped)."""
+    files = find_files(paths)
+    cache = Cache(cache_path, rules_version()) if cache_path else None
+    todo = [f for f in files if not (cache and cache.is_clean(f))]
+    jobs = jobs or os.cpu_count() or 1
+    work = partial(format_file, write=write, diff=diff)
+    if jobs > 1 and len(todo) >= POOL_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(work, todo, chunksize=max(1, len(todo) // (jobs * 4))))
+    else:
+        results = [work(f) for f in todo]
+    changed = []
+    for path, was_changed, found, stamp, patch in results:
+        if was_changed:
+            changed.append((path, found, patch))
+        if cache and stamp:
+            cache.mark_clean(path, stamp)
+    if cache:
+        cache.save()
+    return len(todo), changed, len(files) - len(todo)
+
+
+def _describe(found):
+    if not found:
+        return "line endings / trailing blank lines"
+    return ", ".join(f"{rule} x{count}" for rule, count in sorted(found.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize markdown spacing, fences and headings")
+    parser.add_argument("paths", nargs="*", help="files or directories (default: docs/ and top-level *.md)")
+    parser.add_argument("--check", action="store_true", help="report files that need changes, exit 1, write nothing")
+    parser.add_argument("--diff", action="store_true", help="print the changes as a unified diff (implies --check)")
+    parser.add_argument("--jobs", "-j", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="re-check every file")
+    args = parser.parse_args()
+    check = args.check or args.diff
+
+    start = time.perf_counter()
+    try:
+        checked, changed, skipped = run(args.paths or DEFAULT_PATHS, jobs=args.jobs,
+                                        cache_path=None if args.no_cache else CACHE_PATH,
+                                        write=not check, diff=args.diff)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+    for path, found, patch in changed:
+        if patch:
+            sys.stdout.write(patch)
+        elif check:
+            print(f"❌ {os.path.relpath(path)}: {_describe(found)}")
+        else:
+            print(f"✏️  {os.path.relpath(path)}: {_describe(found)}")
+    if check:
+        status = f"❌ {len(changed)} file(s) need formatting" if changed else "✅ All files formatted"
+        print(f"{status} ({checked} checked, {skipped} unchanged (cached) in {elapsed:.2f}s)",
+              file=sys.stderr if args.diff else sys.stdout)
+        sys.exit(1 if changed else 0)
+    print(f"✅ {checked} checked, {len(changed)} reformatted, {skipped} unchanged (cached) in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,9 +11,11 @@ CREATE TABLE IF NOT EXISTS public.system_config (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now())
 );
 
--- 2. Insert the initial placeholder row
+-- 2. Insert the initial placeholder rows
+-- (frontend_url is published by tunnel_supervisor.py when the frontend is tunnelled too)
 INSERT INTO public.system_config (key, value)
-VALUES ('backend_url', 'https://waiting-for-tunnel.com')
+VALUES ('backend_url', 'https://waiting-for-tunnel.com'),
+       ('frontend_url', 'https://waiting-for-tunnel.com')
 ON CONFLICT (key) DO NOTHING;
 
 -- 3. Enable Row Level Security (RLS)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Tunnel Health Prober
+
+A live tunnel process does not mean a working public URL. The prober calls
+GET /api/health through the public URL and, at the same moment, against the
+backend on localhost. The difference is the tunnel's own overhead, and a
+local failure means the backend (not the tunnel) is down.
+
+Rolling percentiles of the public probe are checked against an SLO; a
+breach asks the tunnel manager to restart the tunnel (or fail over to the
+standby). A service without /api/health (the static frontend) can be
+probed on another path. Every probe is exported through votechain_metrics,
+with any extra labels given (the supervisor adds service=...):
+
+    tunnel_probe_s{target=public|local}        latency window (p50/p95/p99)
+    tunnel_probe_failures_total{target=...}    timeouts, errors, non-200s
+    tunnel_overhead_s                          public minus local latency
+    tunnel_slo_breaches_total{kind=latency|failures}
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from votechain_http import HTTPClient
+from votechain_metrics import metrics, percentile
+
+PROBE_PATH = "/api/health"
+
+
+class HealthProber:
+    def __init__(self, get_url, local_url="http://127.0.0.1:3000", on_breach=None,
+                 interval=5.0, timeout=5.0, window=20, min_samples=5,
+                 slo_p95=2.0, max_failures=3, warmup=15.0, path=PROBE_PATH, labels=None):
+        self.get_url = get_url              # () -> current public URL or None
+        self.local_url = local_url
+        self.path = path
+        self.labels = labels or {}
+        self.on_breach = on_breach          # async (reason) -> None
+        self.interval = interval
+        self.timeout = timeout
+        self.window = window
+        self.min_samples = min_samples
+        self.slo_p95 = slo_p95
+        self.max_failures = max_failures
+        self.warmup = warmup
+
+        self._url = None
+        self._public = None
+        self._local = HTTPClient(local_url, max_idle=1)
+        self._samples = deque(maxlen=window)
+        self._failures = 0
+        self._since = 0.0
+
+    def _switch(self, url):
+        """New tunnel URL: fresh connection and a fresh window."""
+        if self._public:
+            self._public.close()
+        self._url = url
+        self._public = HTTPClient(url, max_idle=1) if url else None
+        self._samples.clear()
+        self._failures = 0
+        self._since = time.monotonic()
+
+    async def _probe(self, client):
+        start = time.perf_counter()
+        try:
+            resp = await client.get(self.path, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            return None, "timeout"
+        except (OSError, ConnectionError) as e:
+            return None, type(e).__name__
+        if resp.status != 200:
+            return None, f"HTTP {resp.status}"
+        return time.perf_counter() - start, None
+
+    async def probe_once(self):
+        """Probe public and local in parallel. Returns a result dict."""
+        url = self.get_url()
+        if url != self._url:
+            self._switch(url)
+        if not self._public:
+            return None
+        (public_s, public_err), (local_s, local_err) = await asyncio.gather(
+            self._probe(self._public), self._probe(self._local))
+
+        for target, seconds, err in (("public", public_s, public_err), ("local", local_s, local_err)):
+            if err:
+                metrics.inc("tunnel_probe_failures", target=target, error=err, **self.labels)
+            else:
+                metrics.observe("tunnel_probe_s", seconds, target=target, **self.labels)
+        if public_s is not None and local_s is not None:
+            metrics.observe("tunnel_overhead_s", max(0.0, public_s - local_s), **self.labels)
+
+        if local_err:
+            # Backend itself is down: restarting the tunnel would not help
+            return {"public": public_s, "local": None, "error": f"local {local_err}"}
+        self._samples.append(public_s)
+        self._failures = self._failures + 1 if public_err else 0
+        return {"public": public_s, "local": local_s, "error": public_err}
+
+    def stats(self):
+        ok = sorted(s for s in self._samples if s is not None)
+        return {
+            "url": self._url,
+            "samples": len(self._samples),
+            "failures_in_window": sum(1 for s in self._samples if s is None),
+            "p50": percentile(ok, 50),
+            "p95": percentile(ok, 95),
+            "p99": percentile(ok, 99),
+        }
+
+    def check_slo(self):
+        """Return a breach reason, or None while healthy or warming up."""
+        if time.monotonic() - self._since < self.warmup:
+            return None
+        if self._failures >= self.max_failures:
+            return f"{self._failures} consecutive public probe failures"
+        if len(self._samples) < self.min_samples:
+            return None
+        failed = sum(1 for s in self._samples if s is None)
+        # Failed probes count as infinitely slow for the percentile
+        ranked = sorted(s if s is not None else float("inf") for s in self._samples)
+        p95 = percentile(ranked, 95)
+        if p95 > self.slo_p95:
+            shown = "timeout" if p95 == float("inf") else f"{p95:.2f}s"
+            return f"public p95 {shown} > SLO {self.slo_p95:.2f}s ({failed}/{len(self._samples)} failed)"
+        return None
+
+    async def run(self, stop_event):
+        while not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                result = await self.probe_once()
+            except Exception as e:
+                print(f"⚠️ Health probe error: {e}")
+                result = None
+            if result is not None:
+                reason = self.check_slo()
+                if reason:
+                    service = f" ({self.labels['service']})" if "service" in self.labels else ""
+                    print(f"\n🩺 Tunnel SLO breach{service}: {reason}")
+                    metrics.inc("tunnel_slo_breaches", kind="latency" if "p95" in reason else "failures",
+                                **self.labels)
+                    # Judge the replacement on its own samples
+                    self._switch(None)
+                    if self.on_breach:
+                        await self.on_breach(reason)
+            try:
+                await asyncio.wait_for(stop_event.wait(),
+                                       max(0.0, self.interval - (time.monotonic() - started)))
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self):
+        if self._public:
+            self._public.close()
+        self._local.close()
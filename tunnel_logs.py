@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Tunnel Log Processing
+
+cloudflared logs a line for every connection attempt, retry and edge
+handshake; under systemd, echoing all of them floods the journal and hides
+the few that matter. TunnelLog turns the raw output into events:
+
+    url           public URL printed (first one only)
+    connected     edge connection registered (connIndex, location)
+    edge_change   a connection came back at a different edge location
+    reconnect     cloudflared/localtunnel retrying a connection
+    disconnected  connection terminated / unregistered
+    error         ERR lines, "Error: ..." lines
+    warning       WRN lines
+    info          everything else (kept in the ring buffer only)
+
+Every event is counted (tunnel_log_events{provider,kind}); only notable
+ones are printed, and repeats of the same error are folded. The last
+RING_SIZE raw lines are kept for a crash dump.
+
+The per-line work is a few substring checks; a regex only runs on lines
+that already matched (and on every line until the URL is found).
+"""
+
+import os
+import re
+import time
+from collections import deque
+
+from votechain_metrics import metrics
+
+RING_SIZE = 300
+REPEAT_WINDOW = 60.0     # seconds during which an identical message is folded
+CRASH_DIR = os.getenv("TUNNEL_CRASH_DIR", "/tmp/votechain-tunnel")
+
+LEVELS = ("INF", "WRN", "ERR", "DBG")
+_CONN_INDEX = re.compile(r"connIndex=(\d+)")
+_LOCATION = re.compile(r"location=(\S+)")
+_ERROR_TEXT = re.compile(r'error="([^"]*)"')
+
+ICONS = {"url": "🌐", "connected": "🔌", "edge_change": "🔀", "reconnect": "🔄",
+         "disconnected": "⚠️", "error": "❌", "warning": "⚠️"}
+
+
+def _fold_key(text):
+    """Identical apart from numbers/addresses counts as a repeat."""
+    return re.sub(r"[0-9a-f]{6,}|\d+", "N", text)[:120]
+
+
+class TunnelLog:
+    def __init__(self, provider, role="active", ring_size=RING_SIZE, verbose=False, prefix="[TUNNEL]",
+                 labels=None):
+        self.provider = provider
+        self.labels = dict(labels or {}, provider=provider.name)
+        self.role = role
+        self.verbose = verbose
+        self.prefix = prefix
+        self.ring = deque(maxlen=ring_size)
+        self.started = time.monotonic()
+        self.url = None
+        self.locations = {}         # connIndex -> edge location
+        self.counts = {}
+        self._last_printed = {}     # fold key -> (monotonic time, suppressed count)
+
+    def feed(self, line):
+        """Classify one raw line. Returns (kind, detail)."""
+        self.ring.append((time.time(), line))
+        kind, detail = self.classify(line)
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        metrics.inc("tunnel_log_events", kind=kind, **self.labels)
+        if self.verbose:
+            print(f"{self.prefix} {line}")
+        elif kind != "info":
+            self._print(kind, detail)
+        return kind, detail
+
+    def classify(self, line):
+        if self.url is None:
+            url = self.provider.match_url(line)
+            if url:
+                self.url = url
+                metrics.observe("tunnel_url_s", time.monotonic() - self.started, **self.labels)
+                return "url", url
+        if "Registered tunnel connection" in line:
+            return self._connected(line)
+        if "Retrying connection" in line or "reconnect" in line.lower():
+            return "reconnect", self._short(line)
+        if ("Connection terminated" in line or "Unregistered tunnel connection" in line
+                or "tunnel server offline" in line):
+            return "disconnected", self._short(line)
+        if " ERR " in line or line.startswith(("ERR ", "Error", "error")):
+            return "error", self._short(line)
+        if " WRN " in line or line.startswith("WRN "):
+            return "warning", self._short(line)
+        return "info", line
+
+    def _connected(self, line):
+        conn = _CONN_INDEX.search(line)
+        loc = _LOCATION.search(line)
+        conn = conn.group(1) if conn else "?"
+        loc = loc.group(1) if loc else "?"
+        previous = self.locations.get(conn)
+        self.locations[conn] = loc
+        metrics.set("tunnel_edge_connections", len(self.locations), **self.labels)
+        if previous and previous != loc:
+            metrics.inc("tunnel_edge_changes", **self.labels)
+            return "edge_change", f"conn {conn}: {previous} -> {loc}"
+        return "connected", f"conn {conn} @ {loc}"
+
+    @staticmethod
+    def _short(line):
+        """Drop cloudflared's timestamp/level; prefer its error="..." text."""
+        err = _ERROR_TEXT.search(line)
+        parts = line.split(" ", 2)
+        if len(parts) == 3 and parts[1] in LEVELS:
+            text = parts[2]             # "<timestamp> ERR message"
+        elif len(parts) > 1 and parts[0] in LEVELS:
+            text = line.split(" ", 1)[1]
+        else:
+            text = line
+        if err:
+            text = f"{text.split(' error=', 1)[0]}: {err.group(1)}"
+        return text[:200]
+
+    def _print(self, kind, detail):
+        if kind in ("error", "warning", "reconnect", "disconnected"):
+            key = _fold_key(f"{kind} {detail}")
+            now = time.monotonic()
+            last, suppressed = self._last_printed.get(key, (None, 0))
+            if last is not None and now - last < REPEAT_WINDOW:
+                self._last_printed[key] = (last, suppressed + 1)
+                return
+            if suppressed:
+                detail = f"{detail} (+{suppressed} more like this)"
+            self._last_printed[key] = (now, 0)
+        print(f"{self.prefix} {ICONS.get(kind, '')} {kind}: {detail}")
+
+    def tail(self, n=10):
+        return [line for _, line in list(self.ring)[-n:]]
+
+    def dump(self, reason, directory=CRASH_DIR):
+        """Write the ring buffer to a file for post-mortems. Returns the path."""
+        try:
+            os.makedirs(directory, exist_ok=True)
+            service = f"{self.labels['service']}-" if "service" in self.labels else ""
+            path = os.path.join(directory, f"{service}{self.provider.name}-{self.role}-"
+                                           f"{time.strftime('%Y%m%d-%H%M%S')}.log")
+            with open(path, "w") as f:
+                f.write(f"# {reason}\n# events: {self.counts}\n")
+                for ts, line in self.ring:
+                    f.write(f"{time.strftime('%H:%M:%S', time.localtime(ts))} {line}\n")
+            return path
+        except OSError as e:
+            print(f"⚠️ Could not write tunnel crash log: {e}")
+            return None
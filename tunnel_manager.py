@@ -0,0 +1,758 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Tunnel Manager with Service Discovery
+
+One asyncio manager for every tunnel provider:
+1. Starts the tunnel process (cloudflared, localtunnel or a local fake)
+2. Reads its output as it arrives and picks out the public URL
+3. Publishes the URL to Supabase system_config (key backend_url)
+4. Restarts the tunnel the moment the process exits
+
+URL discovery and crash detection are event-driven (awaiting the process'
+output stream and exit), not polled. Tunnel output is classified by
+tunnel_logs.TunnelLog: only notable events are printed, and the last few
+hundred raw lines are dumped to a file when a tunnel dies. With --standby a second tunnel is kept
+warm, and a crash of the active tunnel only costs one system_config write.
+
+Usage:
+    python3 tunnel_manager.py --provider cloudflared
+    python3 tunnel_manager.py --provider localtunnel
+    python3 tunnel_manager.py --provider fake --writer none   # offline test
+    python3 tunnel_manager.py --provider cloudflared --standby localtunnel
+    python3 tunnel_manager.py --standby --probe --metrics /tmp/votechain-tunnel.prom
+
+Requirements:
+    - cloudflared binary (cloudflared) or npx (localtunnel)
+    - Nothing extra for the default writer (plain PostgREST over HTTPS);
+      supabase-py only for the legacy --writer supabase
+    - Backend running on localhost:3000
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import signal
+import sys
+import time
+
+from tunnel_health import HealthProber
+from tunnel_logs import TunnelLog
+from votechain_config import ENV_PATH, ConfigError, config
+from votechain_metrics import metrics
+from votechain_postgrest import PostgrestClient, PostgrestError
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BACKEND_PORT = 3000
+URL_TIMEOUT = 30        # seconds to wait for a tunnel URL
+RESTART_DELAY = 5       # seconds between a crash and the restart
+MAX_RETRIES = 3         # consecutive failed starts before giving up
+PUBLISH_RETRIES = 3     # writes of a failover URL before it counts as failed
+PUBLISH_RETRY_DELAY = 0.5   # seconds, doubled per attempt
+PLACEHOLDER_URL = "https://waiting-for-tunnel.com"  # seeded by supabase-setup.sql
+
+# votechain_config settings a running manager picks up on reload
+LIVE_SETTINGS = {"tunnel_restart_delay": "restart_delay", "tunnel_url_timeout": "url_timeout",
+                 "tunnel_max_retries": "max_retries"}
+LIVE_PROBE_SETTINGS = {"tunnel_probe_interval": "interval", "tunnel_slo_p95": "slo_p95",
+                       "tunnel_max_probe_failures": "max_failures"}
+
+
+# ============================================================
+# PROVIDERS
+# ============================================================
+
+class TunnelProvider:
+    """How to start one kind of tunnel and recognise its public URL."""
+    name = "base"
+    url_pattern = None
+
+    def command(self, port):
+        raise NotImplementedError
+
+    def match_url(self, line):
+        match = self.url_pattern.search(line)
+        return match.group(1) if match else None
+
+    def install_hint(self):
+        return ""
+
+
+class CloudflaredProvider(TunnelProvider):
+    name = "cloudflared"
+    # trycloudflare.com URLs (exclude api.trycloudflare.com)
+    url_pattern = re.compile(r'(https://(?!api\.)[a-zA-Z0-9-]+\.trycloudflare\.com)')
+
+    def command(self, port):
+        return ["cloudflared", "tunnel", "--url", f"http://localhost:{port}"]
+
+    def install_hint(self):
+        return "Install: https://developers.cloudflare.com/cloudflare-one/connections/connect-apps/install-and-setup/installation/"
+
+
+class LocaltunnelProvider(TunnelProvider):
+    name = "localtunnel"
+    # Output format: "your url is: https://..."
+    url_pattern = re.compile(r'your url is: (https://[a-zA-Z0-9-]+\.loca\.lt)')
+
+    def command(self, port):
+        return ["npx", "localtunnel", "--port", str(port)]
+
+    def install_hint(self):
+        return "Install Node.js/npx: sudo apt install nodejs npm"
+
+
+class FakeProvider(TunnelProvider):
+    """scripts/fake_tunnel.py: a local port forwarder for offline tests."""
+    name = "fake"
+    url_pattern = re.compile(r'your url is: (http://127\.0\.0\.1:\d+)')
+
+    def __init__(self, *extra_args):
+        self.extra_args = list(extra_args)
+
+    def command(self, port):
+        return [sys.executable, os.path.join(SCRIPT_DIR, "scripts", "fake_tunnel.py"),
+                "--port", str(port)] + self.extra_args
+
+
+PROVIDERS = {
+    "cloudflared": CloudflaredProvider,
+    "localtunnel": LocaltunnelProvider,
+    "fake": FakeProvider,
+}
+
+
+# ============================================================
+# DISCOVERY WRITERS
+# ============================================================
+
+class DiscoveryWriter:
+    """Where the live backend URL is published."""
+
+    async def publish(self, url):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class NullWriter(DiscoveryWriter):
+    """Only logs the URL (offline tests)."""
+
+    def __init__(self, config_key="backend_url"):
+        self.config_key = config_key
+
+    async def publish(self, url):
+        print(f"💾 (not published) {self.config_key} = {url}")
+        return True
+
+
+class SupabaseWriter(DiscoveryWriter):
+    """Updates system_config.backend_url with supabase-py (blocking calls
+    run in a worker thread so the tunnel's output keeps being read)."""
+
+    def __init__(self, url, key):
+        try:
+            from supabase import create_client
+        except ImportError:
+            print("❌ ERROR: supabase library not installed")
+            print("   Run: pip3 install supabase --break-system-packages")
+            sys.exit(1)
+        self.client = create_client(url, key)
+        print("✅ Supabase client initialized")
+
+    def _update(self, url):
+        return self.client.table('system_config')\
+            .update({'value': url})\
+            .eq('key', 'backend_url')\
+            .execute()
+
+    async def publish(self, url):
+        print(f"💾 Updating Supabase with: {url}")
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(None, self._update, url)
+            print("✅ Database sync complete!")
+            print(f"   Updated at: {response.data[0]['updated_at'] if response.data else 'now'}")
+            return True
+        except Exception as e:
+            print(f"❌ Database update failed: {e}")
+            return False
+
+
+class PostgrestWriter(DiscoveryWriter):
+    """Updates system_config.backend_url through votechain_postgrest: no
+    supabase-py import, one keep-alive connection, retries with backoff.
+
+    A URL that is already published is not written again, and URLs that
+    arrive while a write is in flight are coalesced: only the newest one is
+    written once the current write returns.
+
+    With an `instance` name (several backends behind their own tunnels) the
+    URL is also upserted as backend_url.<instance>, which kiosks balance
+    across; on shutdown that row is reset to the placeholder.
+
+    `config_key` selects the row (frontend_url for the frontend's tunnel);
+    a key other than backend_url is created on its first write. A `client`
+    passed in is shared (tunnel_supervisor.py) and not closed here."""
+
+    def __init__(self, url, key, client=None, instance=None, config_key="backend_url"):
+        self.client = client or PostgrestClient(url, key)
+        self._owns_client = client is None
+        self.config_key = config_key
+        self.instance_key = f"{config_key}.{instance}" if instance else None
+        self.published = None
+        self._pending = None
+        self._lock = asyncio.Lock()
+        self._last_ok = True
+        print("✅ PostgREST writer ready")
+
+    async def publish(self, url):
+        self._pending = url
+        async with self._lock:
+            if self._pending is None:
+                # A newer URL was written while we waited for the lock
+                metrics.inc("discovery_writes_coalesced")
+                return self._last_ok
+            url, self._pending = self._pending, None
+            if url == self.published:
+                metrics.inc("discovery_writes_skipped")
+                print(f"💾 {self.config_key} already {url}, skipping write")
+                return True
+            print(f"💾 Updating Supabase with: {url}")
+            try:
+                with metrics.timer("discovery_write_s", key=self.config_key):
+                    if self.instance_key:
+                        await self.client.upsert("system_config", {"key": self.instance_key, "value": url})
+                    rows = await self.client.update("system_config", {"value": url},
+                                                    key=f"eq.{self.config_key}")
+                    if not rows and self.config_key != "backend_url":
+                        rows = await self.client.upsert("system_config", {"key": self.config_key, "value": url})
+            except PostgrestError as e:
+                print(f"❌ Database update failed: {e}")
+                self._last_ok = False
+                return False
+            if not rows:
+                print(f"❌ Database update failed: no system_config row with key {self.config_key}")
+                self._last_ok = False
+                return False
+            self.published = url
+            self._last_ok = True
+            print("✅ Database sync complete!")
+            print(f"   Updated at: {rows[0].get('updated_at', 'now')}")
+            return True
+
+    async def close(self):
+        if self.instance_key and self.published:
+            # Kiosks stop sending traffic here; no retries while shutting down
+            self.client.retries = 0
+            try:
+                await self.client.upsert("system_config", {"key": self.instance_key, "value": PLACEHOLDER_URL})
+                print(f"💾 {self.instance_key} retired")
+            except PostgrestError as e:
+                print(f"⚠️ Could not retire {self.instance_key}: {e}")
+        if self._owns_client:
+            self.client.close()
+
+
+def _supabase_credentials():
+    url = config.supabase_url
+    key = config.supabase_key  # Service role key from .env
+    if not url or not key:
+        print("❌ ERROR: Missing Supabase credentials")
+        print(f"   Checked: {ENV_PATH}")
+        print("   Required: SUPABASE_URL and SUPABASE_KEY")
+        sys.exit(1)
+    return url, key
+
+
+def supabase_writer_from_env():
+    return SupabaseWriter(*_supabase_credentials())
+
+
+def postgrest_writer_from_env(instance=None, config_key="backend_url"):
+    return PostgrestWriter(*_supabase_credentials(), instance=instance, config_key=config_key)
+
+
+# ============================================================
+# TUNNEL PROCESS
+# ============================================================
+
+class Tunnel:
+    """One running tunnel process and the tasks reading its output."""
+
+    def __init__(self, provider, port, log_prefix="[TUNNEL]", role="active", verbose=False, labels=None):
+        self.provider = provider
+        self.port = port
+        self.log = TunnelLog(provider, role=role, verbose=verbose, prefix=log_prefix, labels=labels)
+        self.process = None
+        self.url = None
+        self.started_at = None
+        self.url_at = None
+        self._url_found = None
+        self._reader = None
+        self.exited = None
+
+    async def start(self):
+        self.started_at = time.monotonic()
+        self._url_found = asyncio.get_running_loop().create_future()
+        self.process = await asyncio.create_subprocess_exec(
+            *self.provider.command(self.port),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            start_new_session=True,
+        )
+        self._reader = asyncio.create_task(self._read_output())
+        # Resolves the moment the process exits
+        self.exited = asyncio.ensure_future(self.process.wait())
+        return self
+
+    async def _read_output(self):
+        async for raw in self.process.stdout:
+            line = raw.decode(errors="replace").strip()
+            if not line:
+                continue
+            kind, detail = self.log.feed(line)
+            if kind == "url" and self.url is None:
+                self.url = detail
+                self.url_at = time.monotonic()
+                if not self._url_found.done():
+                    self._url_found.set_result(detail)
+        # Output closed: the process is exiting
+        if not self._url_found.done():
+            self._url_found.set_result(None)
+
+    def promote(self, log_prefix="[TUNNEL]"):
+        """The standby became the active tunnel."""
+        self.log.role = "active"
+        self.log.prefix = log_prefix
+
+    def dump_log(self, reason):
+        """Save the recent raw output and show its tail."""
+        path = self.log.dump(reason)
+        print(f"   Last lines from {self.provider.name}:")
+        for line in self.log.tail(5):
+            print(f"   | {line}")
+        if path:
+            print(f"   Full log: {path}")
+
+    async def wait_url(self, timeout=URL_TIMEOUT):
+        """Return the public URL, or None if the process exits or times out."""
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._url_found), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def wait_exit(self):
+        return await asyncio.shield(self.exited)
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def stop(self):
+        if self.alive:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self._reader:
+            self._reader.cancel()
+
+
+# ============================================================
+# MANAGER
+# ============================================================
+
+class TunnelManager:
+    """Keeps a tunnel up and its URL published.
+
+    With a standby provider, a second tunnel is kept warm at all times: when
+    the active one dies the published URL is swapped to the standby at once
+    and a new standby is built in the background.
+
+    `name` tells services apart when several managers share one process
+    (tunnel_supervisor.py): it prefixes their log lines and labels their
+    metrics with service=<name>.
+    """
+
+    def __init__(self, provider, writer, port=BACKEND_PORT, restart_delay=RESTART_DELAY,
+                 max_retries=MAX_RETRIES, standby_provider=None, probe=None, verbose_logs=False,
+                 url_timeout=URL_TIMEOUT, name=None):
+        self.name = name
+        self.labels = {"service": name} if name else {}
+        self.title = f"Tunnel ({name})" if name else "Tunnel"
+        self.provider = provider
+        self.writer = writer
+        self.port = port
+        self.restart_delay = restart_delay
+        self.max_retries = max_retries
+        self.url_timeout = url_timeout
+        self.standby_provider = standby_provider
+        self.verbose_logs = verbose_logs    # echo every raw tunnel line
+        self.tunnel = None
+        self.standby = None
+        self.published_url = None
+        self.failovers = []
+        self._standby_task = None
+        self._stop = asyncio.Event()
+        self._replace = asyncio.Event()
+        self.replace_reason = None
+        # End-to-end /api/health probing (dict of HealthProber options)
+        self.prober = None
+        if probe is not None:
+            self.prober = HealthProber(lambda: self.published_url, local_url=f"http://127.0.0.1:{port}",
+                                       on_breach=self.request_replacement, labels=self.labels, **probe)
+        self._prober_task = None
+        # Settings given explicitly (CLI, tunnels.json) that a reload must not override
+        self.pinned_settings = set()
+
+    def apply_config(self, changed):
+        """Take reloaded tunnel settings (votechain_config) without a restart;
+        used from the next restart, URL wait or probe on."""
+        for name, (_, value) in changed.items():
+            if name in self.pinned_settings:
+                continue
+            if name in LIVE_SETTINGS:
+                setattr(self, LIVE_SETTINGS[name], value)
+            elif name in LIVE_PROBE_SETTINGS and self.prober:
+                setattr(self.prober, LIVE_PROBE_SETTINGS[name], value)
+
+    def stop(self):
+        self._stop.set()
+
+    def log_prefix(self, role="active"):
+        if self.name:
+            return f"[{self.name.upper()}]" if role == "active" else f"[{self.name.upper()} {role.upper()}]"
+        return "[TUNNEL]" if role == "active" else f"[{role.upper()}]"
+
+    async def request_replacement(self, reason):
+        """Replace the active tunnel although its process is alive
+        (called by the health prober on an SLO breach)."""
+        self.replace_reason = reason
+        self._replace.set()
+
+    async def start_tunnel(self, provider=None, role="active"):
+        """Start a tunnel and wait for its URL. Returns the Tunnel or None."""
+        provider = provider or self.provider
+        label = f"{self.name} " if self.name else ""
+        label += "" if role == "active" else f"{role} "
+        print(f"🚀 Starting {label}{provider.name} tunnel for http://localhost:{self.port}")
+        if role == "active":
+            print(f"   (Make sure {self.name or 'backend'} is running on port {self.port})")
+        try:
+            tunnel = await Tunnel(provider, self.port, role=role, verbose=self.verbose_logs,
+                                  log_prefix=self.log_prefix(role), labels=self.labels).start()
+        except FileNotFoundError:
+            print(f"❌ ERROR: {provider.command(self.port)[0]} not found")
+            hint = provider.install_hint()
+            if hint:
+                print(f"   {hint}")
+            return None
+
+        print(f"⏳ Waiting for {label}{provider.name} tunnel URL...")
+        try:
+            url = await tunnel.wait_url(self.url_timeout)
+        except asyncio.CancelledError:
+            # Stopped (or the standby build was abandoned): no orphan process
+            await tunnel.stop()
+            raise
+        if not url:
+            if tunnel.alive:
+                print(f"❌ Timeout: No URL found in {self.url_timeout} seconds")
+            else:
+                print(f"❌ Tunnel process exited with code: {tunnel.process.returncode}")
+            tunnel.dump_log("no URL")
+            metrics.inc("tunnel_start_failures", provider=provider.name, **self.labels)
+            await tunnel.stop()
+            return None
+
+        print(f"\n✅ {label.upper()}TUNNEL URL FOUND: {url} ({tunnel.url_at - tunnel.started_at:.1f}s)")
+        return tunnel
+
+    async def start_with_retries(self, provider=None, role="active"):
+        """start_tunnel() until it works, giving up after max_retries
+        consecutive failures (or on stop). Returns the Tunnel or None."""
+        for attempt in range(1, self.max_retries + 1):
+            finished, tunnel = await self._wait_stop_or(self.start_tunnel(provider, role))
+            if not finished or tunnel:
+                return tunnel
+            if attempt == self.max_retries:
+                break
+            print(f"⚠️ Retrying in {self.restart_delay * 2} seconds... (Attempt {attempt}/{self.max_retries})")
+            await self._sleep(self.restart_delay * 2)
+            if self._stop.is_set():
+                return None
+        print(f"❌ Failed after {self.max_retries} attempts. Giving up.")
+        return None
+
+    async def publish(self, url):
+        if not await self.writer.publish(url):
+            print("⚠️ Warning: Failed to update database, but tunnel is active")
+            return False
+        self.published_url = url
+        return True
+
+    async def publish_with_retries(self, url):
+        """publish() up to PUBLISH_RETRIES times. Returns True once written."""
+        for attempt in range(PUBLISH_RETRIES):
+            if await self.publish(url):
+                return True
+            if attempt + 1 < PUBLISH_RETRIES and not self._stop.is_set():
+                await self._sleep(PUBLISH_RETRY_DELAY * 2 ** attempt)
+        return False
+
+    async def _wait_stop_or(self, coro):
+        """Run `coro` until it finishes or stop() is called. Returns
+        (finished, result)."""
+        task = asyncio.ensure_future(coro)
+        stopper = asyncio.ensure_future(self._stop.wait())
+        done, _ = await asyncio.wait({task, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        stopper.cancel()
+        if task in done:
+            return True, task.result()
+        task.cancel()
+        return False, None
+
+    async def _sleep(self, seconds):
+        try:
+            await asyncio.wait_for(self._stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    # --- Standby ---
+
+    def ensure_standby(self):
+        """Build a new standby in the background unless one exists."""
+        if not self.standby_provider or self._stop.is_set():
+            return
+        if self.standby or (self._standby_task and not self._standby_task.done()):
+            return
+        self._standby_task = asyncio.create_task(self._build_standby())
+
+    async def _build_standby(self):
+        while not self._stop.is_set():
+            tunnel = await self.start_tunnel(self.standby_provider, role="standby")
+            if tunnel:
+                self.standby = tunnel
+                print(f"🟡 Standby ready: {tunnel.url}")
+                return tunnel
+            await self._sleep(self.restart_delay)
+
+    async def failover(self, dead, detected):
+        """Active tunnel died: publish the standby's URL right away.
+        Returns the new active Tunnel, or None if nothing could take over.
+        Failover time runs from `detected` until the new URL is published;
+        a URL that could not be published is recorded as a failed failover
+        (kiosks are still on the dead URL)."""
+        standby, self.standby = self.standby, None
+        if standby and standby.alive:
+            standby.promote(self.log_prefix())
+            published = await self.publish_with_retries(standby.url)
+            kind = "hot"
+        else:
+            # No warm standby: same as the cold restart path
+            print("⚠️ No standby ready, starting a new tunnel")
+            if self._standby_task and not self._standby_task.done():
+                self._standby_task.cancel()
+            standby = await self.start_with_retries()
+            if standby is None:
+                return None
+            published = await self.publish_with_retries(standby.url)
+            kind = "cold"
+        elapsed = time.monotonic() - detected
+        record = {"at": time.strftime("%Y-%m-%dT%H:%M:%S"), "kind": kind, "from": dead.url,
+                  "to": standby.url, "seconds": round(elapsed, 3), "published": published}
+        self.failovers.append(record)
+        if published:
+            metrics.observe("tunnel_failover_s", elapsed, kind=kind, **self.labels)
+            print(f"⚡ Failover ({kind}) to {standby.url} in {elapsed * 1000:.0f} ms")
+        else:
+            metrics.inc("tunnel_failover_failures", kind=kind, **self.labels)
+            print(f"❌ Failover ({kind}) to {standby.url}: URL not published after {PUBLISH_RETRIES} attempts")
+        return standby
+
+    # --- Main loop ---
+
+    async def run(self):
+        """Main loop with auto-restart (and hot failover with a standby)."""
+        try:
+            self.tunnel = await self.start_with_retries()
+            if self.tunnel is None:
+                return self._stop.is_set()
+            await self.publish(self.tunnel.url)
+            self.ensure_standby()
+            if self.prober:
+                self._prober_task = asyncio.create_task(self.prober.run(self._stop))
+
+            print(f"🔒 {self.title} is active. Monitoring for failures...")
+            print("   Press Ctrl+C to stop")
+            stopper = asyncio.ensure_future(self._stop.wait())
+            replacer = asyncio.ensure_future(self._replace.wait())
+            while not self._stop.is_set():
+                waits = {stopper, replacer, self.tunnel.exited}
+                if self.standby:
+                    waits.add(self.standby.exited)
+                elif self._standby_task and not self._standby_task.done():
+                    waits.add(self._standby_task)
+                await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+                if self._stop.is_set():
+                    break
+
+                if self.standby and self.standby.exited.done():
+                    print(f"\n⚠️ Standby {self.title.lower()} died with exit code: {self.standby.process.returncode}")
+                    self.standby.dump_log(f"standby exited with {self.standby.process.returncode}")
+                    metrics.inc("tunnel_crashes", provider=self.standby.provider.name, role="standby",
+                                **self.labels)
+                    await self.standby.stop()
+                    self.standby = None
+
+                if self.tunnel.exited.done():
+                    # Noticed as soon as the process exits (no polling interval)
+                    dead, detected = self.tunnel, time.monotonic()
+                    print(f"\n⚠️ {self.title} died with exit code: {dead.process.returncode}")
+                    dead.dump_log(f"exited with {dead.process.returncode}")
+                    metrics.inc("tunnel_crashes", provider=dead.provider.name, role="active", **self.labels)
+                    if not self.standby_provider:
+                        await dead.stop()
+                        print(f"🔄 Restarting {self.title.lower()} in {self.restart_delay} seconds...")
+                        await self._sleep(self.restart_delay)
+                        if self._stop.is_set():
+                            break
+                    new = await self.failover(dead, detected)
+                    await dead.stop()
+                    if new is None:
+                        return self._stop.is_set()
+                    self.tunnel = new
+                elif self._replace.is_set():
+                    # Process alive but the public URL is dead or too slow
+                    dead, detected = self.tunnel, time.monotonic()
+                    print(f"🔄 Replacing unhealthy {self.title.lower()}: {self.replace_reason}")
+                    metrics.inc("tunnel_slo_restarts", provider=dead.provider.name, **self.labels)
+                    new = await self.failover(dead, detected)
+                    await dead.stop()
+                    if new is None:
+                        return self._stop.is_set()
+                    self.tunnel = new
+
+                if self._replace.is_set():
+                    self._replace.clear()
+                    replacer = asyncio.ensure_future(self._replace.wait())
+                self.ensure_standby()
+            stopper.cancel()
+            replacer.cancel()
+            return True
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self):
+        if self._standby_task and not self._standby_task.done():
+            self._standby_task.cancel()
+        if self._prober_task:
+            self._prober_task.cancel()
+            self.prober.close()
+        for tunnel in (self.standby, self.tunnel):
+            if tunnel and tunnel.alive:
+                print(f"🔒 Stopping {self.title.lower()}...")
+                await tunnel.stop()
+        if self.failovers:
+            print(f"📊 Failovers{f' ({self.name})' if self.name else ''}:")
+            for f in self.failovers:
+                status = "" if f["published"] else "  NOT PUBLISHED"
+                print(f"   {f['at']}  {f['kind']:<4}  {f['seconds']:.3f}s  {f['from']} -> {f['to']}{status}")
+        await self.writer.close()
+
+
+def build_provider(name, fake_args=""):
+    if name == "fake":
+        return FakeProvider(*fake_args.split())
+    return PROVIDERS[name]()
+
+
+def build_writer(name, instance=None):
+    if name == "none":
+        return NullWriter()
+    if name == "supabase":
+        return supabase_writer_from_env()
+    return postgrest_writer_from_env(instance)
+
+
+def config_kwargs():
+    """TunnelManager timings from votechain_config."""
+    return {"restart_delay": config.tunnel_restart_delay, "max_retries": config.tunnel_max_retries,
+            "url_timeout": config.tunnel_url_timeout}
+
+
+def config_probe(overrides=None):
+    """HealthProber settings from votechain_config, then `overrides`."""
+    probe = {"interval": config.tunnel_probe_interval, "slo_p95": config.tunnel_slo_p95,
+             "max_failures": config.tunnel_max_probe_failures}
+    probe.update(overrides or {})
+    return probe
+
+
+async def _amain(args):
+    config.watch()
+    standby = None
+    if args.standby:
+        standby = build_provider(args.provider if args.standby == "same" else args.standby, args.fake_args)
+    flags = {"tunnel_probe_interval": ("interval", args.probe_interval), "tunnel_slo_p95": ("slo_p95", args.slo_p95),
+             "tunnel_max_probe_failures": ("max_failures", args.max_probe_failures)}
+    given = {name: v for name, v in flags.items() if v[1] is not None}
+    probe = config_probe(dict(given.values())) if args.probe else None
+    if args.metrics:
+        metrics.start_reporter(args.metrics, interval=args.metrics_interval)
+    manager = TunnelManager(build_provider(args.provider, args.fake_args), build_writer(args.writer, args.instance),
+                            port=args.port, standby_provider=standby, probe=probe,
+                            verbose_logs=args.verbose, **config_kwargs())
+    manager.pinned_settings.update(given)
+    config.on_change(manager.apply_config)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: (print("\n\n🛑 Shutdown signal received..."), manager.stop()))
+    return await manager.run()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="VoteChain tunnel manager with service discovery")
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="cloudflared")
+    parser.add_argument("--writer", choices=["postgrest", "supabase", "none"], default="postgrest",
+                        help="how to publish the tunnel URL (supabase = legacy supabase-py client)")
+    parser.add_argument("--port", type=int, default=BACKEND_PORT, help="local backend port")
+    parser.add_argument("--instance", help="also publish as backend_url.<INSTANCE> (several backends)")
+    parser.add_argument("--standby", nargs="?", const="same", choices=sorted(PROVIDERS) + ["same"],
+                        help="keep a warm standby tunnel (same provider by default) for instant failover")
+    parser.add_argument("--probe", action="store_true",
+                        help="probe /api/health through the public URL and replace the tunnel on SLO breach")
+    parser.add_argument("--probe-interval", type=float, help="seconds between probes (default: config, 5)")
+    parser.add_argument("--slo-p95", type=float, help="max p95 public probe latency (s) (default: config, 2)")
+    parser.add_argument("--max-probe-failures", type=int,
+                        help="consecutive failures before a restart (default: config, 3)")
+    parser.add_argument("--metrics", help="write metrics here (.prom = Prometheus text, else JSON)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0)
+    parser.add_argument("--fake-args", default="", help="extra arguments for scripts/fake_tunnel.py")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print every raw tunnel line (default: notable events only)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("=" * 60)
+    print("VoteChain V3 - Tunnel Manager with Service Discovery")
+    print("=" * 60)
+    try:
+        config.load()
+    except ConfigError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    ok = asyncio.run(_amain(args))
+    if ok:
+        print("👋 Tunnel manager stopped cleanly")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Multi-Service Tunnel Supervisor
+
+Exposes several local services (the Express backend, the static frontend
+on :8000, ...) from one Python process. Each service gets its own
+TunnelManager (provider, standby, health probes, system_config key), and
+they all run on one event loop and share a single PostgREST connection
+and metrics reporter, instead of one interpreter per tunnel.
+
+Usage:
+    python3 tunnel_supervisor.py tunnels.json
+    python3 tunnel_supervisor.py tunnels.example.json --writer none   # offline test
+
+tunnels.json (see tunnels.example.json):
+    {"metrics": "/tmp/votechain-tunnels.prom",
+     "services": [
+        {"name": "backend", "port": 3000, "standby": true, "probe": true},
+        {"name": "frontend", "port": 8000, "probe": {"path": "/"}}
+     ]}
+
+Each service publishes to system_config key <name>_url unless config_key
+is given. A service whose manager gives up (e.g. cloudflared keeps failing)
+is tried again after restart_after seconds; the other services keep going.
+"""
+
+import argparse
+import asyncio
+import json
+import signal
+import sys
+from dataclasses import dataclass
+
+from tunnel_manager import (LIVE_PROBE_SETTINGS, PROVIDERS, NullWriter, PostgrestWriter, TunnelManager,
+                            _supabase_credentials, build_provider, config_kwargs, config_probe)
+from votechain_config import config
+from votechain_metrics import metrics
+from votechain_postgrest import PostgrestClient
+
+SERVICE_RESTART_DELAY = 60      # seconds before a service that gave up is tried again
+PROBE_SETTINGS = ("interval", "timeout", "window", "min_samples", "slo_p95", "max_failures", "warmup", "path")
+
+
+@dataclass
+class ServiceConfig:
+    """One local service to expose. Defaults match start_tunnel.py."""
+    name: str
+    port: int
+    provider: str = "cloudflared"
+    config_key: str = ""        # "" = <name>_url
+    instance: str = ""          # also publish <config_key>.<instance>
+    standby: object = None      # provider name, or true for the same provider
+    probe: object = None        # true, or a dict of HealthProber settings
+    fake_args: str = ""
+    verbose: bool = False
+
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"Unknown service setting(s): {', '.join(sorted(unknown))}")
+        config = cls(**data)
+        if not config.config_key:
+            config.config_key = f"{config.name}_url"
+        for provider in (config.provider, config.standby_provider):
+            if provider and provider not in PROVIDERS:
+                raise ValueError(f"{config.name}: unknown provider {provider}")
+        if isinstance(config.probe, dict):
+            unknown = set(config.probe) - set(PROBE_SETTINGS)
+            if unknown:
+                raise ValueError(f"{config.name}: unknown probe setting(s): {', '.join(sorted(unknown))}")
+        return config
+
+    @property
+    def standby_provider(self):
+        if self.standby is True:
+            return self.provider
+        return self.standby or None
+
+    def probe_settings(self):
+        if not self.probe:
+            return None
+        return dict(self.probe) if isinstance(self.probe, dict) else {}
+
+
+def load_services(path):
+    """Read a tunnels file. Returns (settings, [ServiceConfig, ...])."""
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"services": data}
+    services = [ServiceConfig.from_dict(s) for s in data.get("services", [])]
+    if not services:
+        raise ValueError(f"No services defined in {path}")
+    for attr in ("name", "port"):
+        values = [getattr(s, attr) for s in services]
+        if len(set(values)) != len(values):
+            raise ValueError(f"Service {attr}s must be unique")
+    keys = [(s.config_key, s.instance) for s in services]
+    if len(set(keys)) != len(keys):
+        raise ValueError("Two services would publish to the same system_config key")
+    settings = {k: v for k, v in data.items() if k != "services"}
+    if settings.get("writer", "postgrest") not in ("postgrest", "none"):
+        raise ValueError("writer must be postgrest or none")
+    return settings, services
+
+
+class TunnelSupervisor:
+    """Runs one TunnelManager per service on the current event loop."""
+
+    def __init__(self, services, writer="postgrest", restart_after=SERVICE_RESTART_DELAY,
+                 client=None, url_timeout=None):
+        self.services = services
+        self.writer = writer
+        self.restart_after = restart_after
+        self.url_timeout = url_timeout
+        # One keep-alive PostgREST connection pool for every service's writer
+        self.client = client
+        if self.client is None and writer == "postgrest":
+            self.client = PostgrestClient(*_supabase_credentials())
+        self.managers = {}
+        self._stop = asyncio.Event()
+
+    def build_manager(self, service):
+        if self.writer == "none":
+            writer = NullWriter(service.config_key)
+        else:
+            writer = PostgrestWriter(None, None, client=self.client, instance=service.instance or None,
+                                     config_key=service.config_key)
+        standby = service.standby_provider
+        probe = service.probe_settings()
+        kwargs = config_kwargs()
+        if self.url_timeout:
+            kwargs["url_timeout"] = self.url_timeout
+        manager = TunnelManager(build_provider(service.provider, service.fake_args), writer, port=service.port,
+                                standby_provider=build_provider(standby, service.fake_args) if standby else None,
+                                probe=config_probe(probe) if probe is not None else None,
+                                verbose_logs=service.verbose, name=service.name, **kwargs)
+        # Values set in tunnels.json win over votechain_config reloads
+        manager.pinned_settings.update(name for name, attr in LIVE_PROBE_SETTINGS.items()
+                                       if probe and attr in probe)
+        if self.url_timeout:
+            manager.pinned_settings.add("tunnel_url_timeout")
+        config.on_change(manager.apply_config)
+        return manager
+
+    async def supervise(self, service):
+        """Keep one service's manager running until stop()."""
+        while not self._stop.is_set():
+            manager = self.build_manager(service)
+            self.managers[service.name] = manager
+            try:
+                await manager.run()
+            except Exception as e:
+                # One service's bug must not take the other tunnels down
+                print(f"❌ {service.name}: tunnel manager crashed: {e!r}")
+            if self._stop.is_set():
+                break
+            print(f"⚠️ {service.name}: tunnel manager stopped, trying again in {self.restart_after}s")
+            metrics.inc("tunnel_service_restarts", service=service.name)
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.restart_after)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self):
+        self._stop.set()
+        for manager in self.managers.values():
+            manager.stop()
+
+    async def run(self):
+        print(f"🚀 Supervising {len(self.services)} service(s): "
+              + ", ".join(f"{s.name} (:{s.port} -> {s.config_key})" for s in self.services))
+        try:
+            await asyncio.gather(*(self.supervise(s) for s in self.services))
+        finally:
+            if self.client:
+                self.client.close()
+        return True
+
+
+async def _amain(args, settings, services):
+    if settings.get("metrics"):
+        metrics.start_reporter(settings["metrics"], interval=settings.get("metrics_interval", 15.0))
+    supervisor = TunnelSupervisor(services, writer=args.writer or settings.get("writer", "postgrest"),
+                                  restart_after=settings.get("restart_after", SERVICE_RESTART_DELAY),
+                                  url_timeout=settings.get("url_timeout"))
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: (print("\n\n🛑 Shutdown signal received..."), supervisor.stop()))
+    return await supervisor.run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expose several local services through tunnels")
+    parser.add_argument("config", help="tunnels JSON file")
+    parser.add_argument("--writer", choices=["postgrest", "none"],
+                        help="override the file's writer (none = offline test)")
+    args = parser.parse_args(argv)
+
+    try:
+        settings, services = load_services(args.config)
+        config.watch()
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("VoteChain V3 - Tunnel Supervisor")
+    print("=" * 60)
+    ok = asyncio.run(_amain(args, settings, services))
+    if ok:
+        print("👋 Tunnel supervisor stopped cleanly")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
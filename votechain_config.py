@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Runtime Configuration
+
+One typed, validated set of settings shared by the kiosk and the tunnel
+scripts. Values are layered, later sources winning:
+
+    1. the defaults in SETTINGS below
+    2. backend/.env                 (SUPABASE_URL, keys, ...)
+    3. a JSON settings file         (VOTECHAIN_CONFIG, default ./votechain.json)
+    4. the process environment      (each setting's env name)
+
+The files are parsed once; nothing is copied into os.environ. Code reads a
+setting where it uses it (`config.vote_timeout`), so a reload takes effect
+on the next read without a restart and without dropping a voter.
+
+    from votechain_config import config
+    config.watch()                                  # SIGHUP + file mtime check
+    config.on_change(lambda changed: ...)           # {name: (old, new)}
+
+A reload parses and validates everything before swapping: one bad value
+keeps the whole previous configuration. Settings with live=False
+(credentials, pool sizes, file paths) are only read at startup; a reload
+that changes one says a restart is needed and keeps the old value. GPIO
+pins stay in BoothConfig / booths.json: rewiring needs a restart anyway.
+
+    python3 votechain_config.py             # validate and print the effective settings
+    kill -HUP <pid>                         # reload now instead of within WATCH_INTERVAL
+"""
+
+import json
+import os
+import signal
+import sys
+import threading
+import weakref
+
+from votechain_metrics import metrics
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ENV_PATH = os.path.join(SCRIPT_DIR, "backend", ".env")
+CONFIG_PATH = os.getenv("VOTECHAIN_CONFIG", os.path.join(SCRIPT_DIR, "votechain.json"))
+WATCH_INTERVAL = 2.0    # seconds between settings-file mtime checks
+
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off")
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def read_env_file(path):
+    """KEY=value pairs from a .env file (quotes stripped). {} if missing."""
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    values[key.strip()] = value.strip().strip('"').strip("'")
+    except FileNotFoundError:
+        pass
+    return values
+
+
+class Setting:
+    """One setting: kind is float, int, bool, str or "urls" (list of URLs)."""
+
+    def __init__(self, name, kind, default, env=None, live=True, minimum=None, secret=False, choices=None):
+        self.name = name
+        self.kind = kind
+        self.default = default
+        self.env = env
+        self.live = live
+        self.minimum = minimum
+        self.secret = secret
+        self.choices = choices
+
+    def parse(self, raw):
+        if raw is None:
+            return self.default
+        if self.kind == "urls":
+            items = raw.split(",") if isinstance(raw, str) else raw
+            if not isinstance(items, list):
+                raise ValueError("expected a URL or a list of URLs")
+            urls = [str(u).strip().rstrip("/") for u in items if str(u).strip()]
+            bad = [u for u in urls if not u.startswith(("http://", "https://"))]
+            if not urls or bad:
+                raise ValueError(f"not an http(s) URL: {bad[0] if bad else raw!r}")
+            return urls
+        if self.kind is bool:
+            if isinstance(raw, bool):
+                return raw
+            if str(raw).strip().lower() in _TRUE:
+                return True
+            if str(raw).strip().lower() in _FALSE:
+                return False
+            raise ValueError(f"expected true/false, got {raw!r}")
+        if self.kind is str:
+            value = str(raw) if raw != "" else self.default
+            if self.choices and value not in self.choices:
+                raise ValueError(f"expected one of {', '.join(self.choices)}, got {raw!r}")
+            return value
+        if isinstance(raw, bool):
+            raise ValueError(f"expected a number, got {raw!r}")
+        value = self.kind(raw)
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f"must be >= {self.minimum}, got {value}")
+        return value
+
+    def show(self, value):
+        return "***" if self.secret and value else value
+
+
+SETTINGS = [
+    # --- Kiosk: backend ---
+    Setting("backend_urls", "urls", ["http://127.0.0.1:3000"], env="KIOSK_BACKEND_URL"),
+    Setting("checkin_timeout", float, 5.0, env="KIOSK_CHECKIN_TIMEOUT", minimum=0.1),
+    Setting("checkin_hedge_after", float, 0.4, env="KIOSK_CHECKIN_HEDGE_AFTER", minimum=0.0),
+    Setting("vote_timeout", float, 90.0, env="KIOSK_VOTE_TIMEOUT", minimum=1.0),
+    Setting("receipt_timeout", float, 60.0, env="KIOSK_RECEIPT_TIMEOUT", minimum=0.0),
+    Setting("receipt_poll_interval", float, 1.0, env="KIOSK_RECEIPT_POLL_INTERVAL", minimum=0.1),
+    Setting("enroll_poll_timeout", float, 0.5, env="KIOSK_ENROLL_POLL_TIMEOUT", minimum=0.1),
+    # --- Kiosk: screens and sessions ---
+    Setting("receipt_flash_seconds", float, 6.0, env="KIOSK_RECEIPT_FLASH_SECONDS", minimum=0.0),
+    Setting("receipt_side_screen", str, None, env="KIOSK_RECEIPT_SIDE_SCREEN"),
+    Setting("pipeline_max_in_flight", int, 2, env="KIOSK_PIPELINE", live=False, minimum=0),
+    Setting("record_path", str, None, env="KIOSK_RECORD", live=False),
+    # --- Kiosk: idle scheduling (kiosk_idle.py) ---
+    Setting("idle_long_poll", float, 20.0, env="KIOSK_IDLE_LONG_POLL", minimum=0.0),
+    Setting("idle_poll_min", float, 0.5, env="KIOSK_IDLE_POLL_MIN", minimum=0.1),
+    Setting("idle_poll_max", float, 30.0, env="KIOSK_IDLE_POLL_MAX", minimum=0.1),
+    Setting("idle_pin_poll", float, 0.1, env="KIOSK_IDLE_PIN_POLL", minimum=0.01),
+    Setting("idle_dim_after", float, 60.0, env="KIOSK_IDLE_DIM_AFTER", minimum=0.0),
+    Setting("idle_blank_after", float, 600.0, env="KIOSK_IDLE_BLANK_AFTER", minimum=0.0),
+    Setting("idle_dim_contrast", int, 16, env="KIOSK_IDLE_DIM_CONTRAST", minimum=0),
+    # --- Kiosk: memory (kiosk_memory.py) ---
+    Setting("memory_interval", float, 30.0, env="KIOSK_MEMORY_INTERVAL", minimum=0.0),
+    Setting("memory_limit_mb", int, 160, env="KIOSK_MEMORY_LIMIT_MB", minimum=0),
+    Setting("memory_trace", bool, False, env="KIOSK_MEMORY_TRACE"),
+    Setting("memory_trace_frames", int, 8, env="KIOSK_MEMORY_TRACE_FRAMES", live=False, minimum=1),
+    Setting("memory_dir", str, "/tmp/votechain-memory", env="KIOSK_MEMORY_DIR"),
+    # --- Kiosk: session journal (kiosk_journal.py) ---
+    Setting("journal_dir", str, os.path.expanduser("~/.local/state/votechain/journal"),
+            env="KIOSK_JOURNAL_DIR", live=False),
+    Setting("journal_trust_seconds", float, 600.0, env="KIOSK_JOURNAL_TRUST_SECONDS", minimum=0.0),
+    # --- Kiosk: discovery ---
+    Setting("discovery", bool, True, env="KIOSK_DISCOVERY", live=False),
+    Setting("discovery_interval", float, 5.0, env="KIOSK_DISCOVERY_INTERVAL", minimum=0.5),
+    Setting("discovery_cache", str, os.path.expanduser("~/.cache/votechain/backend_url.json"),
+            env="KIOSK_DISCOVERY_CACHE", live=False),
+    # --- Kiosk: ballot (kiosk_ballot.py) ---
+    Setting("ballot_cache", str, os.path.expanduser("~/.cache/votechain/ballot.json"),
+            env="KIOSK_BALLOT_CACHE", live=False),
+    Setting("ballot_refresh", float, 300.0, env="KIOSK_BALLOT_REFRESH", minimum=0),
+    # --- Kiosk: voted filter (kiosk_voted_filter.py) ---
+    Setting("voted_filter", bool, True, env="KIOSK_VOTED_FILTER", live=False),
+    Setting("voted_filter_interval", float, 10.0, env="KIOSK_VOTED_FILTER_INTERVAL", minimum=1.0),
+    Setting("kiosk_api_key", str, None, env="KIOSK_API_KEY", live=False, secret=True),
+    # --- Kiosk: logging (kiosk_log.py) ---
+    Setting("log_level", str, "INFO", env="KIOSK_LOG_LEVEL", choices=("DEBUG", "INFO", "WARNING", "ERROR")),
+    Setting("log_debug_per_second", int, 20, env="KIOSK_LOG_DEBUG_PER_SECOND", minimum=0),
+    # --- Kiosk: profiling (kiosk_profiler.py) ---
+    Setting("profile", bool, False, env="KIOSK_PROFILE"),
+    Setting("profile_interval", float, 0.01, env="KIOSK_PROFILE_INTERVAL", minimum=0.001),
+    Setting("profile_seconds", float, 30.0, env="KIOSK_PROFILE_SECONDS", minimum=0.0),
+    Setting("profile_dir", str, "/tmp/votechain-profiles", env="KIOSK_PROFILE_DIR"),
+    # --- Supabase ---
+    Setting("supabase_url", str, None, env="SUPABASE_URL", live=False),
+    Setting("supabase_key", str, None, env="SUPABASE_KEY", live=False, secret=True),
+    Setting("supabase_anon_key", str, None, env="SUPABASE_ANON_KEY", live=False, secret=True),
+    # --- Tunnels ---
+    Setting("tunnel_restart_delay", float, 5.0, env="TUNNEL_RESTART_DELAY", minimum=0.0),
+    Setting("tunnel_url_timeout", float, 30.0, env="TUNNEL_URL_TIMEOUT", minimum=1.0),
+    Setting("tunnel_max_retries", int, 3, env="TUNNEL_MAX_RETRIES", minimum=1),
+    Setting("tunnel_probe_interval", float, 5.0, env="TUNNEL_PROBE_INTERVAL", minimum=0.5),
+    Setting("tunnel_slo_p95", float, 2.0, env="TUNNEL_SLO_P95", minimum=0.1),
+    Setting("tunnel_max_probe_failures", int, 3, env="TUNNEL_MAX_PROBE_FAILURES", minimum=1),
+]
+
+
+class Config:
+    """Current values of SETTINGS, loaded on first use."""
+
+    def __init__(self, settings=SETTINGS, path=CONFIG_PATH, env_path=ENV_PATH):
+        self._settings = {s.name: s for s in settings}
+        self.path = path
+        self.env_path = env_path
+        self._values = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._stamp = None
+        self._hup = threading.Event()
+        self._thread = None
+
+    def __getattr__(self, name):
+        # Only reached for names that are not regular attributes
+        settings = self.__dict__.get("_settings") or {}
+        if name not in settings:
+            raise AttributeError(name)
+        if self._values is None:
+            self.load()
+        return self._values[name]
+
+    def get(self, name):
+        return getattr(self, name)
+
+    # --- Loading ---
+
+    def _stat(self):
+        stamp = []
+        for path in (self.path, self.env_path):
+            try:
+                stamp.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _read(self):
+        """Parse every source. Raises ConfigError listing every bad value."""
+        raw = {}
+        env_file = read_env_file(self.env_path)
+        for s in self._settings.values():
+            if s.env and s.env in env_file:
+                raw[s.name] = env_file[s.env]
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+            except ValueError as e:
+                raise ConfigError(f"{self.path}: {e}")
+            if not isinstance(data, dict):
+                raise ConfigError(f"{self.path}: expected a JSON object")
+            unknown = set(data) - set(self._settings)
+            if unknown:
+                raise ConfigError(f"{self.path}: unknown setting(s): {', '.join(sorted(unknown))}")
+            raw.update(data)
+        for s in self._settings.values():
+            if s.env and s.env in os.environ:
+                raw[s.name] = os.environ[s.env]
+
+        values, errors = {}, []
+        for name, s in self._settings.items():
+            try:
+                values[name] = s.parse(raw.get(name))
+            except (TypeError, ValueError) as e:
+                errors.append(f"{name}: {e}")
+        if errors:
+            raise ConfigError("; ".join(errors))
+        return values
+
+    def load(self):
+        """First load; raises ConfigError so a bad file stops startup."""
+        with self._lock:
+            if self._values is None:
+                stamp = self._stat()
+                self._values = self._read()
+                self._stamp = stamp
+        return self
+
+    def reload(self):
+        """Re-read every source and apply the live changes.
+        Returns {name: (old, new)} for the settings that changed."""
+        if self._values is None:
+            self.load()
+            return {}
+        stamp = self._stat()
+        try:
+            values = self._read()
+        except (ConfigError, OSError) as e:
+            self._stamp = stamp
+            print(f"❌ Config reload failed, keeping the current settings: {e}")
+            metrics.inc("config_reload_errors")
+            return {}
+        with self._lock:
+            old = self._values
+            changed = {n: (old[n], v) for n, v in values.items() if old[n] != v}
+            restart = sorted(n for n in changed if not self._settings[n].live)
+            for name in restart:
+                values[name] = old[name]
+                del changed[name]
+            self._values = values
+            self._stamp = stamp
+        if restart:
+            print(f"⚠️ Config: restart needed for {', '.join(restart)}")
+        if changed:
+            shown = ", ".join(f"{n}={self._settings[n].show(new)}" for n, (_, new) in changed.items())
+            print(f"🔧 Config reloaded: {shown}")
+            metrics.inc("config_reloads")
+            for ref in list(self._listeners):
+                listener = ref()
+                if listener is None:
+                    self._listeners.remove(ref)
+                    continue
+                try:
+                    listener(changed)
+                except Exception as e:
+                    print(f"⚠️ Config listener failed: {e}")
+        return changed
+
+    # --- Watching ---
+
+    def on_change(self, listener):
+        """Call `listener({name: (old, new)})` after each reload that changed
+        live settings (from the watcher thread). Bound methods are held
+        weakly, so a booth that is reopened does not pin its old self."""
+        if hasattr(listener, "__self__"):
+            ref = weakref.WeakMethod(listener)
+        else:
+            ref = lambda: listener  # noqa: E731
+        self._listeners.append(ref)
+        return listener
+
+    def watch(self, interval=WATCH_INTERVAL, sighup=True):
+        """Reload on SIGHUP and when the settings file or backend/.env
+        changes. Safe to call more than once."""
+        self.load()
+        if sighup and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda *_: self._hup.set())
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, args=(interval,),
+                                            name="config-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def _watch(self, interval):
+        while True:
+            hup = self._hup.wait(interval)
+            self._hup.clear()
+            if hup or self._stat() != self._stamp:
+                self.reload()
+
+    def snapshot(self):
+        """Current values, secrets masked."""
+        if self._values is None:
+            self.load()
+        return {n: s.show(self._values[n]) for n, s in self._settings.items()}
+
+
+config = Config()
+
+
+def main():
+    try:
+        values = config.load().snapshot()
+    except ConfigError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"Settings file: {config.path}{'' if os.path.exists(config.path) else ' (not found)'}")
+    print(f"Env file:      {config.env_path}{'' if os.path.exists(config.env_path) else ' (not found)'}")
+    width = max(len(n) for n in values)
+    for name, value in values.items():
+        s = config._settings[name]
+        print(f"  {name:<{width}}  {value!s:<40} {s.env or '':<28} {'' if s.live else '(restart)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Minimal asyncio HTTP/1.1
+
+Just enough HTTP for the local Python tools (mock backend, load generator)
+without adding aiohttp to the Pi image: keep-alive, Content-Length bodies
+and JSON helpers. The server is not meant to face the internet.
+"""
+
+import asyncio
+import json
+import ssl
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+
+class CloseConnection(Exception):
+    """Raise from a handler to drop the connection without answering
+    (simulates a tunnel or proxy cutting the request)."""
+
+
+class Request:
+    def __init__(self, method, target, headers, body):
+        parts = urlsplit(target)
+        self.method = method
+        self.target = target
+        self.path = parts.path
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return {}
+        return json.loads(self.body)
+
+
+class Response:
+    def __init__(self, status=200, body=b"", headers=None, content_type="application/json"):
+        self.status = status
+        self.body = body if isinstance(body, bytes) else str(body).encode()
+        self.headers = dict(headers or {})
+        self.headers.setdefault("Content-Type", content_type)
+
+    def encode(self, keep_alive=True):
+        try:
+            reason = HTTPStatus(self.status).phrase
+        except ValueError:
+            reason = ""
+        lines = [f"HTTP/1.1 {self.status} {reason}"]
+        headers = dict(self.headers)
+        headers["Content-Length"] = str(len(self.body))
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + self.body
+
+
+def json_response(status, obj, headers=None):
+    return Response(status, json.dumps(obj).encode(), headers)
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    method, target, version = line.decode("latin-1").split()
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = h.decode("latin-1").partition(":")
+        headers[k.strip().lower()] = v.strip()
+    length = int(headers.get("content-length") or 0)
+    body = await reader.readexactly(length) if length else b""
+    req = Request(method.upper(), target, headers, body)
+    req.keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    return req
+
+
+async def _serve_connection(reader, writer, handler):
+    try:
+        while True:
+            req = await _read_request(reader)
+            if req is None:
+                break
+            try:
+                resp = await handler(req)
+            except CloseConnection:
+                break
+            except Exception as e:
+                resp = json_response(500, {"status": "error", "message": f"Handler error: {e}"})
+            writer.write(resp.encode(req.keep_alive))
+            await writer.drain()
+            if not req.keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(handler, host="127.0.0.1", port=3000):
+    """Start serving `handler(request) -> Response` (a coroutine)."""
+    return await asyncio.start_server(
+        lambda r, w: _serve_connection(r, w, handler), host, port)
+
+
+# ============================================================
+# CLIENT
+# ============================================================
+
+class ClientResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", "replace")
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HTTPClient:
+    """Keep-alive connection pool for one base URL (one request per
+    connection at a time, like a browser or requests.Session)."""
+
+    def __init__(self, base_url, max_idle=64):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.scheme == "https" else 80)
+        self.prefix = parts.path.rstrip("/")
+        self.max_idle = max_idle
+        self._idle = []
+        self._ssl = ssl.create_default_context() if self.scheme == "https" else None
+
+    async def _connect(self):
+        if self._idle:
+            return self._idle.pop()
+        return await asyncio.open_connection(self.host, self.port, ssl=self._ssl)
+
+    def _release(self, conn, keep_alive):
+        if keep_alive and len(self._idle) < self.max_idle:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def request(self, method, path, json_body=None, headers=None, timeout=30):
+        body = json.dumps(json_body).encode() if json_body is not None else b""
+        head = {"Host": self.host if self.port in (80, 443) else f"{self.host}:{self.port}",
+                "Connection": "keep-alive", "Content-Length": str(len(body))}
+        if json_body is not None:
+            head["Content-Type"] = "application/json"
+        head.update(headers or {})
+        raw = (f"{method} {self.prefix}{path} HTTP/1.1\r\n"
+               + "".join(f"{k}: {v}\r\n" for k, v in head.items()) + "\r\n").encode("latin-1") + body
+        return await asyncio.wait_for(self._exchange(raw), timeout)
+
+    async def _exchange(self, raw):
+        # A pooled connection may have been closed by the server while idle;
+        # retry once on a fresh one before giving up.
+        for attempt in (0, 1):
+            reused = bool(self._idle) and attempt == 0
+            reader, writer = await self._connect()
+            try:
+                writer.write(raw)
+                await writer.drain()
+                resp, keep_alive = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                writer.close()
+                if reused:
+                    continue
+                raise ConnectionError("connection closed without a response")
+            except BaseException:
+                # Timeouts/cancellation leave the stream mid-response
+                writer.close()
+                raise
+            self._release((reader, writer), keep_alive)
+            return resp
+
+    async def _read_response(self, reader):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("empty response")
+        version, status, *_ = line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = h.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                body += await reader.readexactly(size)
+                await reader.readline()
+        else:
+            body = await reader.readexactly(int(headers.get("content-length") or 0))
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        return ClientResponse(int(status), headers, body), keep_alive
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, json_body=None, **kwargs):
+        return await self.request("POST", path, json_body=json_body, **kwargs)
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
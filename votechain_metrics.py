@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - In-process Metrics
+
+Thread-safe counters, gauges and rolling latency windows shared by the
+kiosk and the tunnel manager. Nothing here blocks a caller for longer than
+a dict update; snapshots are written to disk (JSON) or served as
+Prometheus text by a background reporter.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+class Metrics:
+    """Registry of counters, gauges and rolling sample windows."""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._samples = {}
+
+    def inc(self, name, value=1, **labels):
+        k = _key(name, labels)
+        with self._lock:
+            self._counters[k] = self._counters.get(k, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        k = _key(name, labels)
+        with self._lock:
+            window = self._samples.get(k)
+            if window is None:
+                window = self._samples[k] = [deque(maxlen=self.window), 0, 0.0]
+            window[0].append(value)
+            window[1] += 1
+            window[2] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def summary(self, name, **labels):
+        """count/sum over all time plus p50/p95/p99/max over the window."""
+        with self._lock:
+            window = self._samples.get(_key(name, labels))
+            if window is None:
+                return {'count': 0}
+            values = sorted(window[0])
+            count, total = window[1], window[2]
+        return {
+            'count': count,
+            'sum': round(total, 6),
+            'p50': percentile(values, 50),
+            'p95': percentile(values, 95),
+            'p99': percentile(values, 99),
+            'max': values[-1] if values else None,
+        }
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            sample_keys = list(self._samples)
+        out = {'uptime_s': round(time.time() - self.started, 1),
+               'counters': {}, 'gauges': {}, 'latency': {}}
+        for (name, labels), v in counters.items():
+            out['counters'][name + _fmt_labels(labels)] = v
+        for (name, labels), v in gauges.items():
+            out['gauges'][name + _fmt_labels(labels)] = v
+        for name, labels in sample_keys:
+            out['latency'][name + _fmt_labels(labels)] = self.summary(name, **dict(labels))
+        return out
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            sample_keys = list(self._samples)
+        for (name, labels), v in sorted(counters.items()):
+            lines.append(f"votechain_{name}_total{_fmt_labels(labels)} {v}")
+        for (name, labels), v in sorted(gauges.items()):
+            lines.append(f"votechain_{name}{_fmt_labels(labels)} {v}")
+        for name, labels in sorted(sample_keys):
+            s = self.summary(name, **dict(labels))
+            for q in ("p50", "p95", "p99"):
+                if s.get(q) is not None:
+                    ql = labels + (("quantile", "0." + q[1:]),)
+                    lines.append(f"votechain_{name}{_fmt_labels(ql)} {s[q]:.6f}")
+            lines.append(f"votechain_{name}_count{_fmt_labels(labels)} {s['count']}")
+            lines.append(f"votechain_{name}_sum{_fmt_labels(labels)} {s['sum']}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        """Atomically replace `path` with the current snapshot."""
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2, default=str)
+        os.replace(tmp, path)
+
+    def start_reporter(self, path, interval=30.0):
+        """Dump a snapshot every `interval` seconds (daemon thread).
+        Paths ending in .prom get Prometheus text (node_exporter textfile)."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    if path.endswith(".prom"):
+                        tmp = f"{path}.tmp"
+                        with open(tmp, 'w') as f:
+                            f.write(self.to_prometheus())
+                        os.replace(tmp, path)
+                    else:
+                        self.write_json(path)
+                except Exception as e:
+                    print(f"⚠️ Metrics write failed: {e}")
+        t = threading.Thread(target=loop, name="metrics-reporter", daemon=True)
+        t.start()
+        return t
+
+
+# Process-wide default registry
+metrics = Metrics()
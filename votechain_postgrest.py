@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+VoteChain V3 - Minimal PostgREST Client
+
+The tunnel manager only ever touches one table (system_config), so pulling
+in supabase-py (httpx, gotrue, realtime, storage, ...) costs seconds of
+startup and tens of MB on the Pi for a single PATCH. This client talks to
+Supabase's REST endpoint (/rest/v1) directly over a keep-alive connection
+(votechain_http.HTTPClient) and retries transient failures with backoff.
+
+    client = PostgrestClient(SUPABASE_URL, SUPABASE_KEY)
+    rows = await client.select("system_config", key="eq.backend_url")
+    rows = await client.update("system_config", {"value": url}, key="eq.backend_url")
+    rows = await client.upsert("system_config", {"key": "backend_url.pi-2", "value": url})
+
+Filters use PostgREST syntax (column=operator.value).
+"""
+
+import asyncio
+import random
+import time
+from urllib.parse import urlencode
+
+from votechain_http import HTTPClient
+from votechain_metrics import metrics
+
+RETRIES = 4             # attempts after the first one
+BACKOFF = 0.5           # first retry delay, doubled each time (+ jitter)
+MAX_BACKOFF = 8.0
+TIMEOUT = 10.0
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class PostgrestError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class PostgrestClient:
+    def __init__(self, supabase_url, key, retries=RETRIES, backoff=BACKOFF, timeout=TIMEOUT):
+        self.http = HTTPClient(supabase_url.rstrip("/") + "/rest/v1", max_idle=2)
+        self.headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    async def request(self, method, table, params=None, body=None, prefer=None):
+        path = f"/{table}" + (f"?{urlencode(params)}" if params else "")
+        headers = dict(self.headers)
+        if prefer:
+            headers["Prefer"] = prefer
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                resp = await self.http.request(method, path, json_body=body, headers=headers,
+                                               timeout=self.timeout)
+                error, status = None, resp.status
+            except asyncio.TimeoutError:
+                error, status = "timeout", None
+            except (OSError, ConnectionError) as e:
+                error, status = type(e).__name__, None
+            metrics.observe("postgrest_request_s", time.perf_counter() - start, method=method)
+
+            if error is None and status < 300:
+                return resp.json() if resp.body else None
+            if error is None and status not in RETRY_STATUS:
+                # 4xx: bad key, missing table, RLS... retrying will not help
+                raise PostgrestError(f"{method} {table}: HTTP {status} {resp.text[:200]}", status)
+            reason = error or f"HTTP {status}"
+            if attempt == self.retries:
+                raise PostgrestError(f"{method} {table}: {reason} after {attempt + 1} attempts", status)
+            metrics.inc("postgrest_retries", method=method, reason=reason)
+            wait = min(delay, MAX_BACKOFF) * random.uniform(0.8, 1.2)
+            print(f"⚠️ {method} {table} failed ({reason}), retrying in {wait:.1f}s...")
+            await asyncio.sleep(wait)
+            delay *= 2
+
+    async def select(self, table, columns="*", **filters):
+        return await self.request("GET", table, dict(filters, select=columns))
+
+    async def update(self, table, values, **filters):
+        """PATCH matching rows; returns the updated rows."""
+        return await self.request("PATCH", table, filters, body=values, prefer="return=representation")
+
+    async def upsert(self, table, row):
+        """Insert `row`, or update it if its primary key already exists."""
+        return await self.request("POST", table, body=row,
+                                  prefer="resolution=merge-duplicates,return=representation")
+
+    def close(self):
+        self.http.close()